@@ -0,0 +1 @@
+from tests.conftest import make_config, make_metrics, make_task  # noqa: F401
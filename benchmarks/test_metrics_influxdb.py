@@ -0,0 +1,76 @@
+"""
+Comparison of the :class:`~jobslib.metrics.influxdb.InfluxDBMetrics` and
+:class:`~jobslib.metrics.influxdbline.InfluxDBLineMetrics` writers against
+the local stand-in server.
+"""
+
+from unittest import mock
+
+import pytest
+
+from influxdb.line_protocol import make_lines
+
+from jobslib.metrics.influxdb import InfluxDBMetrics
+from jobslib.metrics.influxdbline import InfluxDBLineMetrics
+from jobslib.testing.influxdb import FakeInfluxDBServer
+
+pytest.importorskip('pytest_benchmark')
+
+METRICS = {
+    'metric_{}'.format(i): {
+        'value': float(i),
+        'tags': {'status': 'succeeded', 'type': 'task'},
+    }
+    for i in range(20)
+}
+
+
+@pytest.fixture(scope='module')
+def influxdb_server():
+    with FakeInfluxDBServer() as server:
+        yield server
+
+
+@pytest.fixture
+def create_metrics(make_metrics):
+
+    def create_metrics(metrics_cls, address, **options):
+        return make_metrics(
+            metrics_cls, task_name='benchmark', host=address[0],
+            port=address[1], database='benchmark', **options)
+
+    return create_metrics
+
+
+@pytest.mark.benchmark(group='influxdb-points')
+def test_influxdb_points(create_metrics, benchmark):
+    metrics = create_metrics(InfluxDBMetrics, ('localhost', 8086))
+    captured = []
+    with mock.patch.object(metrics, 'send_points', captured.append):
+        metrics.push(METRICS)
+
+    benchmark(lambda: make_lines({'points': captured[0]}))
+
+
+@pytest.mark.benchmark(group='influxdb-points')
+def test_influxdbline_points(create_metrics, benchmark):
+    metrics = create_metrics(InfluxDBLineMetrics, ('localhost', 8086))
+
+    benchmark(metrics.make_lines, METRICS)
+
+
+@pytest.mark.benchmark(group='influxdb-push')
+def test_influxdb_push(create_metrics, benchmark, influxdb_server):
+    metrics = create_metrics(InfluxDBMetrics, influxdb_server.address)
+
+    benchmark(metrics.push, METRICS)
+
+
+@pytest.mark.benchmark(group='influxdb-push')
+@pytest.mark.parametrize('gzip', [True, False])
+def test_influxdbline_push(create_metrics, benchmark, influxdb_server, gzip):
+    metrics = create_metrics(
+        InfluxDBLineMetrics, influxdb_server.address, gzip=gzip)
+
+    benchmark(metrics.push, METRICS)
+    metrics.close()
@@ -0,0 +1,82 @@
+"""
+:class:`~jobslib.oneinstance.consul.ConsulLock` against the local
+stand-in server.
+"""
+
+import signal
+from unittest import mock
+
+import pytest
+
+from jobslib.deadline import Deadline
+from jobslib.oneinstance.consul import ConsulLock
+from jobslib.testing.consul import FakeConsulServer
+
+pytest.importorskip('pytest_benchmark')
+
+
+@pytest.fixture(scope='module')
+def consul_server():
+    with FakeConsulServer() as server:
+        yield server
+
+
+def create_lock(address):
+    context = mock.Mock(fqdn='benchmark', deadline=Deadline())
+    options = ConsulLock.OptionsConfig(
+        {'host': address[0], 'port': address[1], 'key': 'jobs/benchmark',
+         'lock_delay': 0},
+        None)
+    return ConsulLock(context, options)
+
+
+@pytest.mark.benchmark(group='consul-lock')
+def test_consul_lock_acquire_release(benchmark, consul_server):
+    lock = create_lock(consul_server.address)
+
+    def acquire_release():
+        assert lock.acquire()
+        assert lock.release()
+
+    benchmark(acquire_release)
+
+
+@pytest.mark.benchmark(group='consul-lock')
+def test_consul_lock_owner_info(benchmark, consul_server):
+    lock = create_lock(consul_server.address)
+    assert lock.acquire()
+    try:
+        info = benchmark(lock.get_lock_owner_info)
+    finally:
+        lock.release()
+    assert info['fqdn'] == 'benchmark'
+
+
+@pytest.mark.benchmark(group='consul-lock')
+def test_consul_lock_failover(benchmark, consul_server):
+    lock1 = create_lock(consul_server.address)
+    lock2 = create_lock(consul_server.address)
+
+    def failover():
+        assert lock1.acquire()
+        consul_server.expire_session(lock1._session_id)
+        assert lock2.acquire()
+        assert lock2.release()
+
+    try:
+        benchmark(failover)
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, signal.SIG_DFL)
+
+
+@pytest.mark.benchmark(group='consul-lock-latency')
+def test_consul_lock_acquire_release_latency(benchmark):
+    with FakeConsulServer(latency=0.002) as server:
+        lock = create_lock(server.address)
+
+        def acquire_release():
+            assert lock.acquire()
+            assert lock.release()
+
+        benchmark(acquire_release)
@@ -0,0 +1,49 @@
+"""
+Overhead of the :class:`~jobslib.BaseTask` loop, :class:`~jobslib.Config`
+construction and :func:`~jobslib.main.main` startup with dummy backends.
+"""
+
+import pytest
+
+from jobslib import BaseTask
+from jobslib.main import main
+
+pytest.importorskip('pytest_benchmark')
+
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'root': {
+        'handlers': [],
+        'level': 'WARNING',
+    },
+}
+
+
+class NoopTask(BaseTask):
+
+    name = 'noop'
+
+    def task(self):
+        pass
+
+
+@pytest.mark.benchmark(group='task')
+def test_task_loop(benchmark, make_task):
+    task = make_task(NoopTask, LOGGING=LOGGING)
+
+    benchmark(task)
+
+
+@pytest.mark.benchmark(group='task')
+def test_config(benchmark, make_config):
+    benchmark(make_config, NoopTask, LOGGING=LOGGING)
+
+
+@pytest.mark.benchmark(group='task')
+def test_main(benchmark, monkeypatch):
+    monkeypatch.setenv('JOBSLIB_LOGGING', '{"version": 1}')
+    args = ['--disable-one-instance', '--run-once', __name__ + '.NoopTask']
+
+    benchmark(main, args)
@@ -0,0 +1,27 @@
+"""
+Time functions from :mod:`jobslib.time`, they are called several times
+in each iteration.
+"""
+
+import pytest
+
+from jobslib.time import get_current_time, to_local, to_utc
+
+pytest.importorskip('pytest_benchmark')
+
+TIMESTAMP = 1700000000
+
+
+@pytest.mark.benchmark(group='time')
+def test_get_current_time(benchmark):
+    benchmark(get_current_time)
+
+
+@pytest.mark.benchmark(group='time')
+def test_to_utc(benchmark):
+    benchmark(to_utc, TIMESTAMP)
+
+
+@pytest.mark.benchmark(group='time')
+def test_to_local(benchmark):
+    benchmark(to_local, TIMESTAMP)
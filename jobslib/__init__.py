@@ -2,16 +2,42 @@
 Library for launching tasks in parallel environment.
 """
 
-from .cmdlineparser import argument
-from .config import Config, ConfigGroup, option
-from .context import Context, cached_property
-from .oneinstance import OneInstanceWatchdogError
-from .tasks import BaseTask
+import importlib
+
 from .version import VERSION
 
 __all__ = [
-    'argument', 'Config', 'ConfigGroup', 'option', 'Context',
-    'cached_property', 'OneInstanceWatchdogError', 'BaseTask',
+    'argument', 'Config', 'ConfigGroup', 'lazy_option', 'option', 'Context',
+    'cached_property', 'OneInstanceWatchdogError', 'BaseTask', 'QueueTask',
 ]
 
 __version__ = VERSION
+
+# Public names are imported on the first access, so lightweight modules
+# (e.g. jobslib.client) don't import the whole library.
+_LAZY_NAMES = {
+    'argument': '.cmdlineparser',
+    'Config': '.config',
+    'ConfigGroup': '.config',
+    'lazy_option': '.config',
+    'option': '.config',
+    'Context': '.context',
+    'cached_property': '.context',
+    'OneInstanceWatchdogError': '.oneinstance',
+    'BaseTask': '.tasks',
+    'QueueTask': '.tasks',
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_NAMES.get(name)
+    if module_name is None:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
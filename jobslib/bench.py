@@ -0,0 +1,336 @@
+"""
+Module :mod:`jobslib.bench` provides ``bench-backends`` internal task,
+which measures latency and throughput of the configured backends. Use
+it for capacity planning of the Consul and InfluxDB servers. And
+``simulate-lock-contention`` internal task, which simulates fleet of the
+tasks contending on the :class:`~jobslib.oneinstance.consul.ConsulLock`,
+see :mod:`jobslib.testing.contention`.
+
+.. warning::
+
+    Task really acquires the lock and writes the liveness, so don't use
+    keys of the running tasks, override them e.g. by the
+    :envvar:`JOBSLIB_ONE_INSTANCE_CONSUL_KEY` and
+    :envvar:`JOBSLIB_LIVENESS_CONSUL_KEY` environment variables.
+
+.. code-block:: console
+
+    $ JOBSLIB_ONE_INSTANCE_CONSUL_KEY=jobs/bench/lock \\
+        JOBSLIB_LIVENESS_CONSUL_KEY=jobs/bench/liveness \\
+        runjob -s myapp.settings bench-backends --iterations 1000
+"""
+
+import json
+import math
+import sys
+import time
+
+from .cmdlineparser import argument
+from .tasks import _Task
+
+__all__ = ['BenchBackends', 'SimulateLockContention', 'percentile']
+
+BACKENDS = ('lock', 'liveness', 'metrics')
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+def percentile(values, q):
+    """
+    Return *q*-quantile (0 < *q* <= 1) of the sorted *values* using
+    nearest-rank method.
+    """
+    if not values:
+        return None
+    return values[max(int(math.ceil(q * len(values))) - 1, 0)]
+
+
+class OperationStats(object):
+    """
+    Durations and errors of the one backend operation.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.durations = []
+        self.errors = 0
+
+    def measure(self, func, *args):
+        """
+        Call ``func(*args)``, record its duration and return its result,
+        or :data:`!None` if it has raised an exception. Exception and
+        result :data:`!False` are counted as errors, backends log their
+        errors and return :data:`!False` instead of raising them.
+        """
+        start = time.perf_counter()
+        try:
+            result = func(*args)
+        except Exception:
+            self.errors += 1
+            return None
+        finally:
+            self.durations.append(time.perf_counter() - start)
+        if result is False:
+            self.errors += 1
+        return result
+
+    def as_dict(self):
+        """
+        Return statistics as a :class:`!dict`, durations are in seconds.
+        """
+        durations = sorted(self.durations)
+        total = sum(durations)
+        stats = {
+            'count': len(durations),
+            'errors': self.errors,
+            'throughput': len(durations) / total if total else None,
+            'max': durations[-1] if durations else None,
+        }
+        for q in PERCENTILES:
+            stats['p{:g}'.format(q * 100)] = percentile(durations, q)
+        return stats
+
+
+class BenchBackends(_Task):
+    """
+    Internal task which runs ``--iterations`` acquire/release cycles of
+    the lock (including renewal of the session if lock supports it, e.g.
+    :meth:`ConsulLock.renew <jobslib.oneinstance.consul.ConsulLock.renew>`),
+    write/read cycles of the liveness and pushes of
+    ``--metrics-size`` metrics and prints throughput (operations per
+    second) and p50/p95/p99 latencies of each operation.
+    """
+
+    name = 'bench-backends'
+    description = 'measure latency and throughput of the backends'
+    arguments = (
+        argument(
+            '--iterations', action='store', dest='iterations',
+            type=int, default=100,
+            help='number of cycles of each backend, default is 100'),
+        argument(
+            '--metrics-size', action='store', dest='metrics_size',
+            type=int, default=10,
+            help='number of metrics in one push, default is 10'),
+        argument(
+            '--backend', action='append', dest='backends',
+            choices=BACKENDS, default=None,
+            help='benchmarked backend, may be used several times, '
+                 'default is all backends'),
+        argument(
+            '--format', action='store', dest='output_format',
+            choices=('table', 'json'), default='table',
+            help='output format, default is table'),
+    )
+
+    def initialize(self):
+        args_parser = self.context.config._args_parser
+        self.iterations = args_parser.iterations
+        self.metrics_size = args_parser.metrics_size
+        self.backends = args_parser.backends or list(BACKENDS)
+        self.output_format = args_parser.output_format
+
+    def bench_lock(self):
+        lock = self.context.one_instance_lock
+        # refresh() of the lock only requests renewal, renewal itself is
+        # measured if lock supports it
+        renew_lock = getattr(lock, 'renew', None)
+        acquire = OperationStats('lock.acquire')
+        renew = OperationStats('lock.renew')
+        release = OperationStats('lock.release')
+        for unused_i in range(self.iterations):
+            # Lock owned by someone else is counted as error
+            if acquire.measure(lock.acquire):
+                if renew_lock is not None:
+                    renew.measure(renew_lock)
+                release.measure(lock.release)
+        if renew_lock is None:
+            return [acquire, release]
+        return [acquire, renew, release]
+
+    def bench_liveness(self):
+        liveness = self.context.liveness
+        write = OperationStats('liveness.write')
+        read = OperationStats('liveness.read')
+        for unused_i in range(self.iterations):
+            write.measure(liveness.write)
+            read.measure(liveness.read)
+        return [write, read]
+
+    def bench_metrics(self):
+        metrics = self.context.metrics
+        push = OperationStats('metrics.push')
+        data = {
+            'bench_metric_{}'.format(i): {
+                'value': float(i),
+                'tags': {'type': 'bench'},
+            }
+            for i in range(self.metrics_size)
+        }
+        for unused_i in range(self.iterations):
+            push.measure(metrics.push, data)
+        return [push]
+
+    def task(self):
+        if self.iterations <= 0:
+            raise ValueError("Invalid iterations: {}".format(self.iterations))
+        if self.metrics_size <= 0:
+            raise ValueError(
+                "Invalid metrics_size: {}".format(self.metrics_size))
+        results = []
+        for backend in BACKENDS:
+            if backend in self.backends:
+                results.extend(getattr(self, 'bench_' + backend)())
+        if self.output_format == 'json':
+            output = json.dumps(
+                {stats.name: stats.as_dict() for stats in results},
+                indent=2, sort_keys=True) + '\n'
+        else:
+            output = self.format_table(results)
+        sys.stdout.write(output)
+        sys.stdout.flush()
+
+    @staticmethod
+    def format_table(results):
+        """
+        Return *results* as a text table, latencies are in milliseconds.
+        """
+        def ms(value):
+            return '-' if value is None else '{:.2f}'.format(value * 1000)
+
+        columns = ('operation', 'count', 'errors', 'ops/s', 'p50 ms',
+                   'p95 ms', 'p99 ms', 'max ms')
+        rows = [columns]
+        for stats in results:
+            data = stats.as_dict()
+            throughput = data['throughput']
+            rows.append((
+                stats.name, str(data['count']), str(data['errors']),
+                '-' if throughput is None else '{:.1f}'.format(throughput),
+                ms(data['p50']), ms(data['p95']), ms(data['p99']),
+                ms(data['max']),
+            ))
+        widths = [max(len(row[i]) for row in rows)
+                  for i in range(len(columns))]
+        lines = []
+        for row in rows:
+            cells = [row[0].ljust(widths[0])]
+            cells.extend(
+                cell.rjust(width) for cell, width in zip(row[1:], widths[1:]))
+            lines.append('  '.join(cells))
+        return '\n'.join(lines) + '\n'
+
+
+class SimulateLockContention(_Task):
+    """
+    Internal task which runs ``--workers`` processes contending on
+    ``--keys`` locks of the :class:`~jobslib.testing.consul.FakeConsulServer`
+    and prints acquire rate, server load, failover latency and fairness,
+    see :func:`jobslib.testing.contention.simulate_lock_contention`. Use
+    it for validation of the ``ttl``, ``lock_delay`` and sleep interval
+    of the large deployments.
+
+    .. code-block:: console
+
+        $ runjob -s myapp.settings simulate-lock-contention --workers 200 \\
+            --keys 4 --duration 600 --ttl 30 --lock-delay 15 \\
+            --hold-time 5 --worker-sleep-interval 10 --kill-rate 0.05 \\
+            --time-scale 20
+    """
+
+    name = 'simulate-lock-contention'
+    description = 'simulate fleet of the tasks contending on the lock'
+    arguments = (
+        argument(
+            '--workers', action='store', dest='workers', type=int,
+            default=10, help='number of the worker processes, default is 10'),
+        argument(
+            '--keys', action='store', dest='keys', type=int, default=1,
+            help='number of the lock keys, default is 1'),
+        argument(
+            '--duration', action='store', dest='duration', type=float,
+            default=60.0,
+            help='simulated duration in seconds, default is 60'),
+        argument(
+            '--ttl', action='store', dest='ttl', type=int, default=10,
+            help='TTL of the lock in seconds, default is 10'),
+        argument(
+            '--lock-delay', action='store', dest='lock_delay', type=int,
+            default=1, help='lock delay in seconds, default is 1'),
+        argument(
+            '--hold-time', action='store', dest='hold_time', type=float,
+            default=1.0,
+            help='duration of the task in seconds, default is 1'),
+        argument(
+            '--worker-sleep-interval', action='store',
+            dest='worker_sleep_interval', type=float, default=1.0,
+            help='sleep interval of the workers in seconds, default is 1'),
+        argument(
+            '--kill-rate', action='store', dest='kill_rate', type=float,
+            default=0.0,
+            help='probability that lock holder is killed, default is 0'),
+        argument(
+            '--no-refresh', action='store_false', dest='refresh',
+            default=True,
+            help="holders don't refresh the lock, so holder is interrupted "
+                 "by the watchdog when hold time exceeds TTL"),
+        argument(
+            '--time-scale', action='store', dest='time_scale', type=float,
+            default=1.0,
+            help='how many times faster simulated time runs, default is 1'),
+        argument(
+            '--latency', action='store', dest='latency', type=float,
+            default=0.0,
+            help='latency of the server responses in seconds, default is 0'),
+        argument(
+            '--seed', action='store', dest='seed', type=int, default=None,
+            help='seed of the random generator'),
+        argument(
+            '--format', action='store', dest='output_format',
+            choices=('table', 'json'), default='table',
+            help='output format, default is table'),
+    )
+
+    def task(self):
+        # Simulator is imported only when it is needed
+        from .testing.contention import simulate_lock_contention
+
+        args_parser = self.context.config._args_parser
+        report = simulate_lock_contention(
+            workers=args_parser.workers,
+            keys=args_parser.keys,
+            duration=args_parser.duration,
+            ttl=args_parser.ttl,
+            lock_delay=args_parser.lock_delay,
+            hold_time=args_parser.hold_time,
+            sleep_interval=args_parser.worker_sleep_interval,
+            kill_rate=args_parser.kill_rate,
+            refresh=args_parser.refresh,
+            time_scale=args_parser.time_scale,
+            latency=args_parser.latency,
+            seed=args_parser.seed,
+        )
+        if args_parser.output_format == 'json':
+            output = json.dumps(report, indent=2, sort_keys=True) + '\n'
+        else:
+            output = self.format_table(report)
+        sys.stdout.write(output)
+        sys.stdout.flush()
+
+    @staticmethod
+    def format_table(report, prefix=''):
+        """
+        Return *report* as a text table with one value per line.
+        """
+        lines = []
+        for name, value in report.items():
+            if isinstance(value, dict):
+                lines.append(SimulateLockContention.format_table(
+                    value, prefix=prefix + name + '.'))
+                continue
+            if isinstance(value, float):
+                value = '{:.3f}'.format(value)
+            elif value is None:
+                value = '-'
+            lines.append('{:<32}{:>12}\n'.format(prefix + name, value))
+        return ''.join(lines)
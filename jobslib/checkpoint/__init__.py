@@ -0,0 +1,173 @@
+"""
+Module :mod:`checkpoint` provides store of the task's cursors (e.g. the
+last processed ID or timestamp), so incremental task processes only new
+data and it resumes after crash without redoing the work. Checkpoint is
+available as :attr:`jobslib.Context.checkpoint`.
+
+Values written by :meth:`BaseCheckpoint.put` and
+:meth:`BaseCheckpoint.compare_and_set` are kept in memory (write-behind)
+and they are committed atomically when the iteration has succeeded,
+before the liveness is written. When the task fails, changes are thrown
+away, so the next iteration starts from the last committed checkpoint.
+Commit fails with :exc:`CheckpointConflictError` if some of the written
+keys have been changed by someone else since they have been read.
+
+.. code-block:: python
+
+    def task(self):
+        checkpoint = self.context.checkpoint
+        last_id = checkpoint.get('last_id', 0)
+        for row in self.fetch_rows(after=last_id):
+            self.process(row)
+            last_id = row.id
+        checkpoint.put('last_id', last_id)
+
+:class:`BaseCheckpoint` is ancestor, it is abstract class which
+implements write-behind cache, backends override :meth:`read` and
+:meth:`write` methods.
+"""
+
+import abc
+import json
+import threading
+
+from ..config import ConfigGroup
+from ..exceptions import JobsLibError
+
+__all__ = ['BaseCheckpoint', 'CheckpointConflictError']
+
+
+class CheckpointConflictError(JobsLibError):
+    """
+    Indicates that checkpoint has been changed by someone else since it
+    has been read.
+    """
+    pass
+
+
+class BaseCheckpoint(abc.ABC):
+    """
+    Provides checkpoint API. Inherit this class and override abstract
+    methods :meth:`read` and :meth:`write`. Configuration options are
+    defined in :class:`OptionsConfig` class, which is
+    :class:`~jobslib.ConfigGroup` descendant. Values must be JSON
+    serializable.
+    """
+
+    class OptionsConfig(ConfigGroup):
+        """
+        Validation of the checkpoint configuration, see
+        :class:`~jobslib.ConfigGroup`.
+        """
+        pass
+
+    def __init__(self, context, options):
+        self.context = context
+        self.options = options
+        self._lock = threading.RLock()
+        # Values and versions read during the iteration
+        self._cache = {}
+        # Values waiting for commit
+        self._pending = {}
+
+    @abc.abstractmethod
+    def read(self, key):
+        """
+        Read *key* from the storage and return ``(value, version)``.
+        *version* is opaque :class:`!int`, which changes with every write
+        of the *key*, 0 means that *key* doesn't exist.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def write(self, changes):
+        """
+        Write *changes* atomically, *changes* is :class:`!dict` ``{key:
+        (value, version)}``, where *version* is version of the *key*
+        returned by :meth:`read`. Raise :exc:`CheckpointConflictError` and
+        don't write anything if current version of any key differs.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Close the storage, e.g. its connection. Default implementation
+        does nothing.
+        """
+        pass
+
+    def _read_cached(self, key):
+        if key not in self._cache:
+            self._cache[key] = self.read(key)
+        return self._cache[key]
+
+    def get(self, key, default=None):
+        """
+        Return value of the *key*, including value which has not been
+        committed yet. Return *default* if *key* doesn't exist.
+        """
+        with self._lock:
+            if key in self._pending:
+                return json.loads(self._pending[key])
+            value, version = self._read_cached(key)
+        return default if not version else value
+
+    def put(self, key, value):
+        """
+        Set *key* to *value*, value is written when the iteration
+        succeeds.
+        """
+        # Value is serialized immediately, later changes of the mutable
+        # value don't affect the checkpoint
+        value = json.dumps(value)
+        with self._lock:
+            self._read_cached(key)
+            self._pending[key] = value
+
+    def compare_and_set(self, key, expected, value):
+        """
+        Set *key* to *value* if its current value is *expected* (or if it
+        doesn't exist and *expected* is :data:`!None`). Return
+        :data:`!True` if value has been set, otherwise :data:`!False`.
+        """
+        with self._lock:
+            if self.get(key) != expected:
+                return False
+            self.put(key, value)
+            return True
+
+    def commit(self):
+        """
+        Write values which have not been committed yet. Return
+        :data:`!True` if anything has been written. It is called by the
+        :class:`jobslib.BaseTask` when the iteration succeeds, before the
+        liveness is written.
+        """
+        with self._lock:
+            try:
+                if not self._pending:
+                    return False
+                changes = {
+                    key: (json.loads(value), self._cache[key][1])
+                    for key, value in self._pending.items()
+                }
+                self.write(changes)
+                return True
+            finally:
+                self.rollback()
+
+    def rollback(self):
+        """
+        Throw away values which have not been committed yet and cached
+        values, so the next iteration reads the current checkpoint.
+        """
+        with self._lock:
+            self._pending.clear()
+            self._cache.clear()
+
+    @property
+    def dirty(self):
+        """
+        :data:`!True` if there are values which have not been committed.
+        """
+        return bool(self._pending)
@@ -0,0 +1,177 @@
+"""
+Module :mod:`jobslib.checkpoint.consul` provides :class:`ConsulCheckpoint`,
+checkpoint stored in the Consul's key/value storage.
+"""
+
+import base64
+import json
+import os
+
+from consul import Consul
+from consul.base import ClientError
+from objectvalidator import option
+
+from . import BaseCheckpoint, CheckpointConflictError
+from ..config import ConfigGroup, RetryConfigMixin
+from ..retry import get_circuit_breaker
+
+__all__ = ['ConsulCheckpoint']
+
+
+class ConsulCheckpoint(BaseCheckpoint):
+    """
+    Checkpoint stored in the Consul's key/value storage, so it is shared
+    among datacenters like the :class:`~jobslib.oneinstance.consul.ConsulLock`.
+    Each checkpoint key is stored under ``<key>/`` prefix, commit is done
+    by one transaction with check-and-set of all keys, version of the key
+    is its ``ModifyIndex``.
+
+    For use of :class:`ConsulCheckpoint` write into :mod:`settings`:
+
+    .. code-block:: python
+
+        CHECKPOINT = {
+            'backend': 'jobslib.checkpoint.consul.ConsulCheckpoint',
+            'options': {
+                'host': 'hostname',
+                'port': 8500,
+                'timeout': 1.0,
+                'key': 'jobs/example/checkpoint',
+                'retry_max_attempts': 10,
+                'retry_wait_multiplier': 50,
+            },
+        }
+
+    Or use
+    :envvar:`JOBSLIB_CHECKPOINT_CONSUL_HOST`,
+    :envvar:`JOBSLIB_CHECKPOINT_CONSUL_PORT`,
+    :envvar:`JOBSLIB_CHECKPOINT_CONSUL_TIMEOUT`,
+    :envvar:`JOBSLIB_CHECKPOINT_CONSUL_KEY`,
+    :envvar:`JOBSLIB_CHECKPOINT_CONSUL_RETRY_MAX_ATTEMPTS` and
+    :envvar:`JOBSLIB_CHECKPOINT_CONSUL_RETRY_WAIT_MULTIPLIER`
+    environment variables.
+    """
+
+    class OptionsConfig(RetryConfigMixin, ConfigGroup):
+        """
+        Consul checkpoint options.
+        """
+
+        retry_env_prefix = 'JOBSLIB_CHECKPOINT_CONSUL_'
+
+        @option(required=True, attrtype=str)
+        def scheme(self):
+            """
+            URI scheme, in current implementation always ``http``.
+            """
+            return 'http'
+
+        @option(required=True, attrtype=str)
+        def host(self):
+            """
+            IP address or hostname of the Consul server.
+            """
+            host = os.environ.get('JOBSLIB_CHECKPOINT_CONSUL_HOST')
+            if host:
+                return host
+            return self._settings.get('host', '127.0.0.1')
+
+        @option(required=True, attrtype=int)
+        def port(self):
+            """
+            Port where the Consul server listening on.
+            """
+            port = os.environ.get('JOBSLIB_CHECKPOINT_CONSUL_PORT')
+            if port:
+                return int(port)
+            return self._settings.get('port', 8500)
+
+        @option(required=True, attrtype=float)
+        def timeout(self):
+            """
+            Timeout in seconds for connect/read/write operation.
+            """
+            timeout = os.environ.get('JOBSLIB_CHECKPOINT_CONSUL_TIMEOUT')
+            if timeout:
+                return float(timeout)
+            timeout = self._settings.get('timeout', 5.0)
+            if isinstance(timeout, int):
+                timeout = float(timeout)
+            return timeout
+
+        @option(required=True, attrtype=str)
+        def key(self):
+            """
+            Key prefix under which the checkpoint is stored.
+            """
+            key = os.environ.get('JOBSLIB_CHECKPOINT_CONSUL_KEY')
+            if key:
+                return key.rstrip('/')
+            return self._settings['key'].rstrip('/')
+
+    def __init__(self, context, options):
+        super().__init__(context, options)
+        self._consul = Consul(
+            scheme=self.options.scheme,
+            host=self.options.host,
+            port=self.options.port,
+            timeout=self.options.timeout,
+        )
+        self._circuit_breaker = get_circuit_breaker(
+            '{}://{}:{}'.format(
+                self.options.scheme, self.options.host, self.options.port),
+            self.options)
+
+    def _call(self, func, *args, **kwargs):
+        """
+        Call Consul API *func* through the circuit breaker of the Consul
+        agent, see :mod:`jobslib.retry`. Timeout and retries are trimmed
+        to the :attr:`jobslib.Context.deadline`.
+        """
+        deadline = self.context.deadline
+
+        def _attempt():
+            self._consul.http.timeout = deadline.timeout(self.options.timeout)
+            return func(*args, **kwargs)
+
+        return self._circuit_breaker.call(
+            _attempt,
+            max_attempts=self.options.retry_max_attempts,
+            wait_multiplier=self.options.retry_wait_multiplier,
+            deadline=deadline)
+
+    def _key(self, key):
+        return '{}/{}'.format(self.options.key, key)
+
+    def read(self, key):
+        entry = self._call(self._consul.kv.get, self._key(key))[1]
+        if entry is None:
+            return None, 0
+        return json.loads(entry['Value']), entry['ModifyIndex']
+
+    def write(self, changes):
+        operations = [
+            {
+                'KV': {
+                    'Verb': 'cas',
+                    'Key': self._key(key),
+                    'Value': base64.b64encode(
+                        json.dumps(value).encode('utf-8')).decode('ascii'),
+                    'Index': version,
+                },
+            }
+            for key, (value, version) in changes.items()
+        ]
+
+        def _txn():
+            try:
+                return self._consul.txn.put(operations)
+            except ClientError as exc:
+                # Failed check-and-set is not an error of the agent, so it
+                # is not retried
+                if str(exc).startswith('409'):
+                    return None
+                raise
+
+        if self._call(_txn) is None:
+            raise CheckpointConflictError(', '.join(sorted(changes)))
@@ -0,0 +1,36 @@
+"""
+Module :mod:`jobslib.checkpoint.dummy` provides :class:`DummyCheckpoint`.
+"""
+
+from . import BaseCheckpoint, CheckpointConflictError
+
+__all__ = ['DummyCheckpoint']
+
+
+class DummyCheckpoint(BaseCheckpoint):
+    """
+    Dummy checkpoint implementation, values are kept in the memory of the
+    process, so they are lost when the process exits. It is useful for
+    development. For use of :class:`DummyCheckpoint` write into
+    :mod:`settings`:
+
+    .. code-block:: python
+
+        CHECKPOINT = {
+            'backend': 'jobslib.checkpoint.dummy.DummyCheckpoint',
+        }
+    """
+
+    def __init__(self, context, options):
+        super().__init__(context, options)
+        self._values = {}
+
+    def read(self, key):
+        return self._values.get(key, (None, 0))
+
+    def write(self, changes):
+        for key, (unused_value, version) in changes.items():
+            if self._values.get(key, (None, 0))[1] != version:
+                raise CheckpointConflictError(key)
+        for key, (value, version) in changes.items():
+            self._values[key] = (value, version + 1)
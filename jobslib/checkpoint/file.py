@@ -0,0 +1,87 @@
+"""
+Module :mod:`jobslib.checkpoint.file` provides :class:`FileCheckpoint`,
+checkpoint stored in the local JSON file.
+"""
+
+import fcntl
+import json
+import os
+import tempfile
+
+from objectvalidator import option
+
+from . import BaseCheckpoint, CheckpointConflictError
+from ..config import ConfigGroup
+
+__all__ = ['FileCheckpoint']
+
+
+class FileCheckpoint(BaseCheckpoint):
+    """
+    Checkpoint stored in the local JSON file. File is replaced atomically
+    on commit, concurrent commits of several processes are serialized by
+    :func:`fcntl.flock` on the ``<path>.lock`` file.
+
+    For use of :class:`FileCheckpoint` write into :mod:`settings`:
+
+    .. code-block:: python
+
+        CHECKPOINT = {
+            'backend': 'jobslib.checkpoint.file.FileCheckpoint',
+            'options': {
+                'path': '/var/lib/myapp/checkpoint.json',
+            },
+        }
+
+    Or use :envvar:`JOBSLIB_CHECKPOINT_FILE_PATH` environment variable.
+    """
+
+    class OptionsConfig(ConfigGroup):
+        """
+        File checkpoint options.
+        """
+
+        @option(required=True, attrtype=str)
+        def path(self):
+            """
+            Path to the JSON file, it is created on the first commit.
+            """
+            path = os.environ.get('JOBSLIB_CHECKPOINT_FILE_PATH')
+            if path:
+                return path
+            return self._settings['path']
+
+    def _load(self):
+        try:
+            with open(self.options.path, encoding='utf-8') as fd:
+                return json.load(fd)
+        except FileNotFoundError:
+            return {}
+
+    def read(self, key):
+        record = self._load().get(key)
+        if record is None:
+            return None, 0
+        return record['value'], record['version']
+
+    def write(self, changes):
+        with open(self.options.path + '.lock', 'a') as lock_fd:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            records = self._load()
+            for key, (unused_value, version) in changes.items():
+                if records.get(key, {}).get('version', 0) != version:
+                    raise CheckpointConflictError(key)
+            for key, (value, version) in changes.items():
+                records[key] = {'value': value, 'version': version + 1}
+            dirname = os.path.dirname(os.path.abspath(self.options.path))
+            fd, tmp_path = tempfile.mkstemp(
+                dir=dirname, prefix='.checkpoint-')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as tmp_fd:
+                    json.dump(records, tmp_fd, sort_keys=True)
+                    tmp_fd.flush()
+                    os.fsync(tmp_fd.fileno())
+                os.replace(tmp_path, self.options.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
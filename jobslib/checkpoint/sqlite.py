@@ -0,0 +1,104 @@
+"""
+Module :mod:`jobslib.checkpoint.sqlite` provides :class:`SQLiteCheckpoint`,
+checkpoint stored in the local SQLite file.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+from objectvalidator import option
+
+from . import BaseCheckpoint, CheckpointConflictError
+from ..config import ConfigGroup
+
+__all__ = ['SQLiteCheckpoint']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    version INTEGER NOT NULL
+);
+"""
+
+
+class SQLiteCheckpoint(BaseCheckpoint):
+    """
+    Checkpoint stored in the local SQLite file. Commit is done in one
+    transaction.
+
+    For use of :class:`SQLiteCheckpoint` write into :mod:`settings`:
+
+    .. code-block:: python
+
+        CHECKPOINT = {
+            'backend': 'jobslib.checkpoint.sqlite.SQLiteCheckpoint',
+            'options': {
+                'path': '/var/lib/myapp/checkpoint.sqlite',
+            },
+        }
+
+    Or use :envvar:`JOBSLIB_CHECKPOINT_SQLITE_PATH` environment variable.
+    """
+
+    table = 'jobslib_checkpoint'
+
+    class OptionsConfig(ConfigGroup):
+        """
+        SQLite checkpoint options.
+        """
+
+        @option(required=True, attrtype=str)
+        def path(self):
+            """
+            Path to the SQLite file, it is created if it doesn't exist.
+            """
+            path = os.environ.get('JOBSLIB_CHECKPOINT_SQLITE_PATH')
+            if path:
+                return path
+            return self._settings['path']
+
+    def __init__(self, context, options):
+        super().__init__(context, options)
+        self._connection_lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            self.options.path, timeout=30.0, isolation_level=None,
+            check_same_thread=False)
+        self._connection.executescript(SCHEMA.format(table=self.table))
+
+    def read(self, key):
+        with self._connection_lock:
+            row = self._connection.execute(
+                'SELECT value, version FROM {} WHERE key = ?'.format(
+                    self.table),
+                (key,)).fetchone()
+        if row is None:
+            return None, 0
+        return json.loads(row[0]), row[1]
+
+    def write(self, changes):
+        with self._connection_lock:
+            cursor = self._connection.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                for key, (value, version) in changes.items():
+                    row = cursor.execute(
+                        'SELECT version FROM {} WHERE key = ?'.format(
+                            self.table),
+                        (key,)).fetchone()
+                    if (row[0] if row else 0) != version:
+                        raise CheckpointConflictError(key)
+                    cursor.execute(
+                        'INSERT OR REPLACE INTO {} (key, value, version) '
+                        'VALUES (?, ?, ?)'.format(self.table),
+                        (key, json.dumps(value), version + 1))
+            except BaseException:
+                cursor.execute('ROLLBACK')
+                raise
+            cursor.execute('COMMIT')
+
+    def close(self):
+        with self._connection_lock:
+            self._connection.close()
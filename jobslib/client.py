@@ -0,0 +1,155 @@
+"""
+Module :mod:`jobslib.client` provides thin client of the
+:mod:`jobslib.server`. Client passes command line arguments, environment
+variables and working directory to the server, which forks and runs the
+task. Output of the task and its exit code are streamed back, so client
+behaves like the ``runjob`` command. If server is not available, task is
+run by the client itself.
+
+Module imports only Python's standard library, so client starts fast.
+
+.. code-block:: console
+
+    $ runjob-client --socket /run/myapp/jobslib.sock \\
+        -s myapp.settings --run-once myapp.task.HelloWorld
+"""
+
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+
+__all__ = ['client_main', 'send_frame', 'recv_frame']
+
+FRAME_HEADER = struct.Struct('!cI')
+EXIT_CODE = struct.Struct('!i')
+
+# Frame types
+REQUEST = b'R'
+STDOUT = b'O'
+STDERR = b'E'
+EXIT = b'X'
+KILL = b'K'
+
+
+def send_frame(sock, kind, payload=b''):
+    """
+    Send one frame of the type *kind* containing *payload* into *sock*.
+    """
+    sock.sendall(FRAME_HEADER.pack(kind, len(payload)) + payload)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 65536))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_frame(sock):
+    """
+    Receive one frame from *sock* and return ``(kind, payload)``. Return
+    ``(None, None)`` if connection has been closed.
+    """
+    header = _recv_exactly(sock, FRAME_HEADER.size)
+    if header is None:
+        return None, None
+    kind, size = FRAME_HEADER.unpack(header)
+    payload = _recv_exactly(sock, size) if size else b''
+    if payload is None:
+        return None, None
+    return kind, payload
+
+
+def run_locally(args):
+    """
+    Run task in the current process, like ``runjob`` command.
+    """
+    from .main import main
+    main(args)
+    return 0
+
+
+def run_remotely(sock, args):
+    """
+    Ask server connected by *sock* to run task with command line
+    arguments *args*. Return exit code of the task.
+    """
+    request = {
+        'args': args,
+        'env': dict(os.environ),
+        'cwd': os.getcwd(),
+    }
+    send_frame(sock, REQUEST, json.dumps(request).encode('utf-8'))
+
+    def forward_signal(signum, unused_frame):
+        send_frame(sock, KILL, EXIT_CODE.pack(signum))
+
+    signal.signal(signal.SIGTERM, forward_signal)
+    signal.signal(signal.SIGINT, forward_signal)
+    try:
+        while 1:
+            kind, payload = recv_frame(sock)
+            if kind == STDOUT:
+                sys.stdout.buffer.write(payload)
+                sys.stdout.buffer.flush()
+            elif kind == STDERR:
+                sys.stderr.buffer.write(payload)
+                sys.stderr.buffer.flush()
+            elif kind == EXIT:
+                return EXIT_CODE.unpack(payload)[0]
+            else:
+                sys.stderr.write('Connection to the jobslib server lost\n')
+                return 1
+    finally:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+
+def client_main(args=None):
+    """
+    Entry point of the ``runjob-client`` command. Optional argument
+    ``--socket PATH`` must be the first one, otherwise path of the socket
+    is read from **JOBSLIB_SERVER_SOCKET** environment variable. The rest
+    of the arguments are the same as ``runjob`` arguments.
+    """
+    if args is None:
+        args = sys.argv[1:]
+    args = list(args)
+    socket_path = os.environ.get('JOBSLIB_SERVER_SOCKET')
+    if args[:1] == ['--socket']:
+        if len(args) < 2:
+            sys.stderr.write(
+                'usage: runjob-client [--socket PATH] [runjob arguments]\n'
+                'runjob-client: error: argument --socket: expected one '
+                'argument\n')
+            sys.exit(2)
+        socket_path = args[1]
+        args = args[2:]
+    elif args[:1] and args[0].startswith('--socket='):
+        socket_path = args[0].split('=', 1)[1]
+        args = args[1:]
+
+    sock = None
+    if socket_path:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            sock.close()
+            sock = None
+
+    if sock is None:
+        sys.exit(run_locally(args))
+    with sock:
+        sys.exit(run_remotely(sock, args))
+
+
+if __name__ == '__main__':
+    client_main()
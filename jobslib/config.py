@@ -3,17 +3,127 @@ Module :mod:`jobslib.config` provides base class which encapsulates
 configuration.
 """
 
+import functools
+import importlib
+import inspect
 import json
 import logging.config
 import os
+import types
 
 from objectvalidator import option, OptionsContainer
 
 from .context import Context
-from .imports import import_object
+from .imports import import_object, validate_object_path
 from .logging import BASE_LOGGING
 
-__all__ = ['Config', 'ConfigGroup']
+__all__ = ['Config', 'ConfigGroup', 'lazy_option']
+
+
+class lazy_option(object):
+    """
+    Decorator like :class:`option`, but value is read, validated and
+    cached on the first access instead of during initialization of the
+    container. Use it for values which are expensive to read, e.g. classes
+    from the heavy modules. Validate cheap part of the value (e.g. module
+    path) in the regular :class:`option`, so invalid configuration still
+    fails during initialization. All lazy options are resolved by
+    :meth:`Config.validate` before the first iteration of the task.
+
+    .. code-block:: python
+
+        @option(required=True, attrtype=str)
+        def backend_path(self):
+            return validate_object_path(self._settings['backend'])
+
+        @lazy_option
+        def backend(self):
+            return import_object(self.backend_path)
+    """
+
+    def __init__(self, func=None, required=False, attrtype=None):
+        if func is None:
+            self._option = None
+            self._required = required
+            self._attrtype = attrtype
+        else:
+            self._wrap(func, required, attrtype)
+
+    def __call__(self, func):
+        # Decorated with arguments: @lazy_option(required=True, ...)
+        self._wrap(func, self._required, self._attrtype)
+        return self
+
+    def _wrap(self, func, required, attrtype):
+        self._option = option(func, required=required, attrtype=attrtype)
+        functools.update_wrapper(self, func)
+
+    def __get__(self, inst, objtype):
+        if inst is None:
+            return self
+        return self._option.__get__(inst, objtype)
+
+    def __set__(self, inst, value):
+        raise TypeError('Object does not support item assignment')
+
+    @classmethod
+    def get_option_names(cls, inst):
+        """
+        Return :class:`!list` of the method's names on *inst* instance
+        which are decorated by :class:`lazy_option` decorator.
+        """
+        return [
+            name for name, value in inspect.getmembers(inst.__class__)
+            if isinstance(value, cls)
+        ]
+
+
+def diff_options(old, new, prefix=''):
+    """
+    Return :class:`!list` of the names of the options (including lazy
+    options) whose values differ between *old* and *new* containers.
+    Nested :class:`ConfigGroup` containers are compared recursively, their
+    option names are joined by dot.
+    """
+    if old.__class__ is not new.__class__:
+        return [prefix.rstrip('.')] if prefix else ['*']
+    names = option.get_option_names(old) + lazy_option.get_option_names(old)
+    changes = []
+    for name in sorted(names):
+        changes.extend(_diff_values(
+            getattr(old, name), getattr(new, name), prefix + name))
+    return changes
+
+
+def resolve_lazy_options(container):
+    """
+    Read all lazy options of the *container* and of its nested
+    containers, so invalid value raises exception.
+    """
+    names = option.get_option_names(container) + \
+        lazy_option.get_option_names(container)
+    for name in names:
+        value = getattr(container, name)
+        values = value if isinstance(value, (list, tuple)) else [value]
+        for value in values:
+            if isinstance(value, OptionsContainer):
+                resolve_lazy_options(value)
+
+
+def _diff_values(old, new, name):
+    if isinstance(old, ConfigGroup) and isinstance(new, ConfigGroup):
+        return diff_options(old, new, name + '.')
+    if (isinstance(old, (list, tuple)) and isinstance(new, (list, tuple))
+            and len(old) == len(new)
+            and any(isinstance(v, ConfigGroup) for v in old)):
+        changes = []
+        for i, (old_value, new_value) in enumerate(zip(old, new)):
+            changes.extend(_diff_values(
+                old_value, new_value, '{}.{}'.format(name, i)))
+        return changes
+    if old != new:
+        return [name]
+    return []
 
 
 class ConfigGroup(OptionsContainer):
@@ -128,6 +238,38 @@ class Config(OptionsContainer):
         """
         pass
 
+    def reload(self):
+        """
+        Re-read :mod:`settings` module and environment variables and return
+        new instance of the configuration. Command line arguments are kept.
+        If configuration is not valid, exception is raised.
+        """
+        settings = self._settings
+        if isinstance(settings, types.ModuleType):
+            settings = importlib.reload(settings)
+        elif callable(getattr(type(settings), 'reload', None)):
+            settings = settings.reload()
+        config = self.__class__(settings, self._args_parser, self._task_cls)
+        config.validate()
+        return config
+
+    def validate(self):
+        """
+        Resolve all lazy options, i.e. import backend classes and validate
+        their options. Raise exception if configuration is not valid. It is
+        called by :class:`jobslib.BaseTask` before the first iteration, so
+        invalid configuration fails fast instead of failing iterations.
+        """
+        resolve_lazy_options(self)
+
+    def diff(self, other):
+        """
+        Return :class:`!list` of the names of the options whose values
+        differ in the *other* configuration. Names of the nested options
+        are joined by dot, e.g. ``metrics.options``.
+        """
+        return diff_options(self, other)
+
     def _configure_logging(self):
         """
         Configure Python's logging according to configuration stored in the
@@ -238,6 +380,79 @@ class Config(OptionsContainer):
             return bool(int(keep_lock))
         return getattr(self._settings, 'KEEP_LOCK', False)
 
+    @option(attrtype=int)
+    def heartbeat_interval(self):
+        """
+        Minimal interval in seconds between two heartbeats, see
+        :meth:`jobslib.BaseTask.heartbeat`. More frequent heartbeats are
+        ignored. Default is 10 seconds.
+        """
+        heartbeat_interval = os.environ.get('JOBSLIB_HEARTBEAT_INTERVAL')
+        if heartbeat_interval:
+            heartbeat_interval = int(heartbeat_interval)
+        else:
+            heartbeat_interval = getattr(
+                self._settings, 'HEARTBEAT_INTERVAL', 10)
+        if heartbeat_interval < 0:
+            raise ValueError('Heartbeat interval may not be less than 0')
+        return heartbeat_interval
+
+    @option(attrtype=float)
+    def bookkeeping_timeout(self):
+        """
+        Maximum time in seconds to wait for writing liveness and pushing
+        metrics at the end of the iteration, liveness is written while the
+        lock is released.
+        When the task is done, :attr:`jobslib.Context.deadline` is reset
+        to this timeout, see
+        :meth:`jobslib.Context.reset_bookkeeping_deadline`. Default is
+        30 seconds.
+        """
+        bookkeeping_timeout = os.environ.get('JOBSLIB_BOOKKEEPING_TIMEOUT')
+        if bookkeeping_timeout:
+            bookkeeping_timeout = float(bookkeeping_timeout)
+        else:
+            bookkeeping_timeout = getattr(
+                self._settings, 'BOOKKEEPING_TIMEOUT', 30)
+            if isinstance(bookkeeping_timeout, int):
+                bookkeeping_timeout = float(bookkeeping_timeout)
+        if bookkeeping_timeout <= 0:
+            raise ValueError('Bookkeeping timeout must be greater than 0')
+        return bookkeeping_timeout
+
+    @option(attrtype=float)
+    def iteration_timeout(self):
+        """
+        Maximum duration of one iteration in seconds, see
+        :attr:`jobslib.Context.deadline`. If value is 0, iteration's
+        deadline never expires. Default is 0.
+        """
+        iteration_timeout = os.environ.get('JOBSLIB_ITERATION_TIMEOUT')
+        if iteration_timeout:
+            iteration_timeout = float(iteration_timeout)
+        else:
+            iteration_timeout = getattr(
+                self._settings, 'ITERATION_TIMEOUT', 0)
+            if isinstance(iteration_timeout, int):
+                iteration_timeout = float(iteration_timeout)
+        if iteration_timeout < 0:
+            raise ValueError('Iteration timeout may not be less than 0')
+        return iteration_timeout
+
+    @option
+    def resource_metrics(self):
+        """
+        :class:`!bool` that indicates that resources used during each
+        iteration (CPU time, maximum RSS, page faults, context switches
+        and garbage collections) are pushed into metrics, see
+        :class:`jobslib.resources.ResourceUsage`. Default is
+        :data:`!False`.
+        """
+        resource_metrics = os.environ.get('JOBSLIB_RESOURCE_METRICS')
+        if resource_metrics:
+            return bool(int(resource_metrics))
+        return getattr(self._settings, 'RESOURCE_METRICS', False)
+
     @option
     def one_instance(self):
         """
@@ -261,20 +476,49 @@ class Config(OptionsContainer):
         return MetricsConfig(
             getattr(self._settings, 'METRICS', {}), self._args_parser)
 
+    @option
+    def checkpoint(self):
+        """
+        Configuration of the checkpoint store. Instance of the
+        :class:`CheckpointConfig`.
+        """
+        return CheckpointConfig(
+            getattr(self._settings, 'CHECKPOINT', {}), self._args_parser)
+
+    @option
+    def queue(self):
+        """
+        Configuration of the work queue of the :class:`jobslib.QueueTask`.
+        Instance of the :class:`QueueConfig`.
+        """
+        return QueueConfig(
+            getattr(self._settings, 'QUEUE', {}), self._args_parser)
+
+    @option
+    def memory_tracking(self):
+        """
+        Configuration of the memory growth tracking. Instance of the
+        :class:`MemoryTrackingConfig`.
+        """
+        return MemoryTrackingConfig(
+            getattr(self._settings, 'MEMORY_TRACKING', {}),
+            self._args_parser)
+
 
 class OneInstanceConfig(ConfigGroup):
     """
     Configuration of the one instance lock.
     """
 
-    @option
-    def backend(self):
+    @option(required=True, attrtype=str)
+    def backend_path(self):
         """
         One instance lock implementation class. Value must be Python's module
         path ``[package.[submodule.]]module.ClassName``. For development
         purposes you can use ``jobslib.oneinstance.dummy.DummyLock``. If
         ``--disable-one-instance`` argument is passed,
         :class:`jobslib.oneinstance.dummy.DummyLock` will be forced.
+        Existence of the module is checked, but module is not imported.
         """
         if self._args_parser.disable_one_instance:
             cls_name = 'jobslib.oneinstance.dummy.DummyLock'
@@ -282,13 +526,22 @@ class OneInstanceConfig(ConfigGroup):
             cls_name = os.environ.get('JOBSLIB_ONE_INSTANCE_BACKEND')
             if not cls_name:
                 cls_name = self._settings['backend']
-        return import_object(cls_name)
+        return validate_object_path(cls_name)
 
-    @option
+    @lazy_option
+    def backend(self):
+        """
+        One instance lock implementation class, it is imported on the
+        first access.
+        """
+        return import_object(self.backend_path)
+
+    @lazy_option
     def options(self):
         """
         Constructor's arguments of the one instance implementation class.
-        It depends on :meth:`backend` attribute.
+        It depends on :meth:`backend` attribute, so it is read on the first
+        access.
         """
         return self.backend.OptionsConfig(
             self._settings.get('options', {}), self._args_parser)
@@ -299,22 +552,31 @@ class LivenessConfig(ConfigGroup):
     Configuration of the liveness writer.
     """
 
-    @option
-    def backend(self):
+    @option(required=True, attrtype=str)
+    def backend_path(self):
         """
         Liveness implementation class. If value is not defined, default
-        value ``jobslib.liveness.dummy.DummyLiveness`` is used.
+        value ``jobslib.liveness.dummy.DummyLiveness`` is used. Existence of
+        the module is checked, but module is not imported.
         """
         cls_name = os.environ.get('JOBSLIB_LIVENESS_BACKEND')
         if not cls_name:
             cls_name = self._settings.get(
                 'backend', 'jobslib.liveness.dummy.DummyLiveness')
-        return import_object(cls_name)
+        return validate_object_path(cls_name)
 
-    @option
+    @lazy_option
+    def backend(self):
+        """
+        Liveness implementation class, it is imported on the first access.
+        """
+        return import_object(self.backend_path)
+
+    @lazy_option
     def options(self):
         """
-        Constructor's arguments of the liveness implementation class.
+        Constructor's arguments of the liveness implementation class. It is
+        read on the first access.
         """
         return self.backend.OptionsConfig(
             self._settings.get('options', {}), self._args_parser)
@@ -325,26 +587,265 @@ class MetricsConfig(ConfigGroup):
     Configuration of the metrics writer.
     """
 
-    @option
-    def backend(self):
+    @option(required=True, attrtype=str)
+    def backend_path(self):
         """
         Metrics implementation class. If value is not defined, default
-        value ``jobslib.metrics.dummy.DummyMetrics`` is used.
+        value ``jobslib.metrics.dummy.DummyMetrics`` is used. Existence of
+        the module is checked, but module is not imported.
         """
         cls_name = os.environ.get('JOBSLIB_METRICS_BACKEND')
         if not cls_name:
             cls_name = self._settings.get(
                 'backend', 'jobslib.metrics.dummy.DummyMetrics')
-        return import_object(cls_name)
+        return validate_object_path(cls_name)
 
-    @option
+    @lazy_option
+    def backend(self):
+        """
+        Metrics implementation class, it is imported on the first access.
+        """
+        return import_object(self.backend_path)
+
+    @lazy_option
+    def options(self):
+        """
+        Constructor's arguments of the metrics implementation class. It is
+        read on the first access.
+        """
+        return self.backend.OptionsConfig(
+            self._settings.get('options', {}), self._args_parser)
+
+    @option(required=True, attrtype=int)
+    def summary_interval(self):
+        """
+        Interval in seconds in which summaries (including
+        ``job_duration_seconds`` and timers) are pushed as pre-aggregated
+        quantiles and counts. If value is 0, ``job_duration_seconds`` is
+        pushed as a raw value at the end of each iteration. Default is 0.
+        """
+        summary_interval = os.environ.get('JOBSLIB_METRICS_SUMMARY_INTERVAL')
+        if summary_interval:
+            summary_interval = int(summary_interval)
+        else:
+            summary_interval = self._settings.get('summary_interval', 0)
+        if summary_interval < 0:
+            raise ValueError('Summary interval may not be less than 0')
+        return summary_interval
+
+    @option(required=True, attrtype=tuple)
+    def summary_quantiles(self):
+        """
+        Quantiles which are pushed for summaries. Default is
+        ``(0.5, 0.9, 0.99)``.
+        """
+        quantiles = tuple(
+            self._settings.get('summary_quantiles', (0.5, 0.9, 0.99)))
+        for q in quantiles:
+            if not 0 <= q <= 1:
+                raise ValueError('Quantile must be between 0 and 1')
+        return quantiles
+
+    @option(required=True, attrtype=tuple)
+    def histogram_buckets(self):
+        """
+        Upper boundaries of the buckets of histograms and timers. Default
+        is ``(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+        10.0)``, bucket ``+Inf`` is always added.
+        """
+        buckets = tuple(self._settings.get(
+            'histogram_buckets',
+            (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)))
+        if not buckets:
+            raise ValueError('At least one histogram bucket is required')
+        return buckets
+
+
+class CheckpointConfig(ConfigGroup):
+    """
+    Configuration of the checkpoint store.
+    """
+
+    @option(required=True, attrtype=str)
+    def backend_path(self):
+        """
+        Checkpoint implementation class. If value is not defined, default
+        value ``jobslib.checkpoint.dummy.DummyCheckpoint`` is used.
+        Existence of the module is checked, but module is not imported.
+        """
+        cls_name = os.environ.get('JOBSLIB_CHECKPOINT_BACKEND')
+        if not cls_name:
+            cls_name = self._settings.get(
+                'backend', 'jobslib.checkpoint.dummy.DummyCheckpoint')
+        return validate_object_path(cls_name)
+
+    @lazy_option
+    def backend(self):
+        """
+        Checkpoint implementation class, it is imported on the first
+        access.
+        """
+        return import_object(self.backend_path)
+
+    @lazy_option
+    def options(self):
+        """
+        Constructor's arguments of the checkpoint implementation class. It
+        is read on the first access.
+        """
+        return self.backend.OptionsConfig(
+            self._settings.get('options', {}), self._args_parser)
+
+
+class QueueConfig(ConfigGroup):
+    """
+    Configuration of the work queue and its processing by the
+    :class:`jobslib.QueueTask`.
+    """
+
+    @option(required=True, attrtype=str)
+    def backend_path(self):
+        """
+        Queue implementation class. If value is not defined, default value
+        ``jobslib.queue.dummy.DummyQueue`` is used. Existence of the module
+        is checked, but module is not imported.
+        """
+        cls_name = os.environ.get('JOBSLIB_QUEUE_BACKEND')
+        if not cls_name:
+            cls_name = self._settings.get(
+                'backend', 'jobslib.queue.dummy.DummyQueue')
+        return validate_object_path(cls_name)
+
+    @lazy_option
+    def backend(self):
+        """
+        Queue implementation class, it is imported on the first access.
+        """
+        return import_object(self.backend_path)
+
+    @lazy_option
     def options(self):
         """
-        Constructor's arguments of the metrics implementation class.
+        Constructor's arguments of the queue implementation class. It is
+        read on the first access.
         """
         return self.backend.OptionsConfig(
             self._settings.get('options', {}), self._args_parser)
 
+    @option(required=True, attrtype=int)
+    def batch_size(self):
+        """
+        Maximum number of the items fetched at once. Default is 100.
+        """
+        batch_size = os.environ.get('JOBSLIB_QUEUE_BATCH_SIZE')
+        if batch_size:
+            batch_size = int(batch_size)
+        else:
+            batch_size = self._settings.get('batch_size', 100)
+        if batch_size <= 0:
+            raise ValueError('Batch size must be greater than 0')
+        return batch_size
+
+    @option(required=True, attrtype=int)
+    def workers(self):
+        """
+        Number of the threads (or processes) which process items of the
+        batch. Default is 4.
+        """
+        workers = os.environ.get('JOBSLIB_QUEUE_WORKERS')
+        if workers:
+            workers = int(workers)
+        else:
+            workers = self._settings.get('workers', 4)
+        if workers <= 0:
+            raise ValueError('Number of the workers must be greater than 0')
+        return workers
+
+    @option(required=True, attrtype=str)
+    def pool(self):
+        """
+        Kind of the worker pool, either ``thread`` or ``process``. Default
+        is ``thread``.
+        """
+        pool = os.environ.get('JOBSLIB_QUEUE_POOL')
+        if not pool:
+            pool = self._settings.get('pool', 'thread')
+        if pool not in ('thread', 'process'):
+            raise ValueError('Pool must be either thread or process')
+        return pool
+
+    @option
+    def prefetch(self):
+        """
+        :class:`!bool` that indicates that the next batch is fetched while
+        the current one is processed. Default is :data:`!True`.
+        """
+        prefetch = os.environ.get('JOBSLIB_QUEUE_PREFETCH')
+        if prefetch:
+            return bool(int(prefetch))
+        return self._settings.get('prefetch', True)
+
+
+class MemoryTrackingConfig(ConfigGroup):
+    """
+    Configuration of the memory growth tracking, see
+    :class:`jobslib.memory.MemoryTracker`.
+    """
+
+    @option(required=True, attrtype=int)
+    def interval(self):
+        """
+        Number of iterations between two :mod:`tracemalloc` snapshots.
+        If value is 0, tracking is disabled. Default is 0.
+        """
+        interval = os.environ.get('JOBSLIB_MEMORY_TRACKING_INTERVAL')
+        if interval:
+            interval = int(interval)
+        else:
+            interval = self._settings.get('interval', 0)
+        if interval < 0:
+            raise ValueError('Interval may not be less than 0')
+        return interval
+
+    @option(required=True, attrtype=int)
+    def top(self):
+        """
+        Number of the top growing allocation sites which are logged and
+        pushed into metrics. Default is 10.
+        """
+        return self._settings.get('top', 10)
+
+    @option(required=True, attrtype=int)
+    def frames(self):
+        """
+        Number of frames of the traceback by which allocation sites are
+        grouped. Default is 1.
+        """
+        frames = self._settings.get('frames', 1)
+        if frames < 1:
+            raise ValueError('Number of frames may not be less than 1')
+        return frames
+
+    @option(attrtype=str)
+    def dump_dir(self):
+        """
+        Directory where snapshots are dumped when memory grows by more
+        than :attr:`dump_threshold`. If value is not defined, snapshots
+        are not dumped.
+        """
+        dump_dir = os.environ.get('JOBSLIB_MEMORY_TRACKING_DUMP_DIR')
+        if dump_dir:
+            return dump_dir
+        return self._settings.get('dump_dir')
+
+    @option(required=True, attrtype=int)
+    def dump_threshold(self):
+        """
+        Memory growth in bytes since the previous snapshot, which causes
+        dumping of the snapshot. Default is 10 MiB.
+        """
+        return self._settings.get('dump_threshold', 10 * 1024 * 1024)
+
 
 class RetryConfigMixin(object):
 
@@ -374,3 +875,191 @@ class RetryConfigMixin(object):
         else:
             multiplier = self._settings.get('retry_wait_multiplier', 50)
         return multiplier
+
+    @option(required=True, attrtype=int)
+    def circuit_breaker_threshold(self):
+        """
+        Number of consecutive failed calls after which circuit of the
+        endpoint is opened and calls fail immediately, see
+        :mod:`jobslib.retry`. Value 0 disables circuit breaker. Default
+        is 5.
+        """
+        env_name = "{}{}".format(
+            self.retry_env_prefix, 'CIRCUIT_BREAKER_THRESHOLD')
+        if env_name in os.environ:
+            threshold = int(os.environ.get(env_name))
+        else:
+            threshold = self._settings.get('circuit_breaker_threshold', 5)
+        if threshold < 0:
+            raise ValueError('Threshold may not be less than 0')
+        return threshold
+
+    @option(required=True, attrtype=float)
+    def circuit_breaker_reset_timeout(self):
+        """
+        Seconds after which open circuit lets one probe call through.
+        Default is 30 seconds.
+        """
+        env_name = "{}{}".format(
+            self.retry_env_prefix, 'CIRCUIT_BREAKER_RESET_TIMEOUT')
+        if env_name in os.environ:
+            reset_timeout = float(os.environ.get(env_name))
+        else:
+            reset_timeout = self._settings.get(
+                'circuit_breaker_reset_timeout', 30.0)
+            if isinstance(reset_timeout, int):
+                reset_timeout = float(reset_timeout)
+        if reset_timeout < 0:
+            raise ValueError('Reset timeout may not be less than 0')
+        return reset_timeout
+
+    @option(required=True, attrtype=float)
+    def retry_budget_ratio(self):
+        """
+        Retries allowed per call, e.g. 0.2 means that retries are at most
+        20 % of calls of the endpoint. Default is 0.2.
+        """
+        env_name = "{}{}".format(self.retry_env_prefix, 'RETRY_BUDGET_RATIO')
+        if env_name in os.environ:
+            ratio = float(os.environ.get(env_name))
+        else:
+            ratio = self._settings.get('retry_budget_ratio', 0.2)
+            if isinstance(ratio, int):
+                ratio = float(ratio)
+        if ratio < 0:
+            raise ValueError('Retry budget ratio may not be less than 0')
+        return ratio
+
+    @option(required=True, attrtype=int)
+    def retry_budget_capacity(self):
+        """
+        Maximum number of retries saved in the retry budget, so short
+        bursts of failures can be retried. Default is 10.
+        """
+        env_name = "{}{}".format(
+            self.retry_env_prefix, 'RETRY_BUDGET_CAPACITY')
+        if env_name in os.environ:
+            capacity = int(os.environ.get(env_name))
+        else:
+            capacity = self._settings.get('retry_budget_capacity', 10)
+        if capacity < 0:
+            raise ValueError('Retry budget capacity may not be less than 0')
+        return capacity
+
+
+class BufferConfigMixin(object):
+
+    @option(required=True, attrtype=int)
+    def buffer_size(self):
+        """
+        Maximum number of the points in the buffer. If value is 0, buffer
+        is disabled and points are written synchronously. Default is 0.
+        """
+        env_name = "{}{}".format(self.buffer_env_prefix, 'BUFFER_SIZE')
+        if env_name in os.environ:
+            buffer_size = int(os.environ.get(env_name))
+        else:
+            buffer_size = self._settings.get('buffer_size', 0)
+        if buffer_size < 0:
+            raise ValueError('Buffer size may not be less than 0')
+        return buffer_size
+
+    @option(required=True, attrtype=int)
+    def buffer_batch_size(self):
+        """
+        Maximum number of the points written in one batch. Batch is
+        written as soon as buffer contains this number of the points.
+        Default is 1000.
+        """
+        env_name = "{}{}".format(self.buffer_env_prefix, 'BUFFER_BATCH_SIZE')
+        if env_name in os.environ:
+            batch_size = int(os.environ.get(env_name))
+        else:
+            batch_size = self._settings.get('buffer_batch_size', 1000)
+        if batch_size < 1:
+            raise ValueError('Batch size may not be less than 1')
+        return batch_size
+
+    @option(required=True, attrtype=float)
+    def buffer_flush_interval(self):
+        """
+        Maximum age of the points in the buffer in seconds. Buffer is
+        flushed at least once per this interval. Default is 10 seconds.
+        """
+        env_name = "{}{}".format(
+            self.buffer_env_prefix, 'BUFFER_FLUSH_INTERVAL')
+        if env_name in os.environ:
+            flush_interval = float(os.environ.get(env_name))
+        else:
+            flush_interval = self._settings.get('buffer_flush_interval', 10.0)
+            if isinstance(flush_interval, int):
+                flush_interval = float(flush_interval)
+        if flush_interval <= 0:
+            raise ValueError('Flush interval must be greater than 0')
+        return flush_interval
+
+    @option(required=True, attrtype=str)
+    def buffer_overflow_policy(self):
+        """
+        What to do when buffer is full. ``drop_oldest`` drops the oldest
+        points, ``drop_newest`` drops pushed points, ``block`` waits at
+        most :attr:`buffer_flush_interval` seconds until there is a free
+        space in the buffer, then pushed points are dropped. Default is
+        ``drop_oldest``.
+        """
+        env_name = "{}{}".format(
+            self.buffer_env_prefix, 'BUFFER_OVERFLOW_POLICY')
+        if env_name in os.environ:
+            policy = os.environ.get(env_name)
+        else:
+            policy = self._settings.get(
+                'buffer_overflow_policy', 'drop_oldest')
+        if policy not in ('drop_oldest', 'drop_newest', 'block'):
+            raise ValueError('Invalid overflow policy: {}'.format(policy))
+        return policy
+
+
+class SpoolConfigMixin(object):
+
+    @option(attrtype=str)
+    def spool_dir(self):
+        """
+        Directory where points are spooled when the backend is not
+        available. If value is not defined, spool is disabled and points
+        are dropped.
+        """
+        env_name = "{}{}".format(self.spool_env_prefix, 'SPOOL_DIR')
+        spool_dir = os.environ.get(env_name)
+        if spool_dir:
+            return spool_dir
+        return self._settings.get('spool_dir')
+
+    @option(required=True, attrtype=int)
+    def spool_max_bytes(self):
+        """
+        Maximum size of the spool in bytes, the oldest points are evicted
+        when the spool is full. Default is 100 MiB.
+        """
+        env_name = "{}{}".format(self.spool_env_prefix, 'SPOOL_MAX_BYTES')
+        if env_name in os.environ:
+            max_bytes = int(os.environ.get(env_name))
+        else:
+            max_bytes = self._settings.get('spool_max_bytes', 100 * 2 ** 20)
+        if max_bytes < 1:
+            raise ValueError('Spool size must be greater than 0')
+        return max_bytes
+
+    @option(required=True, attrtype=int)
+    def spool_batch_size(self):
+        """
+        Maximum number of the points written in one batch when spool is
+        replayed. Default is 1000.
+        """
+        env_name = "{}{}".format(self.spool_env_prefix, 'SPOOL_BATCH_SIZE')
+        if env_name in os.environ:
+            batch_size = int(os.environ.get(env_name))
+        else:
+            batch_size = self._settings.get('spool_batch_size', 1000)
+        if batch_size < 1:
+            raise ValueError('Batch size may not be less than 1')
+        return batch_size
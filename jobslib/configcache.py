@@ -0,0 +1,392 @@
+"""
+Module :mod:`jobslib.configcache` provides :class:`ConfigCache`, cache of
+the resolved configuration. It speeds up start of the short-running
+tasks (e.g. :option:`--run-once` tasks launched by cron), because values
+of the configuration are not read and validated again and :mod:`settings`
+module is not imported until it is necessary.
+
+Cache is enabled by :envvar:`JOBSLIB_CONFIG_CACHE` environment variable,
+which contains path to the directory where snapshots of the configuration
+are stored. Snapshot is identified by Python's and **jobslib** version,
+task class, :mod:`settings` module path, command line arguments and
+``JOBSLIB_*`` environment variables. If :mod:`settings` read other
+environment variables, list them in ``CONFIG_CACHE_ENVIRON`` setting,
+snapshot is invalidated when their values change:
+
+.. code-block:: python
+
+    CONFIG_CACHE_ENVIRON = ['MYAPP_AUTH_SERVICE_URI']
+
+Snapshot is invalidated when the :mod:`settings` module, any non-standard
+module imported while :mod:`settings` are evaluated (e.g. shared base
+settings) or module of any class from the configuration is modified.
+Modules imported before, e.g. preloaded by the :mod:`jobslib.server`,
+are not tracked. Snapshot contains values from the :mod:`settings`
+(including passwords), so it is readable only by owner.
+"""
+
+import contextlib
+import hashlib
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import sys
+import tempfile
+
+from objectvalidator import option
+
+from .config import Config, ConfigGroup
+from .version import VERSION
+
+__all__ = ['ConfigCache', 'LazySettings']
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 2
+
+MAX_SNAPSHOTS = 10
+
+
+class LazySettings(object):
+    """
+    Proxy of the :mod:`settings` module, module is imported on the first
+    access of its attribute.
+    """
+
+    def __init__(self, name):
+        self.__name__ = name
+        self._module = None
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        if self._module is None:
+            self._module = importlib.import_module(self.__name__)
+        return getattr(self._module, name)
+
+    def reload(self):
+        """
+        Import or reload :mod:`settings` module and return it.
+        """
+        if self._module is None:
+            return importlib.import_module(self.__name__)
+        return importlib.reload(self._module)
+
+
+def get_module_file(name):
+    """
+    Return path of the module *name* without importing it (only parent
+    packages are imported), or :data:`!None` if module hasn't file.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return getattr(module, '__file__', None)
+    spec = importlib.util.find_spec(name)
+    if spec is None or not spec.has_location:
+        return None
+    return spec.origin
+
+
+def is_stdlib_file(filename):
+    """
+    Return :data:`!True` if *filename* is a module of the Python's
+    standard library.
+    """
+    import sysconfig
+    filename = os.path.realpath(filename)
+    if 'site-packages' in filename or 'dist-packages' in filename:
+        return False
+    paths = sysconfig.get_paths()
+    return any(
+        filename.startswith(os.path.realpath(paths[name]) + os.sep)
+        for name in ('stdlib', 'platstdlib'))
+
+
+def get_class_path(cls):
+    """
+    Return importable path of the class *cls*.
+    """
+    if '<locals>' in cls.__qualname__:
+        raise TypeError("Local class {!r} can't be imported".format(cls))
+    return '{}:{}'.format(cls.__module__, cls.__qualname__)
+
+
+def import_class(path):
+    """
+    Import and return class according to *path* returned from
+    :func:`get_class_path`.
+    """
+    module_name, qualname = path.split(':')
+    obj = importlib.import_module(module_name)
+    for attr in qualname.split('.'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+class ConfigCache(object):
+    """
+    Cache of the resolved configuration in the *directory*. Only values
+    of the :class:`~objectvalidator.option` attributes are stored,
+    :class:`~jobslib.config.lazy_option` attributes (e.g. backend classes
+    and their options) are read on the first access from the
+    :mod:`settings` values stored in the snapshot. If any value can't be
+    stored (it is not JSON serializable, class, tuple or
+    :class:`~jobslib.ConfigGroup`), snapshot is not created.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._imported_files = set()
+
+    @classmethod
+    def from_environ(cls):
+        """
+        Return instance according to :envvar:`JOBSLIB_CONFIG_CACHE`
+        environment variable, or :data:`!None` if cache is disabled.
+        """
+        directory = os.environ.get('JOBSLIB_CONFIG_CACHE')
+        if not directory:
+            return None
+        return cls(directory)
+
+    def get_path(self, settings_module, args_parser, task_cls):
+        """
+        Return path of the snapshot file for the configuration of the
+        *task_cls* task.
+        """
+        task = [
+            '{}.{}'.format(task_cls.__module__, task_cls.__qualname__),
+            settings_module or '',
+        ]
+        key = task + [
+            SNAPSHOT_VERSION, VERSION, sys.version,
+            sorted((k, repr(v)) for k, v in vars(args_parser).items()),
+            sorted(
+                (k, v) for k, v in os.environ.items()
+                if k.startswith('JOBSLIB_')),
+        ]
+        prefix = hashlib.sha1(json.dumps(task).encode('utf-8')).hexdigest()
+        digest = hashlib.sha1(json.dumps(key).encode('utf-8')).hexdigest()
+        return os.path.join(
+            self.directory, '{}-{}.json'.format(prefix[:16], digest))
+
+    def load(self, settings_module, args_parser, task_cls):
+        """
+        Return configuration restored from the snapshot, or :data:`!None`
+        if snapshot doesn't exist or it is not valid.
+        """
+        path = self.get_path(settings_module, args_parser, task_cls)
+        try:
+            with open(path, 'r') as f:
+                snapshot = json.load(f)
+            for filename, mtime_ns, size in snapshot['files']:
+                stat = os.stat(filename)
+                if stat.st_mtime_ns != mtime_ns or stat.st_size != size:
+                    logger.debug("Config snapshot %s is outdated", path)
+                    return None
+            for name, value in snapshot['environ'].items():
+                if os.environ.get(name) != value:
+                    logger.debug(
+                        "Config snapshot %s is outdated, %s has changed",
+                        path, name)
+                    return None
+            if settings_module:
+                settings = LazySettings(settings_module)
+            else:
+                settings = None
+            return Restorer(settings, args_parser, task_cls).restore(
+                snapshot['config'])
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logger.debug("Can't load config snapshot %s", path, exc_info=True)
+            return None
+
+    @contextlib.contextmanager
+    def track_imports(self):
+        """
+        Context manager which tracks files of the non-standard modules
+        imported in its block, e.g. when :mod:`settings` are imported and
+        configuration is created. :meth:`store` invalidates snapshot when
+        they are modified.
+        """
+        modules = set(sys.modules)
+        try:
+            yield
+        finally:
+            for name in set(sys.modules) - modules:
+                filename = getattr(sys.modules[name], '__file__', None)
+                if filename and not is_stdlib_file(filename):
+                    self._imported_files.add(filename)
+
+    def store(self, config, settings_module, args_parser):
+        """
+        Store *config* into the snapshot. Return :data:`!True` if snapshot
+        has been stored.
+        """
+        path = self.get_path(
+            settings_module, args_parser, config.task_class)
+        serializer = Serializer()
+        try:
+            data = serializer.serialize(config)
+            files = set(serializer.files) | self._imported_files
+            if settings_module:
+                files.add(get_module_file(settings_module))
+            environ = getattr(config._settings, 'CONFIG_CACHE_ENVIRON', ())
+            snapshot = {
+                'config': data,
+                'environ': {name: os.environ.get(name) for name in environ},
+                'files': [
+                    (filename, stat.st_mtime_ns, stat.st_size)
+                    for filename, stat in (
+                        (filename, os.stat(filename))
+                        for filename in sorted(f for f in files if f))
+                ],
+            }
+            content = json.dumps(snapshot)
+        except Exception:
+            logger.debug("Can't create config snapshot", exc_info=True)
+            return False
+
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            # File is created with 0600 permissions
+            fd, tmp_path = tempfile.mkstemp(
+                dir=self.directory, prefix='.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    f.write(content)
+                os.replace(tmp_path, path)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+            self._remove_outdated(path)
+        except OSError:
+            logger.warning("Can't store config snapshot %s", path,
+                           exc_info=True)
+            return False
+        return True
+
+    def _remove_outdated(self, path):
+        """
+        Keep only :data:`MAX_SNAPSHOTS` newest snapshots of the same task
+        and settings.
+        """
+        prefix = os.path.basename(path).split('-', 1)[0] + '-'
+        snapshots = []
+        for filename in os.listdir(self.directory):
+            if filename.startswith(prefix):
+                other = os.path.join(self.directory, filename)
+                try:
+                    snapshots.append((os.path.getmtime(other), other))
+                except OSError:
+                    pass
+        snapshots.sort(reverse=True)
+        for unused_mtime, other in snapshots[MAX_SNAPSHOTS:]:
+            try:
+                os.unlink(other)
+            except OSError:
+                pass
+
+
+class Serializer(object):
+    """
+    Serialize configuration into JSON compatible structure. Paths of the
+    modules of the all serialized classes are collected in :attr:`files`.
+    """
+
+    def __init__(self):
+        self.files = []
+
+    def _add_class(self, cls):
+        self.files.append(get_module_file(cls.__module__))
+        return get_class_path(cls)
+
+    def serialize_container(self, container):
+        return {
+            name: self.serialize_value(getattr(container, name))
+            for name in option.get_option_names(container)
+        }
+
+    def serialize(self, config):
+        return {
+            'class': self._add_class(config.__class__),
+            'options': self.serialize_container(config),
+        }
+
+    def serialize_value(self, value):
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if isinstance(value, type):
+            return {'__class__': self._add_class(value)}
+        if isinstance(value, ConfigGroup):
+            return {
+                '__group__': self._add_class(value.__class__),
+                'settings': self.serialize_value(value._settings),
+                'options': self.serialize_container(value),
+            }
+        if isinstance(value, tuple):
+            return {'__tuple__': [self.serialize_value(v) for v in value]}
+        if isinstance(value, list):
+            return [self.serialize_value(v) for v in value]
+        if isinstance(value, dict):
+            if not all(isinstance(k, str) for k in value):
+                raise TypeError('Only string keys are supported')
+            return {
+                '__dict__': {
+                    k: self.serialize_value(v) for k, v in value.items()
+                },
+            }
+        raise TypeError("Can't serialize {!r}".format(value))
+
+
+class Restorer(object):
+    """
+    Restore configuration from the structure created by
+    :class:`Serializer`.
+    """
+
+    def __init__(self, settings, args_parser, task_cls):
+        self.settings = settings
+        self.args_parser = args_parser
+        self.task_cls = task_cls
+
+    def restore(self, data):
+        config_cls = import_class(data['class'])
+        if not issubclass(config_cls, Config):
+            raise TypeError('Invalid config class')
+        config = config_cls.__new__(config_cls)
+        config._settings = self.settings
+        config._args_parser = self.args_parser
+        config._task_cls = self.task_cls
+        config.initialize()
+        config.__dict__.update(self.restore_options(data['options']))
+        return config
+
+    def restore_options(self, options):
+        return {
+            name: self.restore_value(value)
+            for name, value in options.items()
+        }
+
+    def restore_value(self, value):
+        if isinstance(value, list):
+            return [self.restore_value(v) for v in value]
+        if not isinstance(value, dict):
+            return value
+        if '__class__' in value:
+            return import_class(value['__class__'])
+        if '__group__' in value:
+            group_cls = import_class(value['__group__'])
+            group = group_cls.__new__(group_cls)
+            group.initialize(
+                self.restore_value(value['settings']), self.args_parser)
+            group.__dict__.update(self.restore_options(value['options']))
+            return group
+        if '__tuple__' in value:
+            return tuple(self.restore_value(v) for v in value['__tuple__'])
+        return {
+            k: self.restore_value(v) for k, v in value['__dict__'].items()
+        }
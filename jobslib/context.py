@@ -7,8 +7,22 @@ import socket
 
 from cached_property import cached_property
 
+from .deadline import Deadline
+
 __all__ = ['Context']
 
+# Configuration options of the backends and context's attributes
+BACKENDS = (
+    ('one_instance', 'one_instance_lock'),
+    ('liveness', 'liveness'),
+    ('metrics', 'metrics'),
+    ('queue', 'queue'),
+    ('checkpoint', 'checkpoint'),
+)
+
+# Backends which are closed when they are dropped
+CLOSEABLE_BACKENDS = ('metrics', 'queue', 'checkpoint')
+
 
 class Context(object):
     """
@@ -41,6 +55,11 @@ class Context(object):
 
     def __init__(self, config):
         self._config = config
+        self.deadline = Deadline()
+        """
+        Deadline of the current iteration, instance of the
+        :class:`~jobslib.deadline.Deadline`, see :meth:`reset_deadline`.
+        """
         self.initialize()
 
     @classmethod
@@ -58,6 +77,79 @@ class Context(object):
         """
         pass
 
+    def reset_deadline(self):
+        """
+        Set new :attr:`deadline` at the beginning of the iteration and
+        return it. Deadline expires after
+        :attr:`~jobslib.Config.iteration_timeout` seconds, if timeout is
+        not set, deadline never expires.
+
+        Backends trim timeouts of their calls to the remaining time of the
+        :attr:`deadline` and don't retry failed calls after the deadline,
+        see :class:`jobslib.deadline.Deadline`.
+        """
+        self.deadline = Deadline(self._config.iteration_timeout or None)
+        return self.deadline
+
+    def reset_bookkeeping_deadline(self):
+        """
+        Set new :attr:`deadline` when the task is done and return it.
+        Deadline expires after :attr:`~jobslib.Config.bookkeeping_timeout`
+        seconds, so writing liveness, pushing metrics and releasing the
+        lock don't inherit expired deadline of the slow iteration.
+        """
+        self.deadline = Deadline(self._config.bookkeeping_timeout)
+        return self.deadline
+
+    def clear_deadline(self):
+        """
+        Set :attr:`deadline` which never expires, e.g. after the iteration
+        when the lock is released.
+        """
+        self.deadline = Deadline()
+
+    def reconfigure(self, config):
+        """
+        Replace configuration by *config*, e.g. after configuration reload.
+        Backends whose configuration has changed are dropped (metrics, queue
+        and checkpoint are closed) and they are created again on the next
+        access, the other ones are kept. Return :class:`!list` of the
+        changed options, see :meth:`jobslib.Config.diff`. Override this
+        method if your context caches resources which depend on
+        configuration.
+        """
+        changes = self._config.diff(config)
+        self._config = config
+        self.__dict__['config'] = config
+        for option_name, attr_name in BACKENDS:
+            if not any(change.split('.', 1)[0] == option_name
+                       for change in changes):
+                continue
+            backend = self.__dict__.pop(attr_name, None)
+            if attr_name in CLOSEABLE_BACKENDS and backend is not None:
+                self._close_backend(attr_name, backend)
+        return changes
+
+    def close(self):
+        """
+        Close backends (metrics, queue and checkpoint) which have been
+        created, buffered metrics are flushed at most
+        :attr:`~jobslib.Config.bookkeeping_timeout` seconds. Backends are
+        created again on the next access. It is called by
+        :func:`jobslib.main.main` when the task finishes, call it if you
+        run the task by yourself.
+        """
+        for attr_name in CLOSEABLE_BACKENDS:
+            backend = self.__dict__.pop(attr_name, None)
+            if backend is not None:
+                self._close_backend(attr_name, backend)
+
+    def _close_backend(self, attr_name, backend):
+        if attr_name == 'metrics':
+            backend.close(self._config.bookkeeping_timeout)
+        else:
+            backend.close()
+
     @cached_property
     def config(self):
         """
@@ -96,5 +188,30 @@ class Context(object):
         Metrics writer, instance of the
         :class:`jobslib.liveness.BaseMetrics` descendant.
         """
-        return self._config.metrics.backend(
+        metrics = self._config.metrics.backend(
             self, self._config.metrics.options)
+        metrics.registry.summary_interval = \
+            self._config.metrics.summary_interval
+        metrics.registry.summary_quantiles = \
+            self._config.metrics.summary_quantiles
+        metrics.registry.histogram_buckets = \
+            self._config.metrics.histogram_buckets
+        return metrics
+
+    @cached_property
+    def queue(self):
+        """
+        Source of the work items of the :class:`jobslib.QueueTask`,
+        instance of the :class:`jobslib.queue.BaseQueue` descendant.
+        """
+        return self._config.queue.backend(self, self._config.queue.options)
+
+    @cached_property
+    def checkpoint(self):
+        """
+        Store of the task's cursors, instance of the
+        :class:`jobslib.checkpoint.BaseCheckpoint` descendant. Changes are
+        committed when the iteration succeeds.
+        """
+        return self._config.checkpoint.backend(
+            self, self._config.checkpoint.options)
@@ -0,0 +1,71 @@
+"""
+Module :mod:`jobslib.deadline` provides :class:`Deadline` of the task's
+iteration. Deadline is available as :attr:`jobslib.Context.deadline`,
+backends trim their timeouts and retries to the remaining time and task
+can use it too.
+
+.. code-block:: python
+
+    def task(self):
+        for item in self.get_items():
+            if self.context.deadline.expired():
+                break
+            self.process(item, timeout=self.context.deadline.timeout(10.0))
+"""
+
+import time
+
+__all__ = ['Deadline']
+
+MIN_TIMEOUT = 0.5
+"""
+Minimal timeout in seconds returned by :meth:`Deadline.timeout`, so call
+which is made after the deadline still has a chance to succeed.
+"""
+
+
+class Deadline(object):
+    """
+    Deadline *timeout* seconds from now. If *timeout* is :data:`!None`,
+    deadline never expires.
+    """
+
+    def __init__(self, timeout=None, clock=None):
+        self._clock = clock or time.monotonic
+        if timeout is None:
+            self.expires_at = None
+        else:
+            self.expires_at = self._clock() + timeout
+
+    def __repr__(self):
+        return '<{} remaining={!r}>'.format(
+            self.__class__.__name__, self.remaining())
+
+    def remaining(self):
+        """
+        Return remaining time in seconds (at least 0), or :data:`!None`
+        if deadline never expires.
+        """
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - self._clock(), 0.0)
+
+    def expired(self):
+        """
+        Return :data:`!True` if deadline has expired.
+        """
+        return self.expires_at is not None and self._clock() >= self.expires_at
+
+    def timeout(self, timeout=None, minimum=MIN_TIMEOUT):
+        """
+        Return *timeout* trimmed to the remaining time, but at least
+        *minimum* seconds. If *timeout* is :data:`!None`, return remaining
+        time, or :data:`!None` if deadline never expires.
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        remaining = max(remaining, minimum)
+        if timeout is None:
+            return remaining
+        return min(timeout, remaining)
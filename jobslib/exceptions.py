@@ -2,7 +2,7 @@
 JobsLib exceptions.
 """
 
-__all__ = ['JobsLibError', 'TaskError', 'Terminate']
+__all__ = ['JobsLibError', 'SkipIteration', 'TaskError', 'Terminate']
 
 
 class JobsLibError(Exception):
@@ -27,3 +27,13 @@ class Terminate(BaseException):
     """
 
     pass
+
+
+class SkipIteration(BaseException):
+    """
+    Indicates that inputs of the task have not changed since the last
+    successful iteration, so the rest of the iteration is skipped, see
+    :meth:`jobslib.BaseTask.skip_if_unchanged`.
+    """
+
+    pass
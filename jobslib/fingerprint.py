@@ -0,0 +1,37 @@
+"""
+Module :mod:`jobslib.fingerprint` provides helpers for fingerprints of
+the task's inputs, see :meth:`jobslib.BaseTask.skip_if_unchanged`.
+"""
+
+import hashlib
+import json
+import os
+
+__all__ = ['fingerprint', 'file_fingerprint']
+
+
+def fingerprint(value):
+    """
+    Return SHA-256 hex digest of the JSON serializable *value*. Keys of
+    the dictionaries are sorted, so digest doesn't depend on their order.
+    """
+    data = json.dumps(value, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def file_fingerprint(*paths):
+    """
+    Return :class:`!list` of ``[path, mtime_ns, size]`` of the files
+    *paths*, ``mtime_ns`` and ``size`` are :data:`!None` if file doesn't
+    exist.
+    """
+    result = []
+    for path in paths:
+        path = os.fspath(path)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            result.append([path, None, None])
+        else:
+            result.append([path, stat.st_mtime_ns, stat.st_size])
+    return result
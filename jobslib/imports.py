@@ -3,8 +3,9 @@ Helpers for importing Python's modules.
 """
 
 import importlib
+import importlib.util
 
-__all__ = ['import_object']
+__all__ = ['import_object', 'validate_object_path']
 
 
 def import_object(name):
@@ -16,10 +17,25 @@ def import_object(name):
         >>> import_command('module.path.ObjectClass')
         <class 'module.path.ObjectClass'>
     """
+    module_name, obj_name = _split_name(name)
+    module = importlib.import_module(module_name)
+    return getattr(module, obj_name)
+
+
+def validate_object_path(name):
+    """
+    Check that module of the object *name* exists, without importing the
+    module itself (only its parent packages are imported), and return
+    *name*. Raise :exc:`ImportError` if module doesn't exist.
+    """
+    module_name, unused_obj_name = _split_name(name)
+    if importlib.util.find_spec(module_name) is None:
+        raise ImportError("No module named '%s'" % module_name)
+    return name
+
+
+def _split_name(name):
     parts = name.split('.')
     if len(parts) < 2:
         raise ValueError("Invalid name '%s'" % name)
-    module_name = ".".join(parts[:-1])
-    obj_name = parts[-1]
-    module = importlib.import_module(module_name)
-    return getattr(module, obj_name)
+    return ".".join(parts[:-1]), parts[-1]
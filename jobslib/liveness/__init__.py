@@ -1,9 +1,11 @@
 """
 Module :mod:`liveness` provides functionality for exporting informations
 about health state of the task. When task is successfuly finished,
-some state is written. :class:`BaseLiveness` is ancestor, it is abstract
-class which defines API, not functionality. Override this class if you
-want to write own implementation of the liveness.
+some state is written. Long-running task can also report its progress
+during the iteration using :meth:`jobslib.BaseTask.heartbeat`.
+:class:`BaseLiveness` is ancestor, it is abstract class which defines API,
+not functionality. Override this class if you want to write own
+implementation of the liveness.
 """
 
 import abc
@@ -39,7 +41,10 @@ class BaseLiveness(abc.ABC):
     @abc.abstractmethod
     def write(self):
         """
-        Write informations about health state of the task.
+        Write informations about health state of the task. Return
+        :data:`!False` if write has failed (backends log their errors
+        instead of raising them), otherwise :data:`!True`. :data:`!None`
+        is considered success.
         """
         raise NotImplementedError
 
@@ -50,6 +55,15 @@ class BaseLiveness(abc.ABC):
         """
         raise NotImplementedError
 
+    def heartbeat(self, progress=None, **info):
+        """
+        Write informations about progress of the running task. *progress*
+        and *info* are arbitrary JSON serializable values. Return value
+        has the same meaning as in :meth:`write`. Default implementation
+        does nothing, override this method if backend supports heartbeats.
+        """
+        return True
+
     def check(self, max_age):
         """
         Check liveness and return :data:`!True` when liveness timestamp is
@@ -57,11 +71,29 @@ class BaseLiveness(abc.ABC):
         older than *max_age*.
         """
         record = self.read()
+        if record.get('timestamp') is None:
+            return False
         timestamp = get_current_time()
         if (timestamp - record['timestamp']) > max_age:
             return False
         return True
 
+    def check_progress(self, max_age):
+        """
+        Check heartbeat of the running task and return :data:`!True` when
+        heartbeat timestamp is younger than *max_age*, :data:`!False` when
+        heartbeat timestamp is older than *max_age* and :data:`!None` when
+        task is not running (there is no heartbeat).
+        """
+        record = self.read()
+        heartbeat = record.get('heartbeat')
+        if not heartbeat:
+            return None
+        timestamp = get_current_time()
+        if (timestamp - heartbeat['timestamp']) > max_age:
+            return False
+        return True
+
     def get_state(self):
         """
         Return health state as a :class:`!str`.
@@ -74,11 +106,27 @@ class BaseLiveness(abc.ABC):
             'time_local': to_local(timestamp),
         }
 
+    def get_heartbeat_state(self, progress=None, info=None):
+        """
+        Return heartbeat state as a :class:`!dict`.
+        """
+        timestamp = get_current_time()
+        return {
+            'timestamp': timestamp,
+            'time_utc': to_utc(timestamp),
+            'time_local': to_local(timestamp),
+            'progress': progress,
+            'info': info or {},
+        }
+
 
 class CheckLiveness(_Task):
     """
     Internal task which checks age of the liveness stamp. Returns exit
-    code :const:`0` if check passes, :const:`0` if check fails.
+    code :const:`0` if check passes, :const:`1` if check fails. If
+    ``--max-progress-age`` is passed and task is running, only age of its
+    heartbeat is checked, so long-running task doesn't fail the check
+    because its last completion is older than ``--max-age``.
     """
 
     name = 'check-liveness'
@@ -88,15 +136,31 @@ class CheckLiveness(_Task):
             '--max-age', action='store', dest='max_age',
             type=int, required=True,
             help='maximun age of the liveness stamp in seconds'),
+        argument(
+            '--max-progress-age', action='store', dest='max_progress_age',
+            type=int, default=None,
+            help='maximum age of the heartbeat of the running task '
+                 'in seconds'),
     )
 
     def initialize(self):
         self.max_age = self.context.config._args_parser.max_age
+        self.max_progress_age = \
+            self.context.config._args_parser.max_progress_age
 
     def task(self):
         if self.max_age <= 0:
             raise ValueError("Invalid max_age: {}".format(self.max_age))
-        if self.context.liveness.check(self.max_age):
+        if self.max_progress_age is not None and self.max_progress_age <= 0:
+            raise ValueError(
+                "Invalid max_progress_age: {}".format(self.max_progress_age))
+        liveness = self.context.liveness
+        passed = None
+        if self.max_progress_age is not None:
+            passed = liveness.check_progress(self.max_progress_age)
+        if passed is None:
+            passed = liveness.check(self.max_age)
+        if passed:
             sys.stdout.write('PASS\n')
             sys.stdout.flush()
             sys.exit(0)
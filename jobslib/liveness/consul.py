@@ -7,13 +7,12 @@ import json
 import logging
 import os
 
-import retrying
-
 from consul import Consul
 from objectvalidator import option
 
 from . import BaseLiveness
 from ..config import ConfigGroup, RetryConfigMixin
+from ..retry import get_circuit_breaker
 
 __all__ = ['ConsulLiveness']
 
@@ -110,37 +109,74 @@ class ConsulLiveness(BaseLiveness):
 
     def __init__(self, context, options):
         super().__init__(context, options)
+        self._state = None
         self._consul = Consul(
             scheme=self.options.scheme,
             host=self.options.host,
             port=self.options.port,
             timeout=self.options.timeout,
         )
+        self._circuit_breaker = get_circuit_breaker(
+            '{}://{}:{}'.format(
+                self.options.scheme, self.options.host, self.options.port),
+            self.options)
 
-    def write(self):
-        @retrying.retry(
-            stop_max_attempt_number=self.options.retry_max_attempts,
-            wait_exponential_multiplier=self.options.retry_wait_multiplier)
-        def _write(data):
-            return self._consul.kv.put(self.options.key, data)
+    def _call(self, func, *args, **kwargs):
+        """
+        Call Consul API *func* through the circuit breaker of the Consul
+        agent, see :mod:`jobslib.retry`. Timeout and retries are trimmed
+        to the :attr:`jobslib.Context.deadline`.
+        """
+        deadline = self.context.deadline
+
+        def _attempt():
+            self._consul.http.timeout = deadline.timeout(self.options.timeout)
+            return func(*args, **kwargs)
+
+        return self._circuit_breaker.call(
+            _attempt,
+            max_attempts=self.options.retry_max_attempts,
+            wait_multiplier=self.options.retry_wait_multiplier,
+            deadline=deadline)
 
+    def _write(self, state):
+        return self._call(
+            self._consul.kv.put, self.options.key, json.dumps(state))
+
+    def write(self):
         try:
             state = self.get_state()
-            data = json.dumps(state)
-            if not _write(data):
+            self._state = state
+            if not self._write(state):
                 logger.error("Can't write liveness state")
+                return False
         except Exception:
             logger.exception("Can't write liveness state")
+            return False
+        return True
 
-    def read(self):
-        @retrying.retry(
-            stop_max_attempt_number=self.options.retry_max_attempts,
-            wait_exponential_multiplier=self.options.retry_wait_multiplier)
-        def _read():
-            return self._consul.kv.get(self.options.key)[1]
+    def heartbeat(self, progress=None, **info):
+        try:
+            if self._state is None:
+                # Keep the last completion state written by previous run
+                try:
+                    self._state = self.read()
+                except Exception:
+                    self._state = {'fqdn': self.context.fqdn}
+                self._state.pop('heartbeat', None)
+            state = dict(self._state)
+            state['heartbeat'] = self.get_heartbeat_state(progress, info)
+            if not self._write(state):
+                logger.error("Can't write liveness heartbeat")
+                return False
+        except Exception:
+            logger.exception("Can't write liveness heartbeat")
+            return False
+        return True
 
+    def read(self):
         try:
-            data = _read()
+            data = self._call(self._consul.kv.get, self.options.key)[1]
             if data is None:
                 raise KeyError(self.options.key)
             record = json.loads(data['Value'])
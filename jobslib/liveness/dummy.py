@@ -22,7 +22,7 @@ class DummyLiveness(BaseLiveness):
     """
 
     def write(self):
-        pass
+        return True
 
     def read(self):
         return self.get_state()
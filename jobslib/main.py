@@ -8,6 +8,7 @@ import os
 
 from .cmdlineparser import ArgumentParser
 from .config import Config
+from .configcache import ConfigCache
 from .imports import import_object
 from .tasks import BaseTask
 
@@ -15,18 +16,29 @@ from .tasks import BaseTask
 __all__ = ['main']
 
 JOBSLIB_TASKS = {
+    'bench-backends': 'jobslib.bench.BenchBackends',
     'check-liveness': 'jobslib.liveness.CheckLiveness',
+    'simulate-lock-contention': 'jobslib.bench.SimulateLockContention',
 }
 
 
+def get_app_settings_path(cmdline_args):
+    """
+    Return Python's path of the :mod:`settings` module of the application
+    according to either command line argument **-s/--settings** or
+    **JOBSLIB_SETTINGS_MODULE** environment variable.
+    """
+    return (
+        cmdline_args.settings or os.environ.get('JOBSLIB_SETTINGS_MODULE', ''))
+
+
 def get_app_settings(cmdline_args):
     """
     Return :mod:`settings` module of the application according to either
     command line argument **-s/--settings** or **JOBSLIB_SETTINGS_MODULE**
     environment variable.
     """
-    settings_module_path = (
-        cmdline_args.settings or os.environ.get('JOBSLIB_SETTINGS_MODULE', ''))
+    settings_module_path = get_app_settings_path(cmdline_args)
     if not settings_module_path:
         return None
     return importlib.import_module(settings_module_path)
@@ -103,11 +115,23 @@ def main(args=None):
                  '|'.join(JOBSLIB_TASKS.keys())))
     cmdline_args, unused_remaining = parser.parse_known_args(args)
 
-    # Obtain settings module
-    try:
-        settings = get_app_settings(cmdline_args)
-    except ImportError as exc:
-        parser.error("Invalid application settings module: {}".format(exc))
+    def load_settings():
+        try:
+            settings = get_app_settings(cmdline_args)
+        except ImportError as exc:
+            parser.error(
+                "Invalid application settings module: {}".format(exc))
+        config_cls = get_config_class(settings)
+        if not issubclass(config_cls, Config):
+            parser.error(
+                "Config class must be subclass of the jobslib.config.Config")
+        return settings, config_cls
+
+    # Obtain settings module, if config cache is enabled, settings module
+    # is imported only when config is not cached.
+    config_cache = ConfigCache.from_environ()
+    if config_cache is None:
+        settings, config_cls = load_settings()
     # Obtain task class
     if cmdline_args.task_cls in JOBSLIB_TASKS:
         task_cls = get_task_cls(JOBSLIB_TASKS[cmdline_args.task_cls])
@@ -124,12 +148,6 @@ def main(args=None):
     for task_args, task_kwargs in task_cls.arguments:
         parser.add_argument(*task_args, **task_kwargs)
 
-    # Obtain config class
-    config_cls = get_config_class(settings)
-    if not issubclass(config_cls, Config):
-        parser.error(
-            "Config class must be subclass of the jobslib.config.Config")
-
     # Add help argument
     parser.add_argument(
         '-h', '--help', action='help',
@@ -142,10 +160,26 @@ def main(args=None):
         parser.error(
             "--sleep-interval and --run-interval may not be used together")
 
+    # Obtain config, either cached or new one
+    config = None
+    if config_cache is not None:
+        settings_module_path = get_app_settings_path(cmdline_args)
+        config = config_cache.load(
+            settings_module_path, cmdline_args, task_cls)
+        if config is None:
+            with config_cache.track_imports():
+                settings, config_cls = load_settings()
+                config = config_cls(settings, cmdline_args, task_cls)
+            config_cache.store(config, settings_module_path, cmdline_args)
+    else:
+        config = config_cls(settings, cmdline_args, task_cls)
+
     # Launch task
-    config = config_cls(settings, cmdline_args, task_cls)
     task = task_cls(config)
-    task()
+    try:
+        task()
+    finally:
+        task.context.close()
 
 
 if __name__ == '__main__':
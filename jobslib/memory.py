@@ -0,0 +1,151 @@
+"""
+Module :mod:`jobslib.memory` provides :class:`MemoryTracker`, which
+tracks memory growth of the long-running task using :mod:`tracemalloc`
+snapshots.
+"""
+
+import logging
+import os
+import tracemalloc
+
+__all__ = ['MemoryTracker']
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+class MemoryTracker(object):
+    """
+    Take :mod:`tracemalloc` snapshot every *interval* iterations and
+    compare it with the previous one. *top* allocation sites with the
+    largest growth are logged and returned as metrics, see
+    :meth:`iteration`. Allocation sites are grouped by traceback of at
+    most *frames* frames. If *dump_dir* is defined and total growth since
+    the previous snapshot reaches *dump_threshold* bytes, snapshot is
+    dumped into the *dump_dir*, use :meth:`tracemalloc.Snapshot.load` for
+    the analysis.
+
+    Tracing slows down allocations and consumes memory, so it is enabled
+    only when interval is greater than 0.
+    """
+
+    def __init__(self, interval, top=10, frames=1, dump_dir=None,
+                 dump_threshold=0, name='task'):
+        self.interval = interval
+        self.top = top
+        self.frames = frames
+        self.dump_dir = dump_dir
+        self.dump_threshold = dump_threshold
+        self.name = name
+        self.iterations = 0
+        self._snapshot = None
+        self._started = False
+
+    def start(self):
+        """
+        Start tracing memory allocations, if they are not traced yet.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started = True
+
+    def stop(self):
+        """
+        Stop tracing memory allocations, if they have been started by
+        :meth:`start`. Tracing enabled before (e.g. by
+        :envvar:`PYTHONTRACEMALLOC`) is kept.
+        """
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+        self._snapshot = None
+
+    def take_snapshot(self):
+        """
+        Return current :class:`tracemalloc.Snapshot` without allocations
+        of the :mod:`tracemalloc` and import machinery.
+        """
+        return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+    def dump(self, snapshot):
+        """
+        Dump *snapshot* into the :attr:`dump_dir` and return path of the
+        file.
+        """
+        os.makedirs(self.dump_dir, exist_ok=True)
+        path = os.path.join(
+            self.dump_dir, 'tracemalloc-{}-{}-{}.snapshot'.format(
+                self.name, os.getpid(), self.iterations))
+        snapshot.dump(path)
+        return path
+
+    def iteration(self, tags=None):
+        """
+        Count finished iteration. Every :attr:`interval` iterations
+        compare new snapshot with the previous one and return memory
+        growth in format of the :meth:`jobslib.metrics.BaseMetrics.push`
+        argument: ``memory_traced_bytes`` gauge and ``memory_growth_bytes``
+        gauge for each of the top growing allocation sites, with ``site``
+        tag. Otherwise return empty :class:`!dict`.
+        """
+        self.iterations += 1
+        if not self.interval or self.iterations % self.interval:
+            return {}
+        if not tracemalloc.is_tracing():
+            self.start()
+            return {}
+
+        tags = dict(tags) if tags else {}
+        snapshot = self.take_snapshot()
+        traced, unused_peak = tracemalloc.get_traced_memory()
+        metrics = {
+            'memory_traced_bytes': {
+                'value': traced,
+                'tags': tags,
+                'type': 'gauge',
+            },
+        }
+
+        previous, self._snapshot = self._snapshot, snapshot
+        if previous is None:
+            return metrics
+
+        key_type = 'traceback' if self.frames > 1 else 'lineno'
+        stats = snapshot.compare_to(previous, key_type)
+        growth = sum(stat.size_diff for stat in stats)
+        top_stats = [stat for stat in stats if stat.size_diff > 0][:self.top]
+        if top_stats:
+            logger.info(
+                "Traced memory grew by %d B in the last %d iterations, "
+                "top allocation sites:\n%s", growth, self.interval,
+                '\n'.join(str(stat) for stat in top_stats))
+            metrics['memory_growth_bytes'] = [
+                {
+                    'value': stat.size_diff,
+                    'tags': dict(tags, site=self._format_site(stat)),
+                    'type': 'gauge',
+                }
+                for stat in top_stats
+            ]
+
+        if self.dump_dir and growth >= self.dump_threshold > 0:
+            try:
+                path = self.dump(snapshot)
+            except Exception:
+                logger.exception("Can't dump tracemalloc snapshot")
+            else:
+                logger.warning(
+                    "Traced memory grew by %d B, snapshot has been dumped "
+                    "into %s", growth, path)
+        return metrics
+
+    @staticmethod
+    def _format_site(stat):
+        frame = stat.traceback[-1]
+        return '{}:{}'.format(frame.filename, frame.lineno)
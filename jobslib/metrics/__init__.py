@@ -3,13 +3,53 @@ Provides metrics API. Inherit this class and override abstract method
 :meth:`push_monitoring_metrics`. Configuration options are defined in
 :class:`OptionsConfig` class, which is :class:`~jobslib.ConfigGroup`
 descendant.
+
+Metrics backend can write points through a buffer. If backend's
+:class:`OptionsConfig` inherits
+:class:`~jobslib.config.BufferConfigMixin` and ``buffer_size`` option is
+greater than 0, points passed into :meth:`BaseMetrics.send_points` are
+accumulated in a bounded buffer and they are written in batches by a
+background thread, see :class:`~jobslib.metrics.buffer.MetricsBuffer`.
+So pushing metrics doesn't block the task. Buffer is flushed when the
+task finishes, see :meth:`jobslib.Context.close`.
+
+If backend's :class:`OptionsConfig` inherits
+:class:`~jobslib.config.SpoolConfigMixin` and ``spool_dir`` option is
+defined, points which can't be written are persisted on the disk and they
+are replayed in order when backend is available again, see
+:class:`~jobslib.metrics.spool.MetricsSpool`.
+
+Metrics backend also provides registry of the aggregated metrics, see
+:mod:`jobslib.metrics.registry`.
 """
 
 import abc
+import collections.abc
+import logging
 
 from jobslib import ConfigGroup
 
-__all__ = ['BaseMetrics']
+from .buffer import MetricsBuffer
+from .registry import MetricsRegistry
+from .spool import MetricsSpool
+
+__all__ = ['BaseMetrics', 'iter_metrics']
+
+logger = logging.getLogger(__name__)
+
+
+def iter_metrics(metrics):
+    """
+    Iterate over *metrics* in format of the :meth:`BaseMetrics.push`
+    argument and yield ``(name, metric)`` tuples, where *metric* is
+    :class:`!dict` containing value and optionally tags and type.
+    """
+    for name, metric in metrics.items():
+        if isinstance(metric, collections.abc.Mapping):
+            yield name, metric
+        else:
+            for item in metric:
+                yield name, item
 
 
 class BaseMetrics(abc.ABC):
@@ -24,6 +64,25 @@ class BaseMetrics(abc.ABC):
     def __init__(self, context, options):
         self.context = context
         self.options = options
+        self.registry = MetricsRegistry()
+        self._spool = None
+        if getattr(options, 'spool_dir', None):
+            self._spool = MetricsSpool(
+                options.spool_dir,
+                prefix='{}-{}'.format(
+                    context.config.task_class.name, self.__class__.__name__),
+                max_bytes=options.spool_max_bytes,
+                batch_size=options.spool_batch_size,
+            )
+        self._buffer = None
+        if getattr(options, 'buffer_size', 0) > 0:
+            self._buffer = MetricsBuffer(
+                self._write_points,
+                max_size=options.buffer_size,
+                batch_size=options.buffer_batch_size,
+                flush_interval=options.buffer_flush_interval,
+                overflow_policy=options.buffer_overflow_policy,
+            )
 
     @abc.abstractmethod
     def push(self, metrics):
@@ -49,5 +108,148 @@ class BaseMetrics(abc.ABC):
                     },
                 },
             }
+
+        Return :data:`!True` if metrics have been pushed (or buffered),
+        :data:`!False` if push has failed. Backends log their errors
+        instead of raising them, so the return value is the only way how to
+        detect failure, e.g. :class:`~jobslib.metrics.fanout.FanoutMetrics`
+        counts failed pushes. :data:`!None` is considered success.
+
+        If there are more series of the same metric with different tags,
+        value is :class:`!list` of :class:`!dict` structures. Optional
+        ``type`` key contains type of the metric (``counter``, ``gauge``),
+        use :func:`iter_metrics` for iterating over *metrics*.
+
+        .. code-block:: python
+
+            metrics = {
+                "processed_requests": [
+                    {
+                        "value": 5,
+                        "tags": {"queue": "emails"},
+                        "type": "counter",
+                    },
+                    {
+                        "value": 3,
+                        "tags": {"queue": "sms"},
+                        "type": "counter",
+                    },
+                ],
+            }
+        """
+        raise NotImplementedError
+
+    def counter(self, name, tags=None):
+        """
+        Return :class:`~jobslib.metrics.registry.Counter` identified by
+        *name* and *tags*. Counter is pushed at the end of the iteration.
+        """
+        return self.registry.counter(name, tags)
+
+    def gauge(self, name, tags=None):
+        """
+        Return :class:`~jobslib.metrics.registry.Gauge` identified by
+        *name* and *tags*. Gauge is pushed at the end of the iteration.
+        """
+        return self.registry.gauge(name, tags)
+
+    def histogram(self, name, tags=None):
+        """
+        Return :class:`~jobslib.metrics.registry.Histogram` identified by
+        *name* and *tags*. Histogram is pushed at the end of the iteration.
+        """
+        return self.registry.histogram(name, tags)
+
+    def summary(self, name, tags=None):
+        """
+        Return :class:`~jobslib.metrics.registry.Summary` identified by
+        *name* and *tags*. Summary is pushed as pre-aggregated quantiles
+        once per :attr:`jobslib.config.MetricsConfig.summary_interval`.
+        """
+        return self.registry.summary(name, tags)
+
+    def timer(self, name, tags=None):
+        """
+        Return :class:`~jobslib.metrics.registry.Timer` identified by
+        *name* and *tags*. Timer is pushed at the end of the iteration,
+        or as a summary if
+        :attr:`jobslib.config.MetricsConfig.summary_interval` is greater
+        than 0.
+        """
+        return self.registry.timer(name, tags)
+
+    @property
+    def deadline(self):
+        """
+        Deadline of the current iteration (see
+        :attr:`jobslib.Context.deadline`), which trims timeouts and
+        retries of the :meth:`write_points`. If buffering is enabled,
+        points are written by the buffer's background thread independently
+        of the iteration, so value is :data:`!None`.
+        """
+        if self._buffer is not None:
+            return None
+        return self.context.deadline
+
+    def write_points(self, points):
+        """
+        Write *points* into the backend, *points* is a :class:`!list` of
+        backend specific points. Override this method if backend supports
+        buffering, it is called either directly from :meth:`send_points`
+        or from the buffer's background thread.
         """
         raise NotImplementedError
+
+    def send_points(self, points):
+        """
+        Put *points* into the buffer if buffering is enabled, otherwise
+        write them immediately using :meth:`write_points`.
+        """
+        if self._buffer is not None:
+            self._buffer.put(points)
+        else:
+            self._write_points(points)
+
+    def _write_points(self, points):
+        """
+        Write *points* using :meth:`write_points`. If spool is enabled,
+        spooled points are replayed first and points which can't be
+        written are spooled.
+        """
+        if self._spool is None:
+            self.write_points(points)
+            return
+        if len(self._spool):
+            self._spool.append(points)
+        else:
+            try:
+                self.write_points(points)
+                return
+            except Exception:
+                logger.exception(
+                    "Can't write %d metrics points, spool them", len(points))
+                self._spool.append(points)
+                return
+        try:
+            self._spool.replay(self.write_points)
+        except Exception:
+            logger.exception("Can't replay spooled metrics points")
+
+    def flush(self, timeout=None):
+        """
+        Write all buffered points. Wait at most *timeout* seconds. Return
+        :data:`!True` if all points have been written.
+        """
+        if self._buffer is not None:
+            return self._buffer.flush(timeout)
+        return True
+
+    def close(self, timeout=None):
+        """
+        Flush buffered points and release resources, wait at most
+        *timeout* seconds. It is called by :meth:`jobslib.Context.close`
+        when the task finishes and when backend is replaced by the
+        configuration reload.
+        """
+        if self._buffer is not None:
+            self._buffer.close(timeout)
@@ -0,0 +1,151 @@
+"""
+Module :mod:`jobslib.metrics.buffer` provides :class:`MetricsBuffer`,
+bounded buffer of the metrics points which are written in batches by
+a background thread.
+"""
+
+import collections
+import logging
+import threading
+import time
+
+__all__ = ['MetricsBuffer']
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'block')
+
+
+class MetricsBuffer(object):
+    """
+    Bounded buffer of the metrics points. Points are accumulated in the
+    buffer and a background thread writes them using *write* callable in
+    batches, which contain at most *batch_size* points. Batch is written
+    when buffer contains *batch_size* points or at least once per
+    *flush_interval* seconds. When buffer contains *max_size* points,
+    *overflow_policy* is applied, see
+    :attr:`jobslib.config.BufferConfigMixin.buffer_overflow_policy`.
+    Exceptions raised from *write* are logged and points are dropped.
+    """
+
+    def __init__(self, write, max_size, batch_size=1000, flush_interval=10.0,
+                 overflow_policy='drop_oldest', name='jobslib-metrics'):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(
+                'Invalid overflow policy: {}'.format(overflow_policy))
+        self.write = write
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.dropped = 0
+        self._queue = collections.deque()
+        self._sending = 0
+        self._flush_requested = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        return len(self._queue)
+
+    def put(self, points):
+        """
+        Put *points* into the buffer. If overflow policy is ``block``,
+        wait at most *flush_interval* seconds in total for free space,
+        points which don't fit into the buffer after that are dropped.
+        """
+        deadline = time.monotonic() + self.flush_interval
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('Buffer is closed')
+            for point in points:
+                if len(self._queue) >= self.max_size:
+                    if not self._make_space(deadline):
+                        self.dropped += 1
+                        continue
+                self._queue.append(point)
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+
+    def _make_space(self, deadline):
+        """
+        Apply overflow policy, called when buffer is full. Blocking policy
+        waits until *deadline* (value of the :func:`time.monotonic`).
+        Return :data:`!True` if new point can be put into the buffer.
+        """
+        if self.overflow_policy == 'drop_oldest':
+            self._queue.popleft()
+            self.dropped += 1
+            return True
+        if self.overflow_policy == 'block':
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                return False
+            self._cond.notify_all()
+            return self._cond.wait_for(
+                lambda: len(self._queue) < self.max_size or self._closed,
+                timeout) and not self._closed
+        return False
+
+    def flush(self, timeout=None):
+        """
+        Write all points from the buffer. Wait at most *timeout* seconds,
+        or until all points are written if *timeout* is :data:`!None`.
+        Return :data:`!True` if buffer is empty.
+        """
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(
+                lambda: not self._queue and not self._sending, timeout)
+
+    def close(self, timeout=None):
+        """
+        Flush the buffer and stop the background thread. Wait at most
+        *timeout* seconds.
+        """
+        if self._closed:
+            return
+        start_time = time.monotonic()
+        if not self.flush(timeout):
+            logger.error(
+                "Can't flush metrics buffer, %d points are lost",
+                len(self._queue))
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if timeout is not None:
+            timeout = max(timeout - (time.monotonic() - start_time), 0)
+        self._thread.join(timeout)
+
+    def _ready(self):
+        return (self._closed or
+                self._flush_requested or
+                len(self._queue) >= self.batch_size)
+
+    def _run(self):
+        while 1:
+            with self._cond:
+                self._cond.wait_for(self._ready, self.flush_interval)
+                if not self._queue:
+                    self._flush_requested = False
+                    self._cond.notify_all()
+                    if self._closed:
+                        return
+                    continue
+                batch_size = min(self.batch_size, len(self._queue))
+                batch = [self._queue.popleft() for _ in range(batch_size)]
+                self._sending += 1
+                self._cond.notify_all()
+            try:
+                self.write(batch)
+            except Exception:
+                logger.exception(
+                    "Can't write %d metrics points", len(batch))
+            finally:
+                with self._cond:
+                    self._sending -= 1
+                    self._cond.notify_all()
@@ -22,4 +22,4 @@ class DummyMetrics(BaseMetrics):
     """
 
     def push(self, metrics):
-        pass
+        return True
@@ -0,0 +1,237 @@
+"""
+Module :mod:`jobslib.metrics.fanout` provides :class:`FanoutMetrics`
+writer, which sends metrics into several backends.
+"""
+
+import logging
+import time
+
+from objectvalidator import option
+
+from . import BaseMetrics
+from .buffer import MetricsBuffer
+from ..config import ConfigGroup, lazy_option
+from ..imports import import_object, validate_object_path
+
+__all__ = ['FanoutMetrics']
+
+logger = logging.getLogger(__name__)
+
+
+class DestinationConfig(ConfigGroup):
+    """
+    Configuration of the one destination of the :class:`FanoutMetrics`.
+    """
+
+    @option(required=True, attrtype=str)
+    def name(self):
+        """
+        Name of the destination, it is used in logs and metrics. Default
+        is name of the backend class.
+        """
+        return self._settings.get(
+            'name', self._settings['backend'].rsplit('.', 1)[-1])
+
+    @option(required=True, attrtype=str)
+    def backend_path(self):
+        """
+        Metrics implementation class, Python's module path
+        ``[package.[submodule.]]module.ClassName``. Existence of the module
+        is checked, but module is not imported.
+        """
+        return validate_object_path(self._settings['backend'])
+
+    @lazy_option
+    def backend(self):
+        """
+        Metrics implementation class, it is imported on the first access.
+        """
+        return import_object(self.backend_path)
+
+    @lazy_option
+    def options(self):
+        """
+        Constructor's arguments of the metrics implementation class. It is
+        read on the first access.
+        """
+        return self.backend.OptionsConfig(
+            self._settings.get('options', {}), self._args_parser)
+
+    @option(required=True, attrtype=int)
+    def queue_size(self):
+        """
+        Maximum number of the pushes waiting in the destination's queue.
+        When queue is full, pushed metrics are dropped. Default is 100.
+        """
+        queue_size = self._settings.get('queue_size', 100)
+        if queue_size < 1:
+            raise ValueError('Queue size may not be less than 1')
+        return queue_size
+
+    @option(required=True, attrtype=float)
+    def timeout(self):
+        """
+        Timeout in seconds. Push which takes longer is counted as a slow
+        push and queue is flushed at most *timeout* seconds when task
+        finishes. Default is 5.0 seconds.
+        """
+        timeout = self._settings.get('timeout', 5.0)
+        if isinstance(timeout, int):
+            timeout = float(timeout)
+        return timeout
+
+
+class Destination(object):
+    """
+    Destination of the :class:`FanoutMetrics`. Metrics are pushed into
+    *backend* from destination's own queue and background thread.
+    """
+
+    def __init__(self, name, backend, queue_size, timeout):
+        self.name = name
+        self.backend = backend
+        self.timeout = timeout
+        self.failed = 0
+        self.slow = 0
+        self._buffer = MetricsBuffer(
+            self._push, max_size=queue_size, batch_size=1,
+            flush_interval=timeout, overflow_policy='drop_newest',
+            name='jobslib-metrics-{}'.format(name))
+
+    @property
+    def dropped(self):
+        return self._buffer.dropped
+
+    def _push(self, batch):
+        for metrics in batch:
+            start_time = time.monotonic()
+            try:
+                if self.backend.push(metrics) is False:
+                    # Backend has logged the error
+                    self.failed += 1
+            except Exception:
+                self.failed += 1
+                logger.exception(
+                    "Push monitoring metrics into '%s' failed", self.name)
+            if time.monotonic() - start_time > self.timeout:
+                self.slow += 1
+                logger.warning(
+                    "Push monitoring metrics into '%s' took more than "
+                    "%.1f seconds", self.name, self.timeout)
+
+    def push(self, metrics):
+        self._buffer.put([metrics])
+
+    def flush(self, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+        return self._buffer.flush(timeout) and self.backend.flush(timeout)
+
+    def close(self):
+        self._buffer.close(self.timeout)
+        self.backend.close(self.timeout)
+
+
+class FanoutMetrics(BaseMetrics):
+    """
+    Fan-out metrics implementation. The same metrics are pushed into
+    several backends, e.g. during migration from one backend to another
+    one. Each destination has its own queue and background thread, so
+    slow or failing destination doesn't delay the others nor the task.
+    When destination's queue is full, metrics are dropped. Number of the
+    dropped, failed and slow pushes is pushed as
+    ``metrics_fanout_dropped``, ``metrics_fanout_failed`` and
+    ``metrics_fanout_slow`` counters with ``destination`` tag.
+
+    For use of :class:`FanoutMetrics` write into :mod:`settings`:
+
+    .. code-block:: python
+
+        METRICS = {
+            'backend': 'jobslib.metrics.fanout.FanoutMetrics',
+            'options': {
+                'destinations': [
+                    {
+                        'backend': 'jobslib.metrics.influxdb.InfluxDBMetrics',
+                        'options': {
+                            'host': 'hostname',
+                            'database': 'dbname',
+                        },
+                        'queue_size': 100,
+                        'timeout': 5.0,
+                    },
+                    {
+                        'name': 'prometheus',
+                        'backend':
+                            'jobslib.metrics.prometheus.PrometheusMetrics',
+                        'options': {
+                            'port': 9100,
+                        },
+                    },
+                ],
+            },
+        }
+    """
+
+    class OptionsConfig(ConfigGroup):
+        """
+        Fan-out metrics options.
+        """
+
+        @option(required=True, attrtype=list)
+        def destinations(self):
+            """
+            :class:`!list` of the destinations, each of them is instance
+            of the :class:`DestinationConfig`.
+            """
+            destinations = [
+                DestinationConfig(destination, self._args_parser)
+                for destination in self._settings['destinations']
+            ]
+            if not destinations:
+                raise ValueError('At least one destination is required')
+            names = [destination.name for destination in destinations]
+            if len(set(names)) != len(names):
+                raise ValueError('Destination names must be unique')
+            return destinations
+
+    def __init__(self, context, options):
+        super().__init__(context, options)
+        self.destinations = [
+            Destination(
+                destination.name,
+                destination.backend(context, destination.options),
+                destination.queue_size,
+                destination.timeout)
+            for destination in self.options.destinations
+        ]
+        self._accounted = {}
+
+    def _account(self, destination, name, value):
+        key = (destination.name, name)
+        delta = value - self._accounted.get(key, 0)
+        if delta:
+            self._accounted[key] = value
+            self.counter(
+                'metrics_fanout_{}'.format(name),
+                tags={'destination': destination.name}).inc(delta)
+
+    def push(self, metrics):
+        for destination in self.destinations:
+            destination.push(metrics)
+            self._account(destination, 'dropped', destination.dropped)
+            self._account(destination, 'failed', destination.failed)
+            self._account(destination, 'slow', destination.slow)
+        # Metrics are pushed by the destinations' background threads
+        return True
+
+    def flush(self, timeout=None):
+        res = True
+        for destination in self.destinations:
+            res = destination.flush(timeout) and res
+        return res
+
+    def close(self, timeout=None):
+        super().close(timeout)
+        for destination in self.destinations:
+            destination.close()
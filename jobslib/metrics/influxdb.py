@@ -8,19 +8,37 @@ import logging
 import os
 import time
 
-import retrying
-
+import requests
 from influxdb.client import InfluxDBClient
 from objectvalidator import option
 
-from . import BaseMetrics
-from ..config import ConfigGroup, RetryConfigMixin
+from . import BaseMetrics, iter_metrics
+from ..config import (
+    BufferConfigMixin, ConfigGroup, RetryConfigMixin, SpoolConfigMixin)
+from ..retry import get_circuit_breaker
 
 __all__ = ['InfluxDBMetrics']
 
 logger = logging.getLogger(__name__)
 
 
+class _DeadlineSession(requests.Session):
+    """
+    :class:`requests.Session` which trims timeout of the requests by the
+    :class:`~jobslib.deadline.Deadline` returned by *get_deadline*.
+    """
+
+    def __init__(self, get_deadline):
+        super().__init__()
+        self._get_deadline = get_deadline
+
+    def request(self, method, url, **kwargs):
+        deadline = self._get_deadline()
+        if deadline is not None:
+            kwargs['timeout'] = deadline.timeout(kwargs.get('timeout'))
+        return super().request(method, url, **kwargs)
+
+
 class InfluxDBMetrics(BaseMetrics):
     """
     InfluxDB metrics implementation.
@@ -39,6 +57,13 @@ class InfluxDBMetrics(BaseMetrics):
                 'database': 'dbname',
                 'retry_max_attempts': 10,
                 'retry_wait_multiplier': 50,
+                'buffer_size': 10000,
+                'buffer_batch_size': 1000,
+                'buffer_flush_interval': 10.0,
+                'buffer_overflow_policy': 'drop_oldest',
+                'spool_dir': '/var/spool/myjob/metrics',
+                'spool_max_bytes': 104857600,
+                'spool_batch_size': 1000,
             },
         }
 
@@ -48,17 +73,32 @@ class InfluxDBMetrics(BaseMetrics):
     :envvar:`JOBSLIB_METRICS_INFLUXDB_USERNAME`,
     :envvar:`JOBSLIB_METRICS_INFLUXDB_PASSWORD`,
     :envvar:`JOBSLIB_METRICS_INFLUXDB_DBNAME`,
-    :envvar:`JOBSLIB_METRICS_INFLUXDB_RETRY_MAX_ATTEMPTS` and
-    :envvar:`JOBSLIB_METRICS_INFLUXDB_RETRY_WAIT_MULTIPLIER`
+    :envvar:`JOBSLIB_METRICS_INFLUXDB_RETRY_MAX_ATTEMPTS`,
+    :envvar:`JOBSLIB_METRICS_INFLUXDB_RETRY_WAIT_MULTIPLIER`,
+    :envvar:`JOBSLIB_METRICS_INFLUXDB_BUFFER_SIZE`,
+    :envvar:`JOBSLIB_METRICS_INFLUXDB_BUFFER_BATCH_SIZE`,
+    :envvar:`JOBSLIB_METRICS_INFLUXDB_BUFFER_FLUSH_INTERVAL`,
+    :envvar:`JOBSLIB_METRICS_INFLUXDB_BUFFER_OVERFLOW_POLICY`,
+    :envvar:`JOBSLIB_METRICS_INFLUXDB_SPOOL_DIR`,
+    :envvar:`JOBSLIB_METRICS_INFLUXDB_SPOOL_MAX_BYTES` and
+    :envvar:`JOBSLIB_METRICS_INFLUXDB_SPOOL_BATCH_SIZE`
     environment variables.
+
+    If ``buffer_size`` is greater than 0, points are written in batches
+    by a background thread, so pushing metrics doesn't block the task.
+    If ``spool_dir`` is defined, points which can't be written are
+    spooled on the disk and replayed when InfluxDB is available again.
     """
 
-    class OptionsConfig(RetryConfigMixin, ConfigGroup):
+    class OptionsConfig(BufferConfigMixin, SpoolConfigMixin,
+                        RetryConfigMixin, ConfigGroup):
         """
         Consul liveness options.
         """
 
         retry_env_prefix = 'JOBSLIB_METRICS_INFLUXDB_'
+        buffer_env_prefix = 'JOBSLIB_METRICS_INFLUXDB_'
+        spool_env_prefix = 'JOBSLIB_METRICS_INFLUXDB_'
 
         @option(required=True, attrtype=str)
         def host(self):
@@ -118,21 +158,26 @@ class InfluxDBMetrics(BaseMetrics):
             username=self.options.username,
             password=self.options.password,
             database=self.options.database,
+            session=_DeadlineSession(lambda: self.deadline),
         )
+        self._circuit_breaker = get_circuit_breaker(
+            'http://{}:{}'.format(self.options.host, self.options.port),
+            self.options)
 
-    def push(self, metrics):
-        @retrying.retry(
-            stop_max_attempt_number=self.options.retry_max_attempts,
-            wait_exponential_multiplier=self.options.retry_wait_multiplier)
-        def _write_points(points):
-            self._influxdb.write_points(points)
+    def write_points(self, points):
+        self._circuit_breaker.call(
+            self._influxdb.write_points, points,
+            max_attempts=self.options.retry_max_attempts,
+            wait_multiplier=self.options.retry_wait_multiplier,
+            deadline=self.deadline)
 
+    def push(self, metrics):
         current_dt = datetime.datetime.utcfromtimestamp(time.time())
-        ts = current_dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+        ts = current_dt.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
         task_name = self.context.config.task_class.name
         try:
             points = []
-            for metric_name, metric_value in metrics.items():
+            for metric_name, metric_value in iter_metrics(metrics):
                 tags = {
                     'task': task_name,
                 }
@@ -149,6 +194,8 @@ class InfluxDBMetrics(BaseMetrics):
                     },
                 }
                 points.append(metric)
-            _write_points(points)
+            self.send_points(points)
         except Exception:
             logger.exception('Push monitoring metrics into InfluxDb failed')
+            return False
+        return True
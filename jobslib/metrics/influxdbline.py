@@ -0,0 +1,364 @@
+"""
+Module :mod:`jobslib.metrics.influxdbline` provides
+:class:`InfluxDBLineMetrics` writer.
+"""
+
+import base64
+import gzip
+import http.client
+import logging
+import math
+import os
+import socket
+import threading
+import time
+import urllib.parse
+
+from objectvalidator import option
+
+from . import BaseMetrics, iter_metrics
+from ..config import (
+    BufferConfigMixin, ConfigGroup, RetryConfigMixin, SpoolConfigMixin)
+from ..exceptions import JobsLibError
+from ..retry import get_circuit_breaker
+
+__all__ = ['InfluxDBLineMetrics', 'InfluxDBWriteError']
+
+logger = logging.getLogger(__name__)
+
+MAX_CACHED_SERIES = 10000
+
+MAX_UDP_PACKET_SIZE = 1432
+
+
+class InfluxDBWriteError(JobsLibError):
+    """
+    InfluxDB has rejected written points with HTTP *status*.
+    """
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def escape_measurement(value):
+    """
+    Escape measurement name for InfluxDB line protocol.
+    """
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace(',', '\\,')
+        .replace(' ', '\\ ')
+        .replace('\n', '\\n')
+    )
+
+
+def escape_key(value):
+    """
+    Escape tag key, tag value or field key for InfluxDB line protocol.
+    """
+    return escape_measurement(value).replace('=', '\\=')
+
+
+class InfluxDBLineMetrics(BaseMetrics):
+    """
+    InfluxDB metrics implementation, which writes InfluxDB line protocol
+    directly. Timestamps have nanosecond precision, escaped series (name
+    and tags) are cached. Points are sent either over the persistent HTTP
+    connection in gzip compressed body, or over UDP if ``udp_port`` is
+    defined. Each metric has ``task`` tag containing name of the task.
+
+    For use of :class:`InfluxDBLineMetrics` write into :mod:`settings`:
+
+    .. code-block:: python
+
+        METRICS = {
+            'backend': 'jobslib.metrics.influxdbline.InfluxDBLineMetrics',
+            'options': {
+                'host': 'hostname',
+                'port': 8086,
+                'username': 'root',
+                'password': 'root',
+                'database': 'dbname',
+                'timeout': 5.0,
+                'gzip': True,
+                'udp_port': None,
+                'retry_max_attempts': 10,
+                'retry_wait_multiplier': 50,
+                'buffer_size': 10000,
+                'spool_dir': '/var/spool/myjob/metrics',
+            },
+        }
+
+    Or use
+    :envvar:`JOBSLIB_METRICS_INFLUXDBLINE_HOST`,
+    :envvar:`JOBSLIB_METRICS_INFLUXDBLINE_PORT`,
+    :envvar:`JOBSLIB_METRICS_INFLUXDBLINE_USERNAME`,
+    :envvar:`JOBSLIB_METRICS_INFLUXDBLINE_PASSWORD`,
+    :envvar:`JOBSLIB_METRICS_INFLUXDBLINE_DBNAME`,
+    :envvar:`JOBSLIB_METRICS_INFLUXDBLINE_TIMEOUT`,
+    :envvar:`JOBSLIB_METRICS_INFLUXDBLINE_GZIP`,
+    :envvar:`JOBSLIB_METRICS_INFLUXDBLINE_UDP_PORT`,
+    :envvar:`JOBSLIB_METRICS_INFLUXDBLINE_RETRY_MAX_ATTEMPTS`,
+    :envvar:`JOBSLIB_METRICS_INFLUXDBLINE_RETRY_WAIT_MULTIPLIER`,
+    ``JOBSLIB_METRICS_INFLUXDBLINE_BUFFER_*`` and
+    ``JOBSLIB_METRICS_INFLUXDBLINE_SPOOL_*`` environment variables.
+    """
+
+    class OptionsConfig(BufferConfigMixin, SpoolConfigMixin,
+                        RetryConfigMixin, ConfigGroup):
+        """
+        InfluxDB line protocol metrics options.
+        """
+
+        retry_env_prefix = 'JOBSLIB_METRICS_INFLUXDBLINE_'
+        buffer_env_prefix = 'JOBSLIB_METRICS_INFLUXDBLINE_'
+        spool_env_prefix = 'JOBSLIB_METRICS_INFLUXDBLINE_'
+
+        @option(required=True, attrtype=str)
+        def host(self):
+            """
+            InfluxDB host
+            """
+            host = os.environ.get('JOBSLIB_METRICS_INFLUXDBLINE_HOST')
+            if host:
+                return host
+            return self._settings.get('host', 'localhost')
+
+        @option(required=True, attrtype=int)
+        def port(self):
+            """
+            InfluxDB HTTP port
+            """
+            port = os.environ.get('JOBSLIB_METRICS_INFLUXDBLINE_PORT')
+            if port:
+                return int(port)
+            return self._settings.get('port', 8086)
+
+        @option(attrtype=str)
+        def username(self):
+            """
+            InfluxDB username, if value is not defined, authentication
+            is disabled.
+            """
+            username = os.environ.get('JOBSLIB_METRICS_INFLUXDBLINE_USERNAME')
+            if username:
+                return username
+            return self._settings.get('username')
+
+        @option(attrtype=str)
+        def password(self):
+            """
+            InfluxDB password
+            """
+            password = os.environ.get('JOBSLIB_METRICS_INFLUXDBLINE_PASSWORD')
+            if password:
+                return password
+            return self._settings.get('password')
+
+        @option(required=True, attrtype=str)
+        def database(self):
+            """
+            InfluxDB database
+            """
+            database = os.environ.get('JOBSLIB_METRICS_INFLUXDBLINE_DBNAME')
+            if database:
+                return database
+            return self._settings['database']
+
+        @option(required=True, attrtype=float)
+        def timeout(self):
+            """
+            Timeout in seconds for connect/read/write operation.
+            """
+            timeout = os.environ.get('JOBSLIB_METRICS_INFLUXDBLINE_TIMEOUT')
+            if timeout:
+                return float(timeout)
+            timeout = self._settings.get('timeout', 5.0)
+            if isinstance(timeout, int):
+                timeout = float(timeout)
+            return timeout
+
+        @option(required=True, attrtype=bool)
+        def gzip(self):
+            """
+            :class:`!bool` that indicates that HTTP body is gzip
+            compressed. Default is :data:`!True`.
+            """
+            gzip = os.environ.get('JOBSLIB_METRICS_INFLUXDBLINE_GZIP')
+            if gzip:
+                return bool(int(gzip))
+            return self._settings.get('gzip', True)
+
+        @option(attrtype=int)
+        def udp_port(self):
+            """
+            InfluxDB UDP port. If value is defined, points are sent over
+            UDP instead of HTTP. Database is defined by InfluxDB UDP
+            listener configuration.
+            """
+            udp_port = os.environ.get('JOBSLIB_METRICS_INFLUXDBLINE_UDP_PORT')
+            if udp_port:
+                return int(udp_port)
+            return self._settings.get('udp_port')
+
+    def __init__(self, context, options):
+        super().__init__(context, options)
+        self._series = {}
+        self._connection = None
+        self._socket = None
+        self._lock = threading.Lock()
+        query = {'db': self.options.database, 'precision': 'ns'}
+        self._write_url = '/write?' + urllib.parse.urlencode(query)
+        self._headers = {'Content-Type': 'text/plain; charset=utf-8'}
+        if self.options.gzip:
+            self._headers['Content-Encoding'] = 'gzip'
+        if self.options.username:
+            credentials = '{}:{}'.format(
+                self.options.username, self.options.password or '')
+            self._headers['Authorization'] = 'Basic {}'.format(
+                base64.b64encode(credentials.encode('utf-8')).decode('ascii'))
+        self._circuit_breaker = get_circuit_breaker(
+            'http://{}:{}'.format(self.options.host, self.options.port),
+            self.options)
+
+    def get_series(self, name, tags):
+        """
+        Return escaped series (measurement and tags) in line protocol
+        format. Series are cached.
+        """
+        key = (name, tuple(sorted(tags.items())))
+        series = self._series.get(key)
+        if series is None:
+            if len(self._series) >= MAX_CACHED_SERIES:
+                self._series.clear()
+            series = ','.join(
+                [escape_measurement(name)] +
+                ['{}={}'.format(escape_key(k), escape_key(v))
+                 for k, v in key[1]])
+            self._series[key] = series
+        return series
+
+    def make_lines(self, metrics, timestamp=None):
+        """
+        Return *metrics* as a :class:`!list` of the line protocol lines.
+        *timestamp* is UNIX time in nanoseconds, current time is used if
+        value is not passed.
+        """
+        if timestamp is None:
+            timestamp = time.time_ns()
+        task_name = self.context.config.task_class.name
+        lines = []
+        for metric_name, metric_value in iter_metrics(metrics):
+            tags = {
+                'task': task_name,
+            }
+            for k, v in metric_value.get('tags', {}).items():
+                if k in tags:
+                    raise Exception("Tag '{}' is reserved".format(k))
+                tags[k] = v
+            value = float(metric_value['value'])
+            if math.isnan(value) or math.isinf(value):
+                continue
+            lines.append('{} value={!r} {}'.format(
+                self.get_series(metric_name, tags), value, timestamp))
+        return lines
+
+    def _get_connection(self):
+        if self._connection is None:
+            self._connection = http.client.HTTPConnection(
+                self.options.host, self.options.port,
+                timeout=self.options.timeout)
+        return self._connection
+
+    def _close_connection(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _post(self, body, timeout=None):
+        """
+        Send *body* over the persistent HTTP connection. If *timeout* is
+        not :data:`!None`, it replaces :attr:`OptionsConfig.timeout`.
+        """
+        if timeout is None:
+            timeout = self.options.timeout
+        with self._lock:
+            try:
+                connection = self._get_connection()
+                connection.timeout = timeout
+                if connection.sock is not None:
+                    connection.sock.settimeout(timeout)
+                connection.request(
+                    'POST', self._write_url, body=body, headers=self._headers)
+                response = connection.getresponse()
+                content = response.read()
+            except Exception:
+                self._close_connection()
+                raise
+        if response.status != 204:
+            raise InfluxDBWriteError(
+                'InfluxDB write failed: {} {}'.format(
+                    response.status, content[:200]),
+                response.status)
+
+    def _send_udp(self, lines):
+        """
+        Send *lines* over UDP, each datagram contains as many lines as
+        possible.
+        """
+        if self._socket is None:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._socket.setblocking(False)
+        address = (self.options.host, self.options.udp_port)
+        packet = b''
+        for line in lines:
+            line = line.encode('utf-8')
+            if packet and len(packet) + len(line) + 1 > MAX_UDP_PACKET_SIZE:
+                self._socket.sendto(packet, address)
+                packet = b''
+            packet = packet + b'\n' + line if packet else line
+        if packet:
+            self._socket.sendto(packet, address)
+
+    def write_points(self, points):
+        if self.options.udp_port is not None:
+            self._send_udp(points)
+            return
+
+        body = ('\n'.join(points) + '\n').encode('utf-8')
+        if self.options.gzip:
+            body = gzip.compress(body, compresslevel=1)
+
+        deadline = self.deadline
+
+        def _write_points(body):
+            if deadline is not None:
+                self._post(body, deadline.timeout(self.options.timeout))
+            else:
+                self._post(body)
+
+        self._circuit_breaker.call(
+            _write_points, body,
+            max_attempts=self.options.retry_max_attempts,
+            wait_multiplier=self.options.retry_wait_multiplier,
+            deadline=deadline)
+
+    def push(self, metrics):
+        try:
+            lines = self.make_lines(metrics)
+            if lines:
+                self.send_points(lines)
+        except Exception:
+            logger.exception('Push monitoring metrics into InfluxDb failed')
+            return False
+        return True
+
+    def close(self, timeout=None):
+        super().close(timeout)
+        with self._lock:
+            self._close_connection()
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
@@ -0,0 +1,254 @@
+"""
+Module :mod:`jobslib.metrics.prometheus` provides :class:`PrometheusMetrics`
+writer.
+"""
+
+import http.server
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+
+from objectvalidator import option
+
+from . import BaseMetrics, iter_metrics
+from ..config import ConfigGroup
+
+__all__ = ['PrometheusMetrics']
+
+logger = logging.getLogger(__name__)
+
+OPENMETRICS_CONTENT_TYPE = \
+    'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+INVALID_NAME_CHARS = re.compile(r'[^a-zA-Z0-9_:]')
+INVALID_LABEL_CHARS = re.compile(r'[^a-zA-Z0-9_]')
+
+
+def sanitize_name(name, invalid_chars=INVALID_NAME_CHARS):
+    """
+    Return *name* which is valid Prometheus metric or label name.
+    """
+    name = invalid_chars.sub('_', name)
+    if not name or name[0].isdigit():
+        name = '_' + name
+    return name
+
+
+def escape_label_value(value):
+    """
+    Return escaped label *value*.
+    """
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('\n', '\\n')
+        .replace('"', '\\"')
+    )
+
+
+def format_value(value):
+    """
+    Return *value* formatted for exposition.
+    """
+    value = float(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+
+class PrometheusMetrics(BaseMetrics):
+    """
+    Prometheus metrics implementation. Metrics are kept in memory and
+    they are either written into the file for node_exporter's textfile
+    collector or served on ``/metrics`` HTTP endpoint in OpenMetrics
+    format, or both. Nothing is sent over the network during the
+    iteration. Metrics of the ``counter`` type are accumulated, other
+    metrics are exported as gauges containing the last value. Each series
+    has ``task`` label containing name of the task.
+
+    For use of :class:`PrometheusMetrics` write into :mod:`settings`:
+
+    .. code-block:: python
+
+        METRICS = {
+            'backend': 'jobslib.metrics.prometheus.PrometheusMetrics',
+            'options': {
+                'textfile': '/var/lib/node_exporter/textfile/myjob.prom',
+                'host': '0.0.0.0',
+                'port': 9100,
+            },
+        }
+
+    Or use
+    :envvar:`JOBSLIB_METRICS_PROMETHEUS_TEXTFILE`,
+    :envvar:`JOBSLIB_METRICS_PROMETHEUS_HOST` and
+    :envvar:`JOBSLIB_METRICS_PROMETHEUS_PORT`
+    environment variables.
+    """
+
+    class OptionsConfig(ConfigGroup):
+        """
+        Prometheus metrics options.
+        """
+
+        @option(attrtype=str)
+        def textfile(self):
+            """
+            Path to the file for node_exporter's textfile collector. File
+            is written atomically after each push. If value is not defined,
+            file is not written.
+            """
+            textfile = os.environ.get('JOBSLIB_METRICS_PROMETHEUS_TEXTFILE')
+            if textfile:
+                return textfile
+            return self._settings.get('textfile')
+
+        @option(required=True, attrtype=str)
+        def host(self):
+            """
+            IP address where the ``/metrics`` endpoint is listening on.
+            Default is ``0.0.0.0``.
+            """
+            host = os.environ.get('JOBSLIB_METRICS_PROMETHEUS_HOST')
+            if host:
+                return host
+            return self._settings.get('host', '0.0.0.0')
+
+        @option(attrtype=int)
+        def port(self):
+            """
+            Port where the ``/metrics`` endpoint is listening on. If value
+            is not defined, endpoint is disabled.
+            """
+            port = os.environ.get('JOBSLIB_METRICS_PROMETHEUS_PORT')
+            if port:
+                return int(port)
+            return self._settings.get('port')
+
+    def __init__(self, context, options):
+        super().__init__(context, options)
+        if self.options.textfile is None and self.options.port is None:
+            raise ValueError('Either textfile or port must be defined')
+        self._lock = threading.Lock()
+        self._series = {}
+        self._server = None
+        self.server_address = None
+        if self.options.port is not None:
+            self._start_server()
+
+    def _start_server(self):
+        metrics = self
+
+        class MetricsHandler(http.server.BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.exposition(openmetrics=True).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', OPENMETRICS_CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                logger.debug(fmt, *args)
+
+        self._server = http.server.ThreadingHTTPServer(
+            (self.options.host, self.options.port), MetricsHandler)
+        self._server.daemon_threads = True
+        self.server_address = self._server.server_address
+        thread = threading.Thread(
+            target=self._server.serve_forever,
+            name='jobslib-prometheus', daemon=True)
+        thread.start()
+
+    def push(self, metrics):
+        task_name = self.context.config.task_class.name
+        try:
+            with self._lock:
+                for metric_name, metric_value in iter_metrics(metrics):
+                    labels = {
+                        'task': task_name,
+                    }
+                    for k, v in metric_value.get('tags', {}).items():
+                        if k in labels:
+                            raise Exception("Tag '{}' is reserved".format(k))
+                        labels[k] = v
+                    metric_type = metric_value.get('type', 'gauge')
+                    if metric_type != 'counter':
+                        metric_type = 'gauge'
+                    value = float(metric_value['value'])
+                    family = self._series.setdefault(
+                        sanitize_name(metric_name), [metric_type, {}])
+                    if family[0] != metric_type:
+                        raise Exception(
+                            "Metric '{}' is already registered as {}".format(
+                                metric_name, family[0]))
+                    key = tuple(sorted(
+                        (sanitize_name(k, INVALID_LABEL_CHARS),
+                         escape_label_value(v))
+                        for k, v in labels.items()))
+                    if metric_type == 'counter':
+                        family[1][key] = family[1].get(key, 0.0) + value
+                    else:
+                        family[1][key] = value
+            if self.options.textfile:
+                self.write_textfile()
+        except Exception:
+            logger.exception('Push monitoring metrics into Prometheus failed')
+            return False
+        return True
+
+    def exposition(self, openmetrics=False):
+        """
+        Return metrics as a :class:`!str` in Prometheus text format, or
+        in OpenMetrics format if *openmetrics* is :data:`!True`.
+        """
+        lines = []
+        with self._lock:
+            for name, (metric_type, series) in sorted(self._series.items()):
+                sample_name = name
+                if openmetrics and metric_type == 'counter':
+                    if name.endswith('_total'):
+                        name = name[:-len('_total')]
+                    sample_name = name + '_total'
+                lines.append('# TYPE {} {}'.format(name, metric_type))
+                for labels, value in sorted(series.items()):
+                    lines.append('{}{{{}}} {}'.format(
+                        sample_name,
+                        ','.join('{}="{}"'.format(k, v) for k, v in labels),
+                        format_value(value)))
+        if openmetrics:
+            lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self):
+        """
+        Write metrics into the :attr:`OptionsConfig.textfile` atomically.
+        """
+        path = self.options.textfile
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path) or '.',
+            prefix='.{}.'.format(os.path.basename(path)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(self.exposition())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def close(self, timeout=None):
+        super().close(timeout)
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,381 @@
+"""
+Module :mod:`jobslib.metrics.registry` provides :class:`MetricsRegistry`,
+which aggregates metrics inside the task. Values are aggregated locally
+and pushed once per iteration together with ``job_duration_seconds``.
+Registry is available on metrics backend, so use helpers
+:meth:`~jobslib.metrics.BaseMetrics.counter`,
+:meth:`~jobslib.metrics.BaseMetrics.gauge`,
+:meth:`~jobslib.metrics.BaseMetrics.histogram`,
+:meth:`~jobslib.metrics.BaseMetrics.summary` and
+:meth:`~jobslib.metrics.BaseMetrics.timer`.
+
+Summaries keep streaming quantile sketch of the observed values and they
+are pushed as pre-aggregated quantiles once per
+:attr:`MetricsRegistry.summary_interval` seconds. If the interval is
+greater than 0, timers are summaries too.
+
+.. code-block:: python
+
+    def task(self):
+        processed = self.context.metrics.counter(
+            'processed_items', tags={'queue': 'emails'})
+        for item in self.get_items():
+            with self.context.metrics.timer('process_item_seconds'):
+                self.process(item)
+            processed.inc()
+"""
+
+import bisect
+import math
+import threading
+import time
+
+from .summary import QuantileSketch
+
+__all__ = [
+    'MetricsRegistry', 'Counter', 'Gauge', 'Histogram', 'Summary', 'Timer',
+    'SummaryTimer',
+]
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric(object):
+    """
+    Ancestor for aggregated metric.
+    """
+
+    def __init__(self, name, tags):
+        self.name = name
+        self.tags = tags
+        self._lock = threading.Lock()
+        self._updated = False
+
+    def collect(self, force=False):
+        """
+        Return :class:`!list` of the ``(name, value, type, tags)`` tuples
+        and reset the metric. Return empty :class:`!list` if metric has not
+        been updated since the last collecting. If *force* is
+        :data:`!True`, collect metric even if its interval has not elapsed.
+        """
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """
+    Counter, it is pushed as a sum of the increments since the last push.
+    """
+
+    def __init__(self, name, tags):
+        super().__init__(name, tags)
+        self._value = 0
+
+    def inc(self, value=1):
+        """
+        Increment counter by *value*.
+        """
+        with self._lock:
+            self._value += value
+            self._updated = True
+
+    def collect(self, force=False):
+        with self._lock:
+            if not self._updated:
+                return []
+            value, self._value, self._updated = self._value, 0, False
+        return [(self.name, value, 'counter', self.tags)]
+
+
+class Gauge(Metric):
+    """
+    Gauge, it is pushed as a last value when it has been updated since
+    the last push.
+    """
+
+    def __init__(self, name, tags):
+        super().__init__(name, tags)
+        self._value = 0
+
+    def set(self, value):
+        """
+        Set gauge to *value*.
+        """
+        with self._lock:
+            self._value = value
+            self._updated = True
+
+    def inc(self, value=1):
+        """
+        Increment gauge by *value*.
+        """
+        with self._lock:
+            self._value += value
+            self._updated = True
+
+    def dec(self, value=1):
+        """
+        Decrement gauge by *value*.
+        """
+        self.inc(-value)
+
+    def collect(self, force=False):
+        with self._lock:
+            if not self._updated:
+                return []
+            value, self._updated = self._value, False
+        return [(self.name, value, 'gauge', self.tags)]
+
+
+class Histogram(Metric):
+    """
+    Histogram, it is pushed as ``<name>_bucket`` counters with ``le`` tag,
+    which are cumulative counts of the values less than or equal to the
+    *buckets* boundaries (the last one is ``+Inf``), and ``<name>_count``,
+    ``<name>_sum``, ``<name>_min`` and ``<name>_max`` metrics of the
+    values observed since the last push.
+    """
+
+    def __init__(self, name, tags, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, tags)
+        self.buckets = tuple(sorted(buckets))
+        self._reset()
+
+    def _reset(self):
+        self._bucket_counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._min = math.inf
+        self._max = -math.inf
+        self._updated = False
+
+    def observe(self, value):
+        """
+        Observe *value*.
+        """
+        with self._lock:
+            self._bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._count += 1
+            self._sum += value
+            if value < self._min:
+                self._min = value
+            if value > self._max:
+                self._max = value
+            self._updated = True
+
+    def collect(self, force=False):
+        with self._lock:
+            if not self._updated:
+                return []
+            res = [
+                (self.name + '_count', self._count, 'counter', self.tags),
+                (self.name + '_sum', self._sum, 'counter', self.tags),
+                (self.name + '_min', self._min, 'gauge', self.tags),
+                (self.name + '_max', self._max, 'gauge', self.tags),
+            ]
+            bounds = [str(float(b)) for b in self.buckets] + ['+Inf']
+            cumulative = 0
+            for bound, count in zip(bounds, self._bucket_counts):
+                cumulative += count
+                tags = dict(self.tags, le=bound)
+                res.append(
+                    (self.name + '_bucket', cumulative, 'counter', tags))
+            self._reset()
+        return res
+
+
+class Summary(Metric):
+    """
+    Summary, it is pushed as ``<name>_count`` and ``<name>_sum`` counters
+    and ``<name>`` gauges with ``quantile`` tag, once per *interval*
+    seconds. Quantiles are estimated from values observed during the
+    interval using :class:`~jobslib.metrics.summary.QuantileSketch`.
+    """
+
+    def __init__(self, name, tags, interval=0, quantiles=DEFAULT_QUANTILES):
+        super().__init__(name, tags)
+        self.interval = interval
+        self.quantiles = quantiles
+        self._sketch = QuantileSketch()
+        self._collected = time.monotonic()
+
+    def observe(self, value):
+        """
+        Observe *value*.
+        """
+        with self._lock:
+            self._sketch.add(value)
+            self._updated = True
+
+    def collect(self, force=False):
+        now = time.monotonic()
+        with self._lock:
+            if not self._updated:
+                return []
+            if not force and now - self._collected < self.interval:
+                return []
+            sketch = self._sketch
+            res = [
+                (self.name + '_count', sketch.count, 'counter', self.tags),
+                (self.name + '_sum', sketch.sum, 'counter', self.tags),
+            ]
+            for q in self.quantiles:
+                tags = dict(self.tags, quantile=str(q))
+                res.append((self.name, sketch.quantile(q), 'gauge', tags))
+            sketch.reset()
+            self._updated = False
+            self._collected = now
+        return res
+
+
+class TimerMixin(object):
+    """
+    Measures durations in seconds. Use instance as a context manager.
+    """
+
+    def __enter__(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(time.perf_counter())
+        return self
+
+    def __exit__(self, unused_exc_type, unused_exc_value, unused_tb):
+        self.observe(time.perf_counter() - self._local.stack.pop())
+
+
+class Timer(TimerMixin, Histogram):
+    """
+    Histogram of durations in seconds. Use instance as a context manager,
+    or call :meth:`observe` directly.
+    """
+
+    def __init__(self, name, tags, **kwargs):
+        super().__init__(name, tags, **kwargs)
+        self._local = threading.local()
+
+
+class SummaryTimer(TimerMixin, Summary):
+    """
+    Summary of durations in seconds. Use instance as a context manager,
+    or call :meth:`observe` directly.
+    """
+
+    def __init__(self, name, tags, **kwargs):
+        super().__init__(name, tags, **kwargs)
+        self._local = threading.local()
+
+
+class MetricsRegistry(object):
+    """
+    Registry of the aggregated metrics. Metric is identified by name and
+    tags, helpers return the same instance for the same name and tags.
+    So it is possible to keep the instance in hot loop.
+    """
+
+    summary_interval = 0
+    """
+    Interval in seconds in which summaries are pushed. If value is 0,
+    summaries are pushed at the end of each iteration and timers are
+    histograms.
+    """
+
+    summary_quantiles = DEFAULT_QUANTILES
+    """
+    Quantiles which are pushed for summaries.
+    """
+
+    histogram_buckets = DEFAULT_BUCKETS
+    """
+    Upper boundaries of the buckets of histograms and timers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get_metric(self, metric_cls, name, tags, **kwargs):
+        tags = dict(tags) if tags else {}
+        key = (name, tuple(sorted(tags.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = metric_cls(name, tags, **kwargs)
+                    self._metrics[key] = metric
+        if not isinstance(metric, metric_cls):
+            raise TypeError(
+                "Metric '{}' is already registered as {}".format(
+                    name, metric.__class__.__name__))
+        return metric
+
+    def counter(self, name, tags=None):
+        """
+        Return :class:`Counter` identified by *name* and *tags*.
+        """
+        return self._get_metric(Counter, name, tags)
+
+    def gauge(self, name, tags=None):
+        """
+        Return :class:`Gauge` identified by *name* and *tags*.
+        """
+        return self._get_metric(Gauge, name, tags)
+
+    def histogram(self, name, tags=None):
+        """
+        Return :class:`Histogram` identified by *name* and *tags*.
+        """
+        return self._get_metric(
+            Histogram, name, tags, buckets=self.histogram_buckets)
+
+    def summary(self, name, tags=None):
+        """
+        Return :class:`Summary` identified by *name* and *tags*.
+        """
+        return self._get_metric(
+            Summary, name, tags, interval=self.summary_interval,
+            quantiles=self.summary_quantiles)
+
+    def timer(self, name, tags=None):
+        """
+        Return :class:`Timer` identified by *name* and *tags*, or
+        :class:`SummaryTimer` if :attr:`summary_interval` is greater
+        than 0.
+        """
+        if self.summary_interval:
+            return self._get_metric(
+                SummaryTimer, name, tags, interval=self.summary_interval,
+                quantiles=self.summary_quantiles)
+        return self._get_metric(
+            Timer, name, tags, buckets=self.histogram_buckets)
+
+    def collect(self, metrics=None, force=False):
+        """
+        Collect aggregated values and return them in format of the
+        :meth:`jobslib.metrics.BaseMetrics.push` argument. If *metrics*
+        is passed, aggregated values are added into it. If *force* is
+        :data:`!True`, summaries are collected even if their interval
+        has not elapsed.
+        """
+        if metrics is None:
+            metrics = {}
+        with self._lock:
+            registered = list(self._metrics.values())
+        for metric in registered:
+            for name, value, metric_type, tags in metric.collect(force):
+                item = {
+                    'value': value,
+                    'tags': tags,
+                    'type': metric_type,
+                }
+                existing = metrics.get(name)
+                if existing is None:
+                    metrics[name] = [item]
+                elif isinstance(existing, list):
+                    existing.append(item)
+                else:
+                    metrics[name] = [existing, item]
+        return metrics
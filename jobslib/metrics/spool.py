@@ -0,0 +1,187 @@
+"""
+Module :mod:`jobslib.metrics.spool` provides :class:`MetricsSpool`,
+write-ahead spool which persists metrics points on the disk when the
+backend is not available.
+"""
+
+import errno
+import json
+import logging
+import os
+import re
+import threading
+
+__all__ = ['MetricsSpool']
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_RE = re.compile(r'^(?P<prefix>.+)-(?P<pid>\d+)-(?P<seq>\d+)\.spool$')
+
+
+def pid_exists(pid):
+    """
+    Return :data:`!True` if process *pid* is running.
+    """
+    try:
+        os.kill(pid, 0)
+    except OSError as exc:
+        return exc.errno == errno.EPERM
+    return True
+
+
+class MetricsSpool(object):
+    """
+    Write-ahead spool of the metrics points. Points which can't be written
+    into the backend are appended into the segment file in the *directory*.
+    Each process has its own segment files named
+    ``<prefix>-<pid>-<sequence>.spool``, each line of the segment contains
+    one batch of the points serialized as a JSON. Segment is rotated when
+    its size reaches *segment_size* bytes. When size of all segments
+    exceeds *max_bytes*, the oldest segments are evicted.
+
+    Points are replayed in order, in batches of at most *batch_size*
+    points, see :meth:`replay`. Segments left by the finished processes
+    with the same *prefix* are replayed too.
+    """
+
+    def __init__(self, directory, prefix, max_bytes, batch_size=1000,
+                 segment_size=None):
+        self.directory = directory
+        self.prefix = re.sub(r'[^a-zA-Z0-9_.]', '_', prefix)
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.segment_size = segment_size or max(max_bytes // 10, 1)
+        self.evicted = 0
+        self._pid = os.getpid()
+        self._seq = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._segments = self._find_segments()
+        self._size = sum(self._segment_size(path) for path in self._segments)
+
+    def __len__(self):
+        return len(self._segments)
+
+    @staticmethod
+    def _segment_size(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def _find_segments(self):
+        """
+        Return paths of the existing segments of this and finished
+        processes, ordered from the oldest one.
+        """
+        segments = []
+        for filename in os.listdir(self.directory):
+            match = SEGMENT_RE.match(filename)
+            if not match or match.group('prefix') != self.prefix:
+                continue
+            pid = int(match.group('pid'))
+            if pid != self._pid and pid_exists(pid):
+                continue
+            path = os.path.join(self.directory, filename)
+            segments.append((os.path.getmtime(path), filename, path))
+        segments.sort()
+        return [path for unused_mtime, unused_filename, path in segments]
+
+    def _new_segment(self):
+        self._seq += 1
+        path = os.path.join(
+            self.directory, '{}-{}-{:010d}.spool'.format(
+                self.prefix, self._pid, self._seq))
+        self._segments.append(path)
+        return path
+
+    def _current_segment(self):
+        if self._segments:
+            path = self._segments[-1]
+            match = SEGMENT_RE.match(os.path.basename(path))
+            if (int(match.group('pid')) == self._pid and
+                    self._segment_size(path) < self.segment_size):
+                return path
+        return self._new_segment()
+
+    def _evict(self):
+        while self._size > self.max_bytes and len(self._segments) > 1:
+            path = self._segments.pop(0)
+            size = self._segment_size(path)
+            try:
+                os.unlink(path)
+            except OSError:
+                logger.exception("Can't remove spool segment %s", path)
+            self._size -= size
+            self.evicted += 1
+            logger.warning(
+                "Metrics spool is full, segment %s has been evicted", path)
+
+    def append(self, points):
+        """
+        Append *points* into the spool.
+        """
+        data = (json.dumps(points) + '\n').encode('utf-8')
+        with self._lock:
+            path = self._current_segment()
+            with open(path, 'ab') as f:
+                f.write(data)
+            self._size += len(data)
+            self._evict()
+
+    def replay(self, write):
+        """
+        Write all spooled points in order using *write* callable. Stop
+        replaying when *write* raises an exception, unsent points are kept
+        in the spool and the exception is re-raised.
+        """
+        with self._lock:
+            while self._segments:
+                path = self._segments[0]
+                try:
+                    with open(path, 'rb') as f:
+                        lines = f.readlines()
+                except FileNotFoundError:
+                    lines = []
+                sent = 0
+                try:
+                    while sent < len(lines):
+                        batch = []
+                        count = sent
+                        while count < len(lines) and (
+                                not batch or
+                                len(batch) < self.batch_size):
+                            try:
+                                batch.extend(json.loads(lines[count]))
+                            except ValueError:
+                                logger.error(
+                                    "Invalid record in spool segment %s",
+                                    path)
+                            count += 1
+                        if batch:
+                            write(batch)
+                        sent = count
+                except Exception:
+                    self._rewrite(path, lines[sent:])
+                    raise
+                self._segments.pop(0)
+                self._size -= sum(len(line) for line in lines)
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            self._size = 0
+
+    def _rewrite(self, path, lines):
+        """
+        Atomically replace content of the segment *path* by *lines*.
+        """
+        stat = os.stat(path)
+        removed = stat.st_size - sum(len(line) for line in lines)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.writelines(lines)
+        # Keep modification time, segments are ordered according to it
+        os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(tmp_path, path)
+        self._size -= removed
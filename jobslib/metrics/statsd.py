@@ -0,0 +1,228 @@
+"""
+Module :mod:`jobslib.metrics.statsd` provides :class:`StatsdMetrics`
+writer.
+"""
+
+import logging
+import os
+import re
+import socket
+
+from objectvalidator import option
+
+from . import BaseMetrics, iter_metrics
+from ..config import ConfigGroup
+
+__all__ = ['StatsdMetrics']
+
+logger = logging.getLogger(__name__)
+
+INVALID_CHARS = re.compile(r'[:|@#,=\s]')
+
+TAGS_FORMATS = ('dogstatsd', 'telegraf')
+
+
+def sanitize(value):
+    """
+    Replace characters which have special meaning in StatsD datagram.
+    """
+    return INVALID_CHARS.sub('_', str(value))
+
+
+class StatsdMetrics(BaseMetrics):
+    """
+    StatsD metrics implementation. Metrics are sent as fire-and-forget
+    UDP datagrams, sending never blocks and it is never retried. Several
+    metrics are packed into one datagram up to ``max_packet_size`` bytes.
+    Metrics of the ``counter`` type are sent as StatsD counters, other
+    metrics as gauges. Tags are written either in DogStatsD format
+    (``name:1|c|#tag:value``) or in Telegraf format
+    (``name,tag=value:1|c``). Each metric has ``task`` tag containing
+    name of the task.
+
+    For use of :class:`StatsdMetrics` write into :mod:`settings`:
+
+    .. code-block:: python
+
+        METRICS = {
+            'backend': 'jobslib.metrics.statsd.StatsdMetrics',
+            'options': {
+                'host': 'localhost',
+                'port': 8125,
+                'prefix': 'jobs.',
+                'max_packet_size': 1432,
+                'tags_format': 'dogstatsd',
+            },
+        }
+
+    Or use
+    :envvar:`JOBSLIB_METRICS_STATSD_HOST`,
+    :envvar:`JOBSLIB_METRICS_STATSD_PORT`,
+    :envvar:`JOBSLIB_METRICS_STATSD_PREFIX`,
+    :envvar:`JOBSLIB_METRICS_STATSD_MAX_PACKET_SIZE` and
+    :envvar:`JOBSLIB_METRICS_STATSD_TAGS_FORMAT`
+    environment variables.
+    """
+
+    class OptionsConfig(ConfigGroup):
+        """
+        StatsD metrics options.
+        """
+
+        @option(required=True, attrtype=str)
+        def host(self):
+            """
+            IP address or hostname of the StatsD server.
+            """
+            host = os.environ.get('JOBSLIB_METRICS_STATSD_HOST')
+            if host:
+                return host
+            return self._settings.get('host', '127.0.0.1')
+
+        @option(required=True, attrtype=int)
+        def port(self):
+            """
+            Port where the StatsD server listening on.
+            """
+            port = os.environ.get('JOBSLIB_METRICS_STATSD_PORT')
+            if port:
+                return int(port)
+            return self._settings.get('port', 8125)
+
+        @option(required=True, attrtype=str)
+        def prefix(self):
+            """
+            Prefix of the metrics names. Default is empty string.
+            """
+            prefix = os.environ.get('JOBSLIB_METRICS_STATSD_PREFIX')
+            if prefix:
+                return prefix
+            return self._settings.get('prefix', '')
+
+        @option(required=True, attrtype=int)
+        def max_packet_size(self):
+            """
+            Maximum size of the UDP datagram in bytes. Default is 1432,
+            which fits into Ethernet MTU.
+            """
+            size = os.environ.get('JOBSLIB_METRICS_STATSD_MAX_PACKET_SIZE')
+            if size:
+                size = int(size)
+            else:
+                size = self._settings.get('max_packet_size', 1432)
+            if size < 64 or size > 65507:
+                raise ValueError(
+                    'max_packet_size must be between 64 and 65507 bytes')
+            return size
+
+        @option(required=True, attrtype=str)
+        def tags_format(self):
+            """
+            Format of the tags, either ``dogstatsd`` or ``telegraf``.
+            Default is ``dogstatsd``.
+            """
+            tags_format = os.environ.get('JOBSLIB_METRICS_STATSD_TAGS_FORMAT')
+            if not tags_format:
+                tags_format = self._settings.get('tags_format', 'dogstatsd')
+            if tags_format not in TAGS_FORMATS:
+                raise ValueError(
+                    'Invalid tags format: {}'.format(tags_format))
+            return tags_format
+
+    def __init__(self, context, options):
+        super().__init__(context, options)
+        self._socket = None
+
+    def _connect(self):
+        family, socktype, proto, unused_canonname, address = \
+            socket.getaddrinfo(
+                self.options.host, self.options.port,
+                type=socket.SOCK_DGRAM)[0]
+        sock = socket.socket(family, socktype, proto)
+        sock.setblocking(False)
+        sock.connect(address)
+        return sock
+
+    def format_metric(self, name, value, metric_type, tags):
+        """
+        Return StatsD lines of the one metric as a :class:`!list`.
+        """
+        name = sanitize(self.options.prefix + name)
+        tags = sorted((sanitize(k), sanitize(v)) for k, v in tags.items())
+        if self.options.tags_format == 'telegraf':
+            name = ','.join(
+                [name] + ['{}={}'.format(k, v) for k, v in tags])
+            suffix = ''
+        else:
+            suffix = '|#' + ','.join('{}:{}'.format(k, v) for k, v in tags)
+        if metric_type == 'counter':
+            return ['{}:{}|c{}'.format(name, value, suffix)]
+        # Negative gauge value is interpreted as a decrement, so gauge
+        # must be reset to zero first
+        lines = []
+        if value < 0:
+            lines.append('{}:0|g{}'.format(name, suffix))
+        lines.append('{}:{}|g{}'.format(name, value, suffix))
+        return lines
+
+    def format_packets(self, metrics):
+        """
+        Return *metrics* as a :class:`!list` of datagrams, each of them is
+        at most :attr:`OptionsConfig.max_packet_size` bytes long. Longer
+        lines are dropped.
+        """
+        task_name = self.context.config.task_class.name
+        max_packet_size = self.options.max_packet_size
+        packets = []
+        packet = b''
+        for metric_name, metric_value in iter_metrics(metrics):
+            tags = {
+                'task': task_name,
+            }
+            for k, v in metric_value.get('tags', {}).items():
+                if k in tags:
+                    raise Exception("Tag '{}' is reserved".format(k))
+                tags[k] = v
+            lines = self.format_metric(
+                metric_name, metric_value['value'],
+                metric_value.get('type', 'gauge'), tags)
+            for line in lines:
+                line = line.encode('utf-8')
+                if len(line) > max_packet_size:
+                    logger.warning(
+                        "StatsD line of the %s metric is longer than %d "
+                        "bytes, it is dropped", metric_name, max_packet_size)
+                    continue
+                if not packet:
+                    packet = line
+                elif len(packet) + len(line) + 1 <= max_packet_size:
+                    packet += b'\n' + line
+                else:
+                    packets.append(packet)
+                    packet = line
+        if packet:
+            packets.append(packet)
+        return packets
+
+    def push(self, metrics):
+        success = True
+        try:
+            packets = self.format_packets(metrics)
+            if self._socket is None:
+                self._socket = self._connect()
+            for packet in packets:
+                try:
+                    self._socket.send(packet)
+                except OSError as exc:
+                    logger.warning("Can't send StatsD datagram: %s", exc)
+                    success = False
+        except Exception:
+            logger.exception('Push monitoring metrics into StatsD failed')
+            return False
+        return success
+
+    def close(self, timeout=None):
+        super().close(timeout)
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
@@ -0,0 +1,105 @@
+"""
+Module :mod:`jobslib.metrics.summary` provides :class:`QuantileSketch`,
+compact streaming summary which estimates quantiles of the observed
+values with bounded relative error.
+"""
+
+import math
+
+__all__ = ['QuantileSketch']
+
+
+class QuantileSketch(object):
+    """
+    Streaming quantile sketch with relative accuracy *relative_accuracy*
+    (DDSketch algorithm). Positive values are counted in logarithmically
+    sized buckets, so memory usage depends on the range of the values,
+    not on their number. Estimated quantile *q* differs from the exact
+    value by at most ``relative_accuracy * value``.
+
+    .. code-block:: python
+
+        >>> sketch = QuantileSketch()
+        >>> for value in range(1, 1001):
+        ...     sketch.add(value)
+        >>> round(sketch.quantile(0.99))
+        983
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError('Relative accuracy must be between 0 and 1')
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.reset()
+
+    def __len__(self):
+        return self.count
+
+    def reset(self):
+        """
+        Remove all observed values.
+        """
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._zero_count = 0
+        self._buckets = {}
+
+    def add(self, value):
+        """
+        Add *value* into the sketch. Values less than or equal to zero
+        are counted as zero.
+        """
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value <= 0:
+            self._zero_count += 1
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self._buckets[index] = self._buckets.get(index, 0) + 1
+
+    def merge(self, other):
+        """
+        Merge *other* sketch into this one. Both sketches must have the
+        same relative accuracy.
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Sketches have different relative accuracy')
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._zero_count += other._zero_count
+        for index, count in other._buckets.items():
+            self._buckets[index] = self._buckets.get(index, 0) + count
+
+    def quantile(self, q):
+        """
+        Return estimated quantile *q* (value between 0 and 1), or
+        :data:`!None` if sketch is empty.
+        """
+        if not 0 <= q <= 1:
+            raise ValueError('Quantile must be between 0 and 1')
+        if not self.count:
+            return None
+        if q == 0:
+            return self.min
+        if q == 1:
+            return self.max
+        rank = q * (self.count - 1)
+        seen = self._zero_count
+        if rank < seen:
+            return max(self.min, 0.0)
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if rank < seen:
+                value = 2 * self._gamma ** index / (self._gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
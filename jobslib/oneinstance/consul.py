@@ -10,13 +10,12 @@ import logging
 import signal
 import os
 
-import retrying
-
 from consul import Consul
 from objectvalidator import option
 
 from . import BaseLock, OneInstanceWatchdogError
 from ..config import ConfigGroup, RetryConfigMixin
+from ..retry import get_circuit_breaker, retry
 from ..time import get_current_time, to_local, to_utc
 
 __all__ = ['ConsulLock']
@@ -182,27 +181,42 @@ class ConsulLock(BaseLock):
             port=self.options.port,
             timeout=self.options.timeout,
         )
+        self._circuit_breaker = get_circuit_breaker(
+            '{}://{}:{}'.format(
+                self.options.scheme, self.options.host, self.options.port),
+            self.options)
+
+    def _call(self, func, *args, **kwargs):
+        """
+        Call Consul API *func* through the circuit breaker of the Consul
+        agent, see :mod:`jobslib.retry`. Timeout and retries are trimmed
+        to the :attr:`jobslib.Context.deadline`.
+        """
+        deadline = self.context.deadline
+
+        def _attempt():
+            self._consul.http.timeout = deadline.timeout(self.options.timeout)
+            return func(*args, **kwargs)
+
+        return self._circuit_breaker.call(
+            _attempt,
+            max_attempts=self.options.retry_max_attempts,
+            wait_multiplier=self.options.retry_wait_multiplier,
+            deadline=deadline)
 
     def acquire(self):
-        @retrying.retry(
-            stop_max_attempt_number=self.options.retry_max_attempts,
-            wait_exponential_multiplier=self.options.retry_wait_multiplier)
         def _create_session():
-            return self._consul.session.create(
+            return self._call(
+                self._consul.session.create,
                 ttl=self.options.ttl, lock_delay=self.options.lock_delay)
 
-        @retrying.retry(
-            stop_max_attempt_number=self.options.retry_max_attempts,
-            wait_exponential_multiplier=self.options.retry_wait_multiplier)
         def _acquire_lock(data, session_id):
-            return self._consul.kv.put(
-                self.options.key, data, acquire=session_id)
+            return self._call(
+                self._consul.kv.put, self.options.key, data,
+                acquire=session_id)
 
-        @retrying.retry(
-            stop_max_attempt_number=self.options.retry_max_attempts,
-            wait_exponential_multiplier=self.options.retry_wait_multiplier)
         def _destroy_session(session_id):
-            self._consul.session.destroy(session_id)
+            self._call(self._consul.session.destroy, session_id)
 
         timestamp = get_current_time()
         record = {
@@ -224,19 +238,17 @@ class ConsulLock(BaseLock):
                 # Set SIGALRM refresh handler. If lock is not released or
                 # extended before ttl is reached, task will be killed.
                 signal.signal(signal.SIGALRM, self._alarm_handler)
-                signal.alarm(self.options.ttl)
+                self._set_alarm(self.options.ttl)
                 return True
             logger.error("Can't acquire lock")
         _destroy_session(session_id)
         return False
 
     def release(self):
-        @retrying.retry(
-            stop_max_attempt_number=self.options.retry_max_attempts,
-            wait_exponential_multiplier=self.options.retry_wait_multiplier)
         def _release_lock(session_id):
-            return self._consul.kv.put(
-                self.options.key, None, release=session_id)
+            return self._call(
+                self._consul.kv.put, self.options.key, None,
+                release=session_id)
 
         try:
             res = _release_lock(self._session_id)
@@ -247,7 +259,7 @@ class ConsulLock(BaseLock):
                 self._session_id = None
                 self._refresh_lock_flag = False
                 # Cancel SIGALRM
-                signal.alarm(0)
+                self._set_alarm(0)
                 signal.signal(signal.SIGALRM, signal.SIG_DFL)
                 return True
             logger.error("Can't release lock")
@@ -257,6 +269,37 @@ class ConsulLock(BaseLock):
         self._refresh_lock_flag = True
         return True
 
+    def _set_alarm(self, seconds):
+        """
+        Deliver **SIGALRM** after *seconds*, 0 cancels the alarm.
+        """
+        signal.alarm(seconds)
+
+    def renew(self):
+        """
+        Renew session of the acquired lock immediately and return
+        :data:`!True` if it has been renewed. Session is renewed
+        independently of the iteration's deadline and of the circuit
+        breaker, which is shared with the other backends, so their
+        failures don't kill the task. It is called by the watchdog when
+        refresh has been requested.
+        """
+        # Lock is renewed independently of the iteration's deadline
+        self._consul.http.timeout = self.options.timeout
+        try:
+            res = retry(
+                self._consul.session.renew, self._session_id,
+                max_attempts=None,
+                stop_max_delay=self.options.lock_delay * 1000,
+                wait_multiplier=self.options.retry_wait_multiplier)
+        except Exception:
+            logger.exception("Can't extend lock")
+            return False
+        if not res:
+            logger.error("Can't extend lock")
+            return False
+        return True
+
     def _alarm_handler(self, unused_signum, unused_frame):
         """
         **SIGALRM** signal handler, it is called at the end
@@ -264,32 +307,16 @@ class ConsulLock(BaseLock):
         for extending is presented, otherwise raise
         :exc:`OneInstanceWatchdogError`.
         """
-        @retrying.retry(
-            stop_max_delay=self.options.lock_delay,
-            wait_exponential_multiplier=self.options.retry_wait_multiplier)
-        def _renew_session(session_id):
-            return self._consul.session.renew(session_id)
-
-        if self._refresh_lock_flag:
-            try:
-                res = _renew_session(self._session_id)
-            except Exception:
-                logger.exception("Can't extend lock")
-            else:
-                if res:
-                    self._refresh_lock_flag = False
-                    # Restart SIGALRM
-                    signal.alarm(self.options.ttl)
-                    return
-                logger.error("Can't extend lock")
+        if self._refresh_lock_flag and self.renew():
+            self._refresh_lock_flag = False
+            # Restart SIGALRM
+            self._set_alarm(self.options.ttl)
+            return
         raise OneInstanceWatchdogError
 
     def get_lock_owner_info(self):
-        @retrying.retry(
-            stop_max_attempt_number=self.options.retry_max_attempts,
-            wait_exponential_multiplier=self.options.retry_wait_multiplier)
         def _get_lock_owner_info():
-            return self._consul.kv.get(self.options.key)[1]
+            return self._call(self._consul.kv.get, self.options.key)[1]
 
         owner_info = None
         try:
@@ -0,0 +1,102 @@
+"""
+Module :mod:`queue` provides sources of the work items for the
+:class:`jobslib.QueueTask`. Items are fetched in batches, fetched item
+is leased (invisible for other consumers) for ``visibility_timeout``
+seconds. Processed item is acknowledged (removed from the queue). Item
+which is not acknowledged (e.g. its processing failed) is fetched again
+when its lease expires, item which is released is fetched again
+immediately.
+
+:class:`BaseQueue` is ancestor, it is abstract class which defines API,
+not functionality. Override this class if you want to write own
+implementation of the queue.
+"""
+
+import abc
+
+from ..config import ConfigGroup
+
+__all__ = ['BaseQueue', 'QueueItem']
+
+
+class QueueItem(object):
+    """
+    Item fetched from the queue. *id* identifies item in the queue,
+    *value* is item's JSON serializable value and *receipt* is backend's
+    private data needed for acknowledging. Item must be picklable, so it
+    can be processed by the process pool.
+    """
+
+    __slots__ = ('id', 'value', 'receipt')
+
+    def __init__(self, id, value, receipt=None):
+        self.id = id
+        self.value = value
+        self.receipt = receipt
+
+    def __repr__(self):
+        return '<{} id={!r}>'.format(self.__class__.__name__, self.id)
+
+    def __getstate__(self):
+        return self.id, self.value, self.receipt
+
+    def __setstate__(self, state):
+        self.id, self.value, self.receipt = state
+
+
+class BaseQueue(abc.ABC):
+    """
+    Provides queue API. Inherit this class and override abstract methods
+    :meth:`put`, :meth:`fetch` and :meth:`ack`. Configuration options are
+    defined in :class:`OptionsConfig` class, which is
+    :class:`~jobslib.ConfigGroup` descendant.
+    """
+
+    class OptionsConfig(ConfigGroup):
+        """
+        Validation of the queue configuration, see
+        :class:`~jobslib.ConfigGroup`.
+        """
+        pass
+
+    def __init__(self, context, options):
+        self.context = context
+        self.options = options
+
+    @abc.abstractmethod
+    def put(self, *values):
+        """
+        Append *values* into the queue.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def fetch(self, size):
+        """
+        Lease at most *size* items and return them as a :class:`!list`
+        of the :class:`QueueItem`. Return empty :class:`!list` if queue
+        is empty.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def ack(self, item):
+        """
+        Acknowledge processed *item*, it is removed from the queue.
+        """
+        raise NotImplementedError
+
+    def nack(self, item):
+        """
+        Release lease of the *item*, so it is fetched again. Default
+        implementation does nothing, item is fetched again when its lease
+        expires.
+        """
+        pass
+
+    def close(self):
+        """
+        Close the queue, e.g. its connection. Default implementation does
+        nothing.
+        """
+        pass
@@ -0,0 +1,238 @@
+"""
+Module :mod:`jobslib.queue.consul` provides :class:`ConsulQueue`, queue
+stored in the Consul's key/value storage.
+"""
+
+import base64
+import json
+import os
+import time
+import uuid
+
+from consul import Consul
+from objectvalidator import option
+
+from . import BaseQueue, QueueItem
+from ..config import ConfigGroup, RetryConfigMixin
+from ..retry import get_circuit_breaker
+
+__all__ = ['ConsulQueue']
+
+TXN_MAX_OPERATIONS = 64
+
+
+class ConsulQueue(BaseQueue):
+    """
+    Queue stored in the Consul's key/value storage. Items are stored
+    under ``<key>/items/`` prefix, leases of the fetched items under
+    ``<key>/leases/`` prefix. Lease is taken by check-and-set, so several
+    consumers may share the queue. Each fetch reads all items, so queue
+    is suitable for small queues (thousands of items) only.
+
+    .. warning::
+
+        Lease expiration is based on the consumers' clock, keep clock of
+        the consumers synchronized.
+
+    For use of :class:`ConsulQueue` write into :mod:`settings`:
+
+    .. code-block:: python
+
+        QUEUE = {
+            'backend': 'jobslib.queue.consul.ConsulQueue',
+            'options': {
+                'host': 'hostname',
+                'port': 8500,
+                'timeout': 1.0,
+                'key': 'jobs/example/queue',
+                'visibility_timeout': 300.0,
+                'retry_max_attempts': 10,
+                'retry_wait_multiplier': 50,
+            },
+        }
+
+    Or use
+    :envvar:`JOBSLIB_QUEUE_CONSUL_HOST`,
+    :envvar:`JOBSLIB_QUEUE_CONSUL_PORT`,
+    :envvar:`JOBSLIB_QUEUE_CONSUL_TIMEOUT`,
+    :envvar:`JOBSLIB_QUEUE_CONSUL_KEY`,
+    :envvar:`JOBSLIB_QUEUE_CONSUL_VISIBILITY_TIMEOUT`,
+    :envvar:`JOBSLIB_QUEUE_CONSUL_RETRY_MAX_ATTEMPTS` and
+    :envvar:`JOBSLIB_QUEUE_CONSUL_RETRY_WAIT_MULTIPLIER`
+    environment variables.
+    """
+
+    class OptionsConfig(RetryConfigMixin, ConfigGroup):
+        """
+        Consul queue options.
+        """
+
+        retry_env_prefix = 'JOBSLIB_QUEUE_CONSUL_'
+
+        @option(required=True, attrtype=str)
+        def scheme(self):
+            """
+            URI scheme, in current implementation always ``http``.
+            """
+            return 'http'
+
+        @option(required=True, attrtype=str)
+        def host(self):
+            """
+            IP address or hostname of the Consul server.
+            """
+            host = os.environ.get('JOBSLIB_QUEUE_CONSUL_HOST')
+            if host:
+                return host
+            return self._settings.get('host', '127.0.0.1')
+
+        @option(required=True, attrtype=int)
+        def port(self):
+            """
+            Port where the Consul server listening on.
+            """
+            port = os.environ.get('JOBSLIB_QUEUE_CONSUL_PORT')
+            if port:
+                return int(port)
+            return self._settings.get('port', 8500)
+
+        @option(required=True, attrtype=float)
+        def timeout(self):
+            """
+            Timeout in seconds for connect/read/write operation.
+            """
+            timeout = os.environ.get('JOBSLIB_QUEUE_CONSUL_TIMEOUT')
+            if timeout:
+                return float(timeout)
+            timeout = self._settings.get('timeout', 5.0)
+            if isinstance(timeout, int):
+                timeout = float(timeout)
+            return timeout
+
+        @option(required=True, attrtype=str)
+        def key(self):
+            """
+            Key prefix under which the queue is stored.
+            """
+            key = os.environ.get('JOBSLIB_QUEUE_CONSUL_KEY')
+            if key:
+                return key.rstrip('/')
+            return self._settings['key'].rstrip('/')
+
+        @option(required=True, attrtype=float)
+        def visibility_timeout(self):
+            """
+            How long in seconds fetched item is invisible for the other
+            consumers, default is 300.
+            """
+            timeout = os.environ.get('JOBSLIB_QUEUE_CONSUL_VISIBILITY_TIMEOUT')
+            if timeout:
+                timeout = float(timeout)
+            else:
+                timeout = self._settings.get('visibility_timeout', 300.0)
+                if isinstance(timeout, int):
+                    timeout = float(timeout)
+            if timeout <= 0:
+                raise ValueError('Visibility timeout must be greater than 0')
+            return timeout
+
+    def __init__(self, context, options):
+        super().__init__(context, options)
+        self._consul = Consul(
+            scheme=self.options.scheme,
+            host=self.options.host,
+            port=self.options.port,
+            timeout=self.options.timeout,
+        )
+        self._circuit_breaker = get_circuit_breaker(
+            '{}://{}:{}'.format(
+                self.options.scheme, self.options.host, self.options.port),
+            self.options)
+
+    def _call(self, func, *args, **kwargs):
+        """
+        Call Consul API *func* through the circuit breaker of the Consul
+        agent, see :mod:`jobslib.retry`. Timeout and retries are trimmed
+        to the :attr:`jobslib.Context.deadline`.
+        """
+        deadline = self.context.deadline
+
+        def _attempt():
+            self._consul.http.timeout = deadline.timeout(self.options.timeout)
+            return func(*args, **kwargs)
+
+        return self._circuit_breaker.call(
+            _attempt,
+            max_attempts=self.options.retry_max_attempts,
+            wait_multiplier=self.options.retry_wait_multiplier,
+            deadline=deadline)
+
+    def _item_key(self, item_id):
+        return '{}/items/{}'.format(self.options.key, item_id)
+
+    def _lease_key(self, item_id):
+        return '{}/leases/{}'.format(self.options.key, item_id)
+
+    def _list(self, kind):
+        prefix = '{}/{}/'.format(self.options.key, kind)
+        entries = self._call(self._consul.kv.get, prefix, recurse=True)[1]
+        return {
+            entry['Key'][len(prefix):]: entry for entry in entries or ()
+        }
+
+    def put(self, *values):
+        operations = []
+        for value in values:
+            # Keys are ordered by time of the insertion
+            item_id = '{:020d}-{}'.format(time.time_ns(), uuid.uuid4().hex)
+            operations.append({
+                'KV': {
+                    'Verb': 'set',
+                    'Key': self._item_key(item_id),
+                    'Value': base64.b64encode(
+                        json.dumps(value).encode('utf-8')).decode('ascii'),
+                },
+            })
+        for i in range(0, len(operations), TXN_MAX_OPERATIONS):
+            self._call(
+                self._consul.txn.put, operations[i:i + TXN_MAX_OPERATIONS])
+
+    def fetch(self, size):
+        items = self._list('items')
+        leases = self._list('leases')
+        now = time.time()
+        fetched = []
+        for item_id in sorted(items):
+            if len(fetched) >= size:
+                break
+            lease = leases.get(item_id)
+            if lease is not None:
+                try:
+                    leased_until = json.loads(lease['Value'])['until']
+                except Exception:
+                    leased_until = 0
+                if leased_until > now:
+                    continue
+            record = {
+                'until': now + self.options.visibility_timeout,
+                'fqdn': self.context.fqdn,
+            }
+            leased = self._call(
+                self._consul.kv.put, self._lease_key(item_id),
+                json.dumps(record),
+                cas=lease['ModifyIndex'] if lease is not None else 0)
+            if not leased:
+                # Item has been leased by another consumer
+                continue
+            fetched.append(QueueItem(
+                item_id, json.loads(items[item_id]['Value'])))
+        return fetched
+
+    def ack(self, item):
+        self._call(self._consul.txn.put, [
+            {'KV': {'Verb': 'delete', 'Key': self._item_key(item.id)}},
+            {'KV': {'Verb': 'delete', 'Key': self._lease_key(item.id)}},
+        ])
+
+    def nack(self, item):
+        self._call(self._consul.kv.delete, self._lease_key(item.id))
@@ -0,0 +1,31 @@
+"""
+Module :mod:`jobslib.queue.dummy` provides :class:`DummyQueue`.
+"""
+
+from . import BaseQueue
+
+__all__ = ['DummyQueue']
+
+
+class DummyQueue(BaseQueue):
+    """
+    Dummy queue implementation, values are dropped and queue is always
+    empty. It is useful for development or if :class:`jobslib.QueueTask`
+    overrides :meth:`~jobslib.QueueTask.fetch_batch`. For use of
+    :class:`DummyQueue` write into :mod:`settings`:
+
+    .. code-block:: python
+
+        QUEUE = {
+            'backend': 'jobslib.queue.dummy.DummyQueue',
+        }
+    """
+
+    def put(self, *values):
+        pass
+
+    def fetch(self, size):
+        return []
+
+    def ack(self, item):
+        pass
@@ -0,0 +1,184 @@
+"""
+Module :mod:`jobslib.queue.sqlite` provides :class:`SQLiteQueue`, queue
+stored in the local SQLite file.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from objectvalidator import option
+
+from . import BaseQueue, QueueItem
+from ..config import ConfigGroup
+
+__all__ = ['SQLiteQueue']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    queue TEXT NOT NULL,
+    value TEXT NOT NULL,
+    leased_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS {table}_queue_id ON {table} (queue, id);
+"""
+
+
+class SQLiteQueue(BaseQueue):
+    """
+    Queue stored in the local SQLite file, several queues (distinguished
+    by *name*) may share one file. File may be shared by several
+    processes on the same machine, items are leased in the transaction.
+
+    For use of :class:`SQLiteQueue` write into :mod:`settings`:
+
+    .. code-block:: python
+
+        QUEUE = {
+            'backend': 'jobslib.queue.sqlite.SQLiteQueue',
+            'options': {
+                'path': '/var/lib/myapp/queue.sqlite',
+                'name': 'emails',
+                'visibility_timeout': 300.0,
+            },
+        }
+
+    Or use
+    :envvar:`JOBSLIB_QUEUE_SQLITE_PATH`,
+    :envvar:`JOBSLIB_QUEUE_SQLITE_NAME` and
+    :envvar:`JOBSLIB_QUEUE_SQLITE_VISIBILITY_TIMEOUT`
+    environment variables.
+    """
+
+    table = 'jobslib_queue'
+
+    class OptionsConfig(ConfigGroup):
+        """
+        SQLite queue options.
+        """
+
+        @option(required=True, attrtype=str)
+        def path(self):
+            """
+            Path to the SQLite file, it is created if it doesn't exist.
+            """
+            path = os.environ.get('JOBSLIB_QUEUE_SQLITE_PATH')
+            if path:
+                return path
+            return self._settings['path']
+
+        @option(required=True, attrtype=str)
+        def name(self):
+            """
+            Name of the queue, default is ``default``.
+            """
+            name = os.environ.get('JOBSLIB_QUEUE_SQLITE_NAME')
+            if name:
+                return name
+            return self._settings.get('name', 'default')
+
+        @option(required=True, attrtype=float)
+        def visibility_timeout(self):
+            """
+            How long in seconds fetched item is invisible for the other
+            consumers, default is 300.
+            """
+            timeout = os.environ.get('JOBSLIB_QUEUE_SQLITE_VISIBILITY_TIMEOUT')
+            if timeout:
+                timeout = float(timeout)
+            else:
+                timeout = self._settings.get('visibility_timeout', 300.0)
+                if isinstance(timeout, int):
+                    timeout = float(timeout)
+            if timeout <= 0:
+                raise ValueError('Visibility timeout must be greater than 0')
+            return timeout
+
+    def __init__(self, context, options):
+        super().__init__(context, options)
+        self._lock = threading.Lock()
+        # Connection is shared by the prefetching thread, access is
+        # serialized by the lock
+        self._connection = sqlite3.connect(
+            self.options.path, timeout=30.0, isolation_level=None,
+            check_same_thread=False)
+        self._connection.executescript(SCHEMA.format(table=self.table))
+
+    def put(self, *values):
+        rows = [(self.options.name, json.dumps(value)) for value in values]
+        with self._lock:
+            with self._transaction() as cursor:
+                cursor.executemany(
+                    'INSERT INTO {} (queue, value) VALUES (?, ?)'.format(
+                        self.table),
+                    rows)
+
+    def fetch(self, size):
+        now = time.time()
+        with self._lock:
+            with self._transaction() as cursor:
+                rows = cursor.execute(
+                    'SELECT id, value FROM {} WHERE queue = ? AND '
+                    '(leased_until IS NULL OR leased_until <= ?) '
+                    'ORDER BY id LIMIT ?'.format(self.table),
+                    (self.options.name, now, size)).fetchall()
+                cursor.executemany(
+                    'UPDATE {} SET leased_until = ?, attempts = attempts + 1 '
+                    'WHERE id = ?'.format(self.table),
+                    [(now + self.options.visibility_timeout, row[0])
+                     for row in rows])
+        return [QueueItem(row[0], json.loads(row[1])) for row in rows]
+
+    def ack(self, item):
+        with self._lock:
+            self._connection.execute(
+                'DELETE FROM {} WHERE id = ?'.format(self.table), (item.id,))
+
+    def nack(self, item):
+        with self._lock:
+            self._connection.execute(
+                'UPDATE {} SET leased_until = NULL WHERE id = ?'.format(
+                    self.table),
+                (item.id,))
+
+    def size(self):
+        """
+        Return number of the items in the queue, including leased ones.
+        """
+        with self._lock:
+            return self._connection.execute(
+                'SELECT COUNT(*) FROM {} WHERE queue = ?'.format(self.table),
+                (self.options.name,)).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _transaction(self):
+        return _Transaction(self._connection)
+
+
+class _Transaction(object):
+    """
+    Context manager of the write transaction, database is locked by the
+    ``BEGIN IMMEDIATE``, so concurrent consumers don't lease the same
+    items.
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def __enter__(self):
+        cursor = self._connection.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        return cursor
+
+    def __exit__(self, exc_type, unused_exc_value, unused_tb):
+        if exc_type is None:
+            self._connection.execute('COMMIT')
+        else:
+            self._connection.execute('ROLLBACK')
@@ -0,0 +1,101 @@
+"""
+Module :mod:`jobslib.resources` provides :class:`ResourceUsage`, which
+measures resources used by the process during one iteration of the task.
+"""
+
+import gc
+import resource
+import sys
+import time
+
+__all__ = ['ResourceUsage']
+
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+MAXRSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+
+class ResourceUsage(object):
+    """
+    Measures CPU time, page faults and context switches (differences of
+    the :func:`resource.getrusage` values), maximum resident set size and
+    number and duration of the garbage collections (using
+    :data:`gc.callbacks`) between :meth:`start` and :meth:`stop` calls.
+
+    .. code-block:: python
+
+        usage = ResourceUsage()
+        usage.start()
+        do_something()
+        metrics.push(usage.stop(tags={'status': 'succeeded'}))
+    """
+
+    def __init__(self):
+        self._rusage = None
+        self._gc_start = None
+        self.gc_collections = [0] * len(gc.get_count())
+        self.gc_pause = 0.0
+
+    def _gc_callback(self, phase, info):
+        if phase == 'start':
+            self._gc_start = time.perf_counter()
+        elif self._gc_start is not None:
+            self.gc_pause += time.perf_counter() - self._gc_start
+            self.gc_collections[info['generation']] += 1
+            self._gc_start = None
+
+    def start(self):
+        """
+        Start measuring.
+        """
+        self.gc_collections = [0] * len(self.gc_collections)
+        self.gc_pause = 0.0
+        self._gc_start = None
+        if self._gc_callback not in gc.callbacks:
+            gc.callbacks.append(self._gc_callback)
+        self._rusage = resource.getrusage(resource.RUSAGE_SELF)
+
+    def stop(self, tags=None):
+        """
+        Stop measuring and return used resources in format of the
+        :meth:`jobslib.metrics.BaseMetrics.push` argument. Each metric
+        has *tags*, ``gc_collections`` has additional ``generation`` tag.
+        """
+        end = resource.getrusage(resource.RUSAGE_SELF)
+        if self._gc_callback in gc.callbacks:
+            gc.callbacks.remove(self._gc_callback)
+        start, self._rusage = self._rusage, None
+        if start is None:
+            raise RuntimeError('Measuring has not been started')
+        tags = dict(tags) if tags else {}
+
+        def counter(value):
+            return {'value': value, 'tags': tags, 'type': 'counter'}
+
+        return {
+            'process_cpu_user_seconds': counter(
+                end.ru_utime - start.ru_utime),
+            'process_cpu_system_seconds': counter(
+                end.ru_stime - start.ru_stime),
+            'process_max_rss_bytes': {
+                'value': end.ru_maxrss * MAXRSS_UNIT,
+                'tags': tags,
+                'type': 'gauge',
+            },
+            'process_minor_page_faults': counter(
+                end.ru_minflt - start.ru_minflt),
+            'process_major_page_faults': counter(
+                end.ru_majflt - start.ru_majflt),
+            'process_voluntary_context_switches': counter(
+                end.ru_nvcsw - start.ru_nvcsw),
+            'process_involuntary_context_switches': counter(
+                end.ru_nivcsw - start.ru_nivcsw),
+            'gc_collections': [
+                {
+                    'value': count,
+                    'tags': dict(tags, generation=str(generation)),
+                    'type': 'counter',
+                }
+                for generation, count in enumerate(self.gc_collections)
+            ],
+            'gc_pause_seconds': counter(self.gc_pause),
+        }
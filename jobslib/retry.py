@@ -0,0 +1,403 @@
+"""
+Module :mod:`jobslib.retry` provides :class:`CircuitBreaker`, which is
+shared by all backends calling the same endpoint (e.g. Consul agent or
+InfluxDB server). Calls are retried with exponential backoff, but only
+while :class:`RetryBudget` of the endpoint is not exhausted, so retries
+are only a fraction of the requests. When calls repeatedly fail, circuit
+is opened and calls fail immediately with :exc:`CircuitOpenError`. After
+reset timeout, one probe call is let through (half-open state) and
+circuit is closed again when it succeeds. Only failures of the endpoint
+(transport errors and server errors) are counted and retried, client
+errors (e.g. ACL permission denied) are raised immediately, see
+:func:`is_endpoint_failure`.
+
+.. code-block:: python
+
+    breaker = get_circuit_breaker('http://127.0.0.1:8500', self.options)
+    breaker.call(
+        self._consul.kv.get, 'jobs/example',
+        max_attempts=self.options.retry_max_attempts,
+        wait_multiplier=self.options.retry_wait_multiplier)
+"""
+
+import logging
+import sys
+import threading
+import time
+
+from .exceptions import JobsLibError
+
+__all__ = ['CircuitBreaker', 'CircuitOpenError', 'RetryBudget',
+           'collect_metrics', 'get_circuit_breaker', 'is_endpoint_failure',
+           'retry']
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+
+STATE_VALUES = {
+    CLOSED: 0,
+    HALF_OPEN: 1,
+    OPEN: 2,
+}
+
+# Metrics of the circuit breakers whose state has not changed are pushed
+# at most once per this number of seconds.
+METRICS_INTERVAL = 60.0
+
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+class CircuitOpenError(JobsLibError):
+    """
+    Circuit of the endpoint is open, call has not been made.
+    """
+
+    pass
+
+
+def _get_status(exc):
+    for attr in ('status', 'status_code', 'code'):
+        status = getattr(exc, attr, None)
+        if isinstance(status, int):
+            return status
+    response = getattr(exc, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if isinstance(status, int):
+        return status
+    return None
+
+
+def _client_errors():
+    # Client libraries are not imported here, their exceptions can be
+    # raised only if they have been imported by the backend
+    consul = sys.modules.get('consul.base')
+    if consul is None:
+        return ()
+    return (consul.BadRequest, consul.ClientError, consul.ACLDisabled,
+            consul.ACLPermissionDenied, consul.NotFound)
+
+
+def is_endpoint_failure(exc):
+    """
+    Return :data:`!True` if exception *exc* indicates failure of the
+    endpoint, i.e. transport error (:exc:`OSError`, including errors of
+    the :mod:`requests`) or server error (HTTP status 5xx). Client errors
+    (HTTP status 4xx, e.g. ACL permission denied) return :data:`!False`.
+    Exceptions without HTTP status are considered failures.
+    """
+    if isinstance(exc, OSError):
+        return True
+    if isinstance(exc, _client_errors()):
+        return False
+    status = _get_status(exc)
+    if status is not None:
+        return status >= 500
+    return True
+
+
+def retry(func, *args, max_attempts=0, wait_multiplier=50,
+          stop_max_delay=None, deadline=None, **kwargs):
+    """
+    Call ``func(*args, **kwargs)`` and return its result, retry failed
+    call like :meth:`CircuitBreaker.call`, but without circuit breaker
+    and retry budget. Use it for calls which must not be rejected due to
+    failures of the other callers, e.g. renewal of the lock.
+    """
+    start = time.monotonic()
+    attempt = 0
+    while 1:
+        attempt += 1
+        try:
+            return func(*args, **kwargs)
+        except Exception as exc:
+            wait = _retry_wait(
+                exc, attempt, start, max_attempts, wait_multiplier,
+                stop_max_delay, deadline)
+            if wait is None:
+                raise
+        time.sleep(wait)
+
+
+def _retry_wait(exc, attempt, start, max_attempts, wait_multiplier,
+                stop_max_delay, deadline):
+    """
+    Return number of seconds to wait before the next attempt, or
+    :data:`!None` if failed call must not be retried.
+    """
+    if not is_endpoint_failure(exc):
+        return None
+    if max_attempts is not None and attempt >= max_attempts:
+        return None
+    if stop_max_delay is not None and (
+            (time.monotonic() - start) * 1000 >= stop_max_delay):
+        return None
+    wait = wait_multiplier * 2 ** attempt / 1000.0
+    remaining = deadline.remaining() if deadline else None
+    if remaining is not None and remaining <= wait:
+        return None
+    return wait
+
+
+class RetryBudget(object):
+    """
+    Token bucket of the retries. Each request deposits *ratio* tokens,
+    each retry withdraws one token. Bucket contains at most *capacity*
+    tokens and it is full at the beginning.
+    """
+
+    def __init__(self, ratio=0.2, capacity=10):
+        self.ratio = ratio
+        self.capacity = capacity
+        self.tokens = float(capacity)
+
+    def deposit(self):
+        """
+        Count request.
+        """
+        self.tokens = min(self.tokens + self.ratio, self.capacity)
+
+    def withdraw(self):
+        """
+        Withdraw token for one retry. Return :data:`!False` if budget is
+        exhausted.
+        """
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+
+class CircuitBreaker(object):
+    """
+    Circuit breaker and retry budget of the endpoint *name*. Circuit is
+    opened after *failure_threshold* consecutive failed calls, value 0
+    disables circuit breaker. Open circuit is half-opened after
+    *reset_timeout* seconds. Retries are limited by the
+    :class:`RetryBudget` with *budget_ratio* and *budget_capacity*.
+
+    Use :func:`get_circuit_breaker` instead of creating the instance
+    directly, so circuit breaker is shared among backends.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0,
+                 budget_ratio=0.2, budget_capacity=10, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.budget = RetryBudget(budget_ratio, budget_capacity)
+        self.state = CLOSED
+        self.failures = 0
+        self._clock = clock
+        self._opened_at = None
+        self._probing = False
+        # Signal handler (e.g. ConsulLock's SIGALRM handler) may call
+        # the endpoint while the main thread holds the lock.
+        self._lock = threading.RLock()
+        self._collected_at = None
+        self._collected_state = None
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.calls = 0
+        self.call_failures = 0
+        self.retries = 0
+        self.rejected_calls = 0
+        self.budget_exhausted = 0
+
+    def configure(self, options):
+        """
+        Set parameters of the circuit breaker and retry budget according
+        to *options*, instance of the
+        :class:`~jobslib.config.RetryConfigMixin`.
+        """
+        with self._lock:
+            self.failure_threshold = options.circuit_breaker_threshold
+            self.reset_timeout = options.circuit_breaker_reset_timeout
+            self.budget.ratio = options.retry_budget_ratio
+            self.budget.capacity = options.retry_budget_capacity
+            self.budget.tokens = min(
+                self.budget.tokens, self.budget.capacity)
+
+    def before_call(self):
+        """
+        Check whether call may be made, raise :exc:`CircuitOpenError` if
+        circuit is open.
+        """
+        with self._lock:
+            if self.state == OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    self.rejected_calls += 1
+                    raise CircuitOpenError(
+                        'Circuit of {} is open'.format(self.name))
+                self.state = HALF_OPEN
+                self._probing = False
+                logger.info("Circuit of %s is half-open", self.name)
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    self.rejected_calls += 1
+                    raise CircuitOpenError(
+                        'Circuit of {} is half-open'.format(self.name))
+                self._probing = True
+
+    def on_success(self):
+        """
+        Record successful call.
+        """
+        with self._lock:
+            self.failures = 0
+            if self.state != CLOSED:
+                self.state = CLOSED
+                self._probing = False
+                logger.info("Circuit of %s is closed", self.name)
+
+    def on_failure(self):
+        """
+        Record failed call.
+        """
+        with self._lock:
+            self.call_failures += 1
+            self.failures += 1
+            if self.state == HALF_OPEN or (
+                    self.state == CLOSED and self.failure_threshold and
+                    self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self._opened_at = self._clock()
+                self._probing = False
+                logger.warning(
+                    "Circuit of %s is open for %s seconds after %d failed "
+                    "calls", self.name, self.reset_timeout, self.failures)
+
+    def _may_retry(self):
+        with self._lock:
+            if self.state != CLOSED:
+                return False
+            if not self.budget.withdraw():
+                self.budget_exhausted += 1
+                return False
+            self.retries += 1
+            return True
+
+    def call(self, func, *args, max_attempts=0, wait_multiplier=50,
+             stop_max_delay=None, deadline=None, **kwargs):
+        """
+        Call ``func(*args, **kwargs)`` and return its result. Failed call
+        is retried at most *max_attempts* attempts in total (at least one
+        attempt is made) or until *stop_max_delay* milliseconds elapse.
+        Wait ``2^x * wait_multiplier`` milliseconds between attempts, like
+        :mod:`retrying`. Call is not retried when circuit is not closed,
+        retry budget is exhausted or the next attempt would start after
+        *deadline* (:class:`~jobslib.deadline.Deadline`), then the last
+        exception is raised. Client errors are neither counted as failures
+        nor retried, see :func:`is_endpoint_failure`.
+        """
+        with self._lock:
+            self.calls += 1
+            self.budget.deposit()
+        start = time.monotonic()
+        attempt = 0
+        while 1:
+            attempt += 1
+            self.before_call()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as exc:
+                if not is_endpoint_failure(exc):
+                    # Endpoint has responded, the caller is wrong
+                    self.on_success()
+                    raise
+                self.on_failure()
+                wait = _retry_wait(
+                    exc, attempt, start, max_attempts, wait_multiplier,
+                    stop_max_delay, deadline)
+                if wait is None:
+                    raise
+                if not self._may_retry():
+                    raise
+            except BaseException:
+                # e.g. Terminate, let the next call probe the endpoint
+                with self._lock:
+                    self._probing = False
+                raise
+            else:
+                self.on_success()
+                return result
+            time.sleep(wait)
+
+    def collect_metrics(self, interval=0):
+        """
+        Return state of the circuit and counters since the previous
+        collection in format of the :meth:`jobslib.metrics.BaseMetrics.push`
+        argument, each metric has ``endpoint`` tag. If state of the
+        circuit has not changed and less than *interval* seconds elapsed
+        since the previous collection, return empty :class:`!dict` and
+        keep counting.
+        """
+        now = self._clock()
+        with self._lock:
+            if (self._collected_at is not None and
+                    self.state == self._collected_state and
+                    now - self._collected_at < interval):
+                return {}
+            self._collected_at = now
+            self._collected_state = self.state
+        tags = {'endpoint': self.name}
+
+        def counter(value):
+            return {'value': value, 'tags': tags, 'type': 'counter'}
+
+        with self._lock:
+            metrics = {
+                'circuit_breaker_state': {
+                    'value': STATE_VALUES[self.state],
+                    'tags': tags,
+                    'type': 'gauge',
+                },
+                'retry_budget_tokens': {
+                    'value': self.budget.tokens,
+                    'tags': tags,
+                    'type': 'gauge',
+                },
+                'backend_calls': counter(self.calls),
+                'backend_call_failures': counter(self.call_failures),
+                'backend_retries': counter(self.retries),
+                'backend_rejected_calls': counter(self.rejected_calls),
+                'retry_budget_exhausted': counter(self.budget_exhausted),
+            }
+            self._reset_counters()
+        return metrics
+
+
+def get_circuit_breaker(name, options=None):
+    """
+    Return :class:`CircuitBreaker` of the endpoint *name*, it is created
+    on the first call. If *options* are passed, circuit breaker is
+    configured according to them, see :meth:`CircuitBreaker.configure`.
+    """
+    with _circuit_breakers_lock:
+        circuit_breaker = _circuit_breakers.get(name)
+        if circuit_breaker is None:
+            circuit_breaker = CircuitBreaker(name)
+            _circuit_breakers[name] = circuit_breaker
+    if options is not None:
+        circuit_breaker.configure(options)
+    return circuit_breaker
+
+
+def collect_metrics(interval=METRICS_INTERVAL):
+    """
+    Return metrics of all circuit breakers, metrics of the circuit breaker
+    are collected when its state changes or at most once per *interval*
+    seconds, see :meth:`CircuitBreaker.collect_metrics`.
+    """
+    with _circuit_breakers_lock:
+        circuit_breakers = list(_circuit_breakers.values())
+    metrics = {}
+    for circuit_breaker in circuit_breakers:
+        for name, metric in circuit_breaker.collect_metrics(
+                interval).items():
+            metrics.setdefault(name, []).append(metric)
+    return metrics
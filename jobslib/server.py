@@ -0,0 +1,300 @@
+"""
+Module :mod:`jobslib.server` provides pre-forking job server. Server
+imports **jobslib**, backends and :mod:`settings` modules once and then
+waits on the Unix socket for requests from the :mod:`jobslib.client`.
+Each request is handled by the forked session process, which forks the
+task process and streams its output and exit code back to the client.
+Task process behaves like ``runjob`` command, it gets command line
+arguments, environment variables and working directory of the client,
+but modules are already imported, so it starts in milliseconds.
+
+Modules are imported only once, so restart server when application is
+deployed. Standard input is not passed to the task.
+
+.. code-block:: console
+
+    $ runjob-server --socket /run/myapp/jobslib.sock \\
+        --preload myapp.settings --preload myapp.task
+"""
+
+import errno
+import importlib
+import json
+import logging
+import logging.config
+import os
+import selectors
+import signal
+import socket
+import sys
+import traceback
+
+from .client import (
+    EXIT, EXIT_CODE, KILL, REQUEST, STDERR, STDOUT, recv_frame, send_frame)
+from .cmdlineparser import ArgumentParser
+from .exceptions import Terminate
+from .logging import BASE_LOGGING
+
+__all__ = ['JobServer', 'server_main']
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRELOAD = (
+    'jobslib.main',
+    'jobslib.oneinstance.consul',
+    'jobslib.liveness.consul',
+    'jobslib.metrics.influxdb',
+)
+
+
+def run_job(args):
+    """
+    Run ``runjob`` with command line arguments *args* in the current
+    process and return exit code.
+    """
+    from .main import main
+    try:
+        main(args)
+    except SystemExit as exc:
+        if exc.code is None:
+            return 0
+        if isinstance(exc.code, int):
+            return exc.code
+        sys.stderr.write('{}\n'.format(exc.code))
+        return 1
+    except BaseException:
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+class JobServer(object):
+    """
+    Pre-forking job server listening on the Unix socket *socket_path*.
+    Modules *preload* are imported before the server starts listening.
+    """
+
+    def __init__(self, socket_path, preload=DEFAULT_PRELOAD,
+                 socket_mode=0o600):
+        self.socket_path = socket_path
+        self.preload = preload
+        self.socket_mode = socket_mode
+        self._socket = None
+        self._sessions = set()
+
+    def preload_modules(self):
+        """
+        Import :attr:`preload` modules.
+        """
+        for name in self.preload:
+            try:
+                importlib.import_module(name)
+            except Exception:
+                logger.exception("Can't preload module %s", name)
+
+    def _listen(self):
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.bind(self.socket_path)
+        os.chmod(self.socket_path, self.socket_mode)
+        self._socket.listen(128)
+        self._socket.settimeout(1.0)
+
+    def _reap_sessions(self):
+        while self._sessions:
+            try:
+                pid, unused_status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self._sessions.clear()
+                return
+            if not pid:
+                return
+            self._sessions.discard(pid)
+
+    def _terminate(self, unused_signum, unused_frame):
+        raise Terminate
+
+    def serve_forever(self):
+        """
+        Preload modules and handle requests until **SIGTERM** or
+        **SIGINT** is received.
+        """
+        self.preload_modules()
+        self._listen()
+        signal.signal(signal.SIGTERM, self._terminate)
+        signal.signal(signal.SIGINT, self._terminate)
+        logger.info("Jobslib server is listening on %s", self.socket_path)
+        try:
+            while 1:
+                self._reap_sessions()
+                try:
+                    conn, unused_address = self._socket.accept()
+                except socket.timeout:
+                    continue
+                with conn:
+                    pid = os.fork()
+                    if pid == 0:
+                        self._run_session_process(conn)
+                    self._sessions.add(pid)
+        except Terminate:
+            logger.info("Jobslib server has been terminated")
+        finally:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            self._socket.close()
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+    def _run_session_process(self, conn):
+        """
+        Handle request in the forked session process, never returns.
+        """
+        code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            self._socket.close()
+            conn.settimeout(None)
+            self.handle_session(conn)
+        except BaseException:
+            logger.exception("Jobslib server session failed")
+            code = 1
+        finally:
+            os._exit(code)
+
+    def handle_session(self, conn):
+        """
+        Read request from *conn*, fork task process and stream its output
+        and exit code into *conn*.
+        """
+        kind, payload = recv_frame(conn)
+        if kind != REQUEST:
+            return
+        request = json.loads(payload.decode('utf-8'))
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            conn.close()
+            os.close(out_r)
+            os.close(err_r)
+            self._run_task_process(request, out_w, err_w)
+        os.close(out_w)
+        os.close(err_w)
+
+        selector = selectors.DefaultSelector()
+        selector.register(out_r, selectors.EVENT_READ, STDOUT)
+        selector.register(err_r, selectors.EVENT_READ, STDERR)
+        selector.register(conn, selectors.EVENT_READ, KILL)
+        pipes = 2
+        client_connected = True
+        while pipes:
+            for key, unused_events in selector.select():
+                if key.data == KILL:
+                    kind, payload = recv_frame(conn)
+                    if kind == KILL:
+                        signum = EXIT_CODE.unpack(payload)[0]
+                    else:
+                        # Client has gone, terminate the task
+                        signum = signal.SIGTERM
+                        selector.unregister(conn)
+                        client_connected = False
+                    self._kill(pid, signum)
+                    continue
+                data = os.read(key.fd, 65536)
+                if not data:
+                    selector.unregister(key.fd)
+                    os.close(key.fd)
+                    pipes -= 1
+                elif client_connected:
+                    try:
+                        send_frame(conn, key.data, data)
+                    except OSError:
+                        client_connected = False
+        selector.close()
+
+        unused_pid, status = os.waitpid(pid, 0)
+        if os.WIFSIGNALED(status):
+            code = 128 + os.WTERMSIG(status)
+        else:
+            code = os.WEXITSTATUS(status)
+        if client_connected:
+            send_frame(conn, EXIT, EXIT_CODE.pack(code))
+
+    @staticmethod
+    def _kill(pid, signum):
+        try:
+            os.kill(pid, signum)
+        except OSError as exc:
+            if exc.errno != errno.ESRCH:
+                raise
+
+    def _run_task_process(self, request, out_w, err_w):
+        """
+        Run task in the forked task process, never returns.
+        """
+        code = 1
+        try:
+            os.dup2(out_w, sys.stdout.fileno())
+            os.dup2(err_w, sys.stderr.fileno())
+            os.close(out_w)
+            os.close(err_w)
+            os.environ.clear()
+            os.environ.update(request['env'])
+            os.chdir(request['cwd'])
+            sys.argv = ['runjob'] + request['args']
+            # main() closes the task's context (flushes buffered metrics
+            # etc.), atexit handlers inherited from the server are skipped
+            code = run_job(request['args'])
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+            finally:
+                os._exit(code)
+
+
+def server_main(args=None):
+    """
+    Entry point of the ``runjob-server`` command.
+    """
+    parser = ArgumentParser(description='pre-forking jobslib server')
+    parser.add_argument(
+        '--socket', action='store', dest='socket',
+        default=os.environ.get('JOBSLIB_SERVER_SOCKET'),
+        help='path of the Unix socket, default is JOBSLIB_SERVER_SOCKET '
+             'environment variable')
+    parser.add_argument(
+        '--socket-mode', action='store', dest='socket_mode',
+        type=lambda value: int(value, 8), default=0o600,
+        help='permissions of the Unix socket (octal), default is 600')
+    parser.add_argument(
+        '--preload', action='append', dest='preload', default=[],
+        help='module which is imported before server starts, e.g. '
+             'settings module or task module, may be used several times')
+    parser.add_argument(
+        '--no-default-preload', action='store_false', dest='default_preload',
+        default=True,
+        help="don't preload jobslib backends ({})".format(
+            ', '.join(DEFAULT_PRELOAD)))
+    cmdline_args = parser.parse_args(args)
+    if not cmdline_args.socket:
+        parser.error('--socket is required')
+
+    logging.config.dictConfig(BASE_LOGGING)
+    preload = list(DEFAULT_PRELOAD) if cmdline_args.default_preload else []
+    server = JobServer(
+        cmdline_args.socket, preload=preload + cmdline_args.preload,
+        socket_mode=cmdline_args.socket_mode)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    server_main()
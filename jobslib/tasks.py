@@ -2,17 +2,24 @@
 Module :mod:`shelter.tasks` provides an ancestor class for writing tasks.
 """
 
+import concurrent.futures
 import enum
+import inspect
 import logging
 import signal
 import sys
+import threading
 import time
 
-from .exceptions import Terminate
+from .exceptions import SkipIteration, TaskError, Terminate
+from .fingerprint import fingerprint
+from .memory import MemoryTracker
 from .oneinstance import OneInstanceWatchdogError
+from .resources import ResourceUsage
+from .retry import collect_metrics as collect_retry_metrics
 from .time import get_current_time
 
-__all__ = ['BaseTask']
+__all__ = ['BaseTask', 'QueueTask']
 
 
 class JobStatus(enum.Enum):
@@ -22,6 +29,7 @@ class JobStatus(enum.Enum):
     PENDING = 'pending'
     INTERRUPTED = 'interrupted'
     KILLED = 'killed'
+    SKIPPED = 'skipped'
 
 
 class BaseTask(object):
@@ -90,25 +98,64 @@ class BaseTask(object):
             '{}.{}'.format(self.__class__.__module__, self.__class__.__name__))
         self.stdout = sys.stdout
         self.stderr = sys.stderr
+        self._heartbeat_time = None
+        self._heartbeat_thread = None
+        self._reload_requested = False
+        self._executor = None
+        self._pending_bookkeeping = []
         self.initialize()
 
     def __call__(self):
+        try:
+            self._run()
+        finally:
+            self._shutdown_executor()
+
+    def _run(self):
         self.context.config._configure_logging()
+        self.context.config.validate()
 
         lock = self.context.one_instance_lock
         liveness = self.context.liveness
         metrics = self.context.metrics
+        resource_usage = self._create_resource_usage()
+        memory_tracker = self._create_memory_tracker()
+
+        if not self.context.config.run_once and hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, self.request_reload)
 
         while 1:
+            if self._reload_requested:
+                self._reload_requested = False
+                changes = self.reload_config()
+                if changes:
+                    lock = self.context.one_instance_lock
+                    liveness = self.context.liveness
+                    metrics = self.context.metrics
+                    if 'resource_metrics' in changes:
+                        resource_usage = self._create_resource_usage()
+                    if any(change.startswith('memory_tracking.')
+                           for change in changes):
+                        if memory_tracker is not None:
+                            memory_tracker.stop()
+                        memory_tracker = self._create_memory_tracker()
+
             start_time = time.time()
+            self.context.reset_deadline()
+            if resource_usage is not None:
+                resource_usage.start()
             last_successful_run_timestamp = None
             job_status = JobStatus.UNKNOWN
             keep_lock = self.context.config.keep_lock
             release_on_error = self.context.config.release_on_error
+            self._heartbeat_time = None
+            bookkeeping = []
+            liveness_future = None
 
             try:
                 if lock.acquire():
                     terminate = False
+                    skipped = False
                     try:
                         self.logger.info("Run task")
 
@@ -116,15 +163,31 @@ class BaseTask(object):
                         signal.signal(signal.SIGINT, self.terminate_process)
                         try:
                             self.task()
+                        except SkipIteration:
+                            skipped = True
                         finally:
                             signal.signal(signal.SIGTERM, signal.SIG_DFL)
                             signal.signal(signal.SIGINT, signal.SIG_DFL)
+                            self.context.reset_bookkeeping_deadline()
 
-                        self.logger.info("Task done")
+                        if skipped:
+                            self.logger.info(
+                                "Task skipped, inputs have not changed")
+                        else:
+                            self.logger.info("Task done")
+                        # Checkpoint is committed before the liveness is
+                        # written, so liveness doesn't report lost work
+                        self._commit_checkpoint()
+                        # Liveness is written while the lock is released
+                        liveness_future = self._submit(
+                            'liveness', self._write_liveness, liveness)
+                        if liveness_future is not None:
+                            bookkeeping.append(('liveness', liveness_future))
                     except Terminate:
                         terminate = True
                         raise
                     finally:
+                        # Lock uses signals, so it is kept in main thread
                         if (keep_lock
                                 and not self.context.config.run_once
                                 and not terminate):
@@ -132,8 +195,14 @@ class BaseTask(object):
                         else:
                             lock.release()
 
-                    liveness.write()
-                    job_status = JobStatus.SUCCEEDED
+                    if liveness_future is not None:
+                        self._wait_for_liveness(liveness_future)
+                    if skipped:
+                        job_status = JobStatus.SKIPPED
+                    else:
+                        job_status = JobStatus.SUCCEEDED
+                    # Skipped iteration is successful, its outputs are
+                    # up to date
                     last_successful_run_timestamp = get_current_time()
                 else:
                     lock_owner_info = lock.get_lock_owner_info()
@@ -162,20 +231,45 @@ class BaseTask(object):
                 if self.context.config.run_once:
                     raise
             finally:
-                metrics_data = {
-                    'job_duration_seconds': {
-                        'value': time.time() - start_time,
-                        'tags': {
-                            'status': job_status.value,
-                            'type': 'task',
-                        },
-                    },
+                self._rollback_checkpoint()
+                duration = time.time() - start_time
+                duration_tags = {
+                    'status': job_status.value,
+                    'type': 'task',
                 }
+                metrics_data = {}
+                if metrics.registry.summary_interval:
+                    metrics.summary(
+                        'job_duration_seconds',
+                        tags=duration_tags).observe(duration)
+                else:
+                    metrics_data['job_duration_seconds'] = {
+                        'value': duration,
+                        'tags': duration_tags,
+                    }
+                if resource_usage is not None:
+                    metrics_data.update(resource_usage.stop(duration_tags))
+                if memory_tracker is not None:
+                    metrics_data.update(
+                        memory_tracker.iteration({'type': 'task'}))
+                # Last iteration pushes all collected metrics
+                force = (self.context.config.run_once or
+                         job_status == JobStatus.KILLED)
+                metrics_data.update(
+                    collect_retry_metrics(interval=0) if force
+                    else collect_retry_metrics())
                 if last_successful_run_timestamp:
                     metrics_data['last_successful_run_timestamp'] = {
                         'value': get_current_time(),
                     }
-                metrics.push(metrics_data)
+                metrics.registry.collect(metrics_data, force=force)
+                if metrics_data:
+                    metrics_future = self._submit(
+                        'metrics', metrics.push, metrics_data)
+                    if metrics_future is not None:
+                        bookkeeping.append(('metrics', metrics_future))
+                self._wait_for_bookkeeping(bookkeeping)
+                self.context.clear_deadline()
 
             if self.context.config.run_once:
                 break
@@ -226,6 +320,55 @@ class BaseTask(object):
         """
         pass
 
+    def _create_resource_usage(self):
+        if self.context.config.resource_metrics:
+            return ResourceUsage()
+        return None
+
+    def _create_memory_tracker(self):
+        memory_tracking = self.context.config.memory_tracking
+        if not memory_tracking.interval:
+            return None
+        memory_tracker = MemoryTracker(
+            memory_tracking.interval, top=memory_tracking.top,
+            frames=memory_tracking.frames,
+            dump_dir=memory_tracking.dump_dir,
+            dump_threshold=memory_tracking.dump_threshold,
+            name=self.name)
+        memory_tracker.start()
+        return memory_tracker
+
+    def request_reload(self, unused_signum=None, unused_frame=None):
+        """
+        Request configuration reload, it is done before the next iteration,
+        see :meth:`reload_config`. It is **SIGHUP** signal handler.
+        """
+        self._reload_requested = True
+
+    def reload_config(self):
+        """
+        Re-read :mod:`settings` module and environment variables and apply
+        changes of the configuration, see :meth:`jobslib.Config.reload`
+        and :meth:`jobslib.Context.reconfigure`. Only backends whose
+        configuration has changed are created again. If new configuration
+        is not valid, the old one is kept. Return :class:`!list` of the
+        changed options.
+        """
+        self.logger.info("Reload configuration")
+        try:
+            config = self.context.config.reload()
+            changes = self.context.reconfigure(config)
+        except Exception:
+            self.logger.exception(
+                "Configuration reload failed, old configuration is kept")
+            return []
+        if 'logging' in changes:
+            config._configure_logging()
+        self.logger.info(
+            "Configuration has been reloaded, changed options: %s",
+            ', '.join(changes) or 'none')
+        return changes
+
     def task(self):
         """
         Task body, override this method.
@@ -243,6 +386,362 @@ class BaseTask(object):
         """
         return self.context.one_instance_lock.refresh()
 
+    def heartbeat(self, progress=None, **info):
+        """
+        Report that long-running task is still alive. Refresh the lock
+        and write *progress* and *info* into liveness, so ``check-liveness``
+        is able to check progress of the running task using
+        ``--max-progress-age`` argument. *progress* and *info* must be JSON
+        serializable.
+
+        Heartbeats are rate-limited by :attr:`Config.heartbeat_interval`,
+        liveness is written in a background thread, so method doesn't
+        block the task. Return :data:`!True` if heartbeat has been sent,
+        :data:`!False` if it has been skipped.
+
+        .. code-block:: python
+
+            def task(self):
+                items = self.get_items()
+                for i, item in enumerate(items):
+                    self.process(item)
+                    self.heartbeat(progress=i / len(items), item=item.id)
+        """
+        return self._heartbeat(progress, info)
+
+    def _heartbeat(self, progress, info, refresh_lock=True):
+        now = time.monotonic()
+        if (self._heartbeat_time is not None and
+                now - self._heartbeat_time <
+                self.context.config.heartbeat_interval):
+            return False
+        if (self._heartbeat_thread is not None and
+                self._heartbeat_thread.is_alive()):
+            return False
+        self._heartbeat_time = now
+        if refresh_lock:
+            self.context.one_instance_lock.refresh()
+        self._heartbeat_thread = threading.Thread(
+            target=self.context.liveness.heartbeat,
+            args=(progress,), kwargs=info,
+            name='jobslib-heartbeat', daemon=True)
+        self._heartbeat_thread.start()
+        return True
+
+    def skip_if_unchanged(self, **fingerprints):
+        """
+        Declare fingerprints of the task's inputs (e.g. file's mtime,
+        maximal ID in the database table or hash of the data) and skip the
+        rest of the iteration if they are the same as in the last
+        successful iteration. Fingerprints must be JSON serializable, see
+        :mod:`jobslib.fingerprint`.
+
+        Fingerprints are stored in the :attr:`jobslib.Context.checkpoint`,
+        so they are committed only when the iteration succeeds and they
+        persist across restarts if checkpoint is persistent. Skipped
+        iteration is reported with ``skipped`` status.
+
+        .. code-block:: python
+
+            from jobslib.fingerprint import file_fingerprint
+
+            def task(self):
+                self.skip_if_unchanged(
+                    source=file_fingerprint(self.source_path),
+                    max_id=self.get_max_id())
+                self.build_report()
+        """
+        key = 'jobslib.fingerprint.{}'.format(self.name)
+        digest = fingerprint(fingerprints)
+        checkpoint = self.context.checkpoint
+        if checkpoint.get(key) == digest:
+            raise SkipIteration
+        checkpoint.put(key, digest)
+
+    def _submit(self, name, func, *args):
+        """
+        Run ``func(*args)`` in the bookkeeping thread and return future.
+        Return :data:`!None` if bookkeeping of the previous iteration has
+        not finished yet, so it doesn't overlap with the current one.
+        """
+        if any(not future.done() for future in self._pending_bookkeeping):
+            self.logger.warning(
+                "Bookkeeping of the previous iteration has not finished, "
+                "writing %s is skipped", name)
+            return None
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=2, thread_name_prefix='jobslib-bookkeeping')
+        return self._executor.submit(func, *args)
+
+    def _shutdown_executor(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        self._pending_bookkeeping = []
+
+    def _write_liveness(self, liveness):
+        self._wait_for_heartbeat()
+        return liveness.write()
+
+    def _wait_for_liveness(self, future):
+        """
+        Wait until liveness is written, at most until the bookkeeping
+        deadline expires. Raise exception if write has failed, so the
+        iteration is failed.
+        """
+        timeout = self.context.deadline.timeout(
+            self.context.config.bookkeeping_timeout)
+        try:
+            written = future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            raise TaskError(
+                "Writing liveness has not finished in {:.1f} "
+                "seconds".format(timeout)) from None
+        if written is False:
+            raise TaskError("Can't write liveness state")
+
+    def _wait_for_bookkeeping(self, bookkeeping):
+        """
+        Wait until liveness is written and metrics are pushed, at most
+        until the bookkeeping deadline expires (see
+        :meth:`jobslib.Context.reset_bookkeeping_deadline`). Errors are
+        logged, unfinished calls block bookkeeping of the next iteration.
+        """
+        self._pending_bookkeeping = [
+            future for future in self._pending_bookkeeping
+            if not future.done()]
+        if not bookkeeping:
+            return
+        timeout = self.context.deadline.timeout(
+            self.context.config.bookkeeping_timeout)
+        unused_done, not_done = concurrent.futures.wait(
+            [future for unused_name, future in bookkeeping], timeout=timeout)
+        self._pending_bookkeeping.extend(not_done)
+        for name, future in bookkeeping:
+            if name == 'liveness':
+                # Failed liveness fails the iteration, see _wait_for_liveness
+                continue
+            if future in not_done:
+                self.logger.warning(
+                    "Writing %s has not finished in %.1f seconds",
+                    name, timeout)
+            elif future.exception() is not None:
+                self.logger.error(
+                    "Writing %s failed", name, exc_info=future.exception())
+
+    def _used_checkpoint(self):
+        # Checkpoint is not created if the task doesn't use it
+        return self.context.__dict__.get('checkpoint')
+
+    def _commit_checkpoint(self):
+        """
+        Commit changes of the :attr:`jobslib.Context.checkpoint` made
+        during the successful iteration.
+        """
+        checkpoint = self._used_checkpoint()
+        if checkpoint is not None and checkpoint.commit():
+            self.logger.info("Checkpoint has been committed")
+
+    def _rollback_checkpoint(self):
+        """
+        Throw away changes of the :attr:`jobslib.Context.checkpoint` which
+        have not been committed, e.g. when the task has failed.
+        """
+        checkpoint = self._used_checkpoint()
+        if checkpoint is None:
+            return
+        if checkpoint.dirty:
+            self.logger.warning(
+                "Checkpoint changes have not been committed, they are "
+                "thrown away")
+        checkpoint.rollback()
+
+    def _wait_for_heartbeat(self):
+        """
+        Wait until heartbeat which is being written is done, so it can't
+        overwrite liveness state written at the end of the task. Heartbeat
+        is limited by the backend's timeouts and by the deadline.
+        """
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join()
+            self._heartbeat_thread = None
+
+
+class QueueTask(BaseTask):
+    """
+    Ancestor for task which drains the work queue. Override :meth:`process`
+    and optionally :meth:`fetch_batch`, :meth:`ack` and :meth:`nack`. By
+    default items are fetched from :attr:`jobslib.Context.queue`, see
+    :mod:`jobslib.queue`.
+
+    Each iteration processes batches until the queue is drained or the
+    iteration's deadline expires. Items of the batch are processed by the
+    pool of :attr:`~jobslib.config.QueueConfig.workers` threads (or
+    processes, see :attr:`~jobslib.config.QueueConfig.pool`) and each item
+    is acknowledged as soon as it is processed. Item which failed is not
+    acknowledged, so it is fetched again when its lease expires. The next
+    batch is prefetched while the current one is processed and the lock
+    is refreshed between batches. Numbers of the processed and failed
+    items (``queue_items``), duration of the batches
+    (``queue_batch_seconds``) and throughput (``queue_items_per_second``)
+    are aggregated in the metrics registry.
+
+    .. code-block:: python
+
+        from jobslib import QueueTask
+
+        class SendEmailsTask(QueueTask):
+
+            name = 'send-emails'
+
+            def process(self, item):
+                send_email(item.value['to'], item.value['body'])
+
+    If the ``process`` pool is used, :meth:`process` must be
+    :func:`staticmethod` or :func:`classmethod`, because the task can't be
+    passed into the worker processes. Items must be picklable.
+    """
+
+    def fetch_batch(self):
+        """
+        Return :class:`!list` of the next items, empty :class:`!list` if
+        queue is drained. Default implementation leases
+        :attr:`~jobslib.config.QueueConfig.batch_size` items from
+        :attr:`jobslib.Context.queue`. It is called in the prefetching
+        thread.
+        """
+        return self.context.queue.fetch(self.context.config.queue.batch_size)
+
+    def process(self, item):
+        """
+        Process *item*, override this method. Raised exception marks item
+        as failed.
+        """
+        raise NotImplementedError
+
+    def ack(self, item):
+        """
+        Acknowledge processed *item*.
+        """
+        self.context.queue.ack(item)
+
+    def nack(self, item):
+        """
+        Release *item* which has been fetched, but it has not been
+        processed (e.g. prefetched batch when the deadline expires).
+        """
+        self.context.queue.nack(item)
+
+    def _get_process_func(self, pool):
+        if pool == 'thread':
+            return self.process
+        if not isinstance(inspect.getattr_static(self.__class__, 'process'),
+                          (staticmethod, classmethod)):
+            raise TypeError(
+                "process() must be staticmethod or classmethod, when "
+                "process pool is used")
+        return self.__class__.process
+
+    def _create_pool(self, config):
+        if config.pool == 'process':
+            return concurrent.futures.ProcessPoolExecutor(
+                max_workers=config.workers)
+        return concurrent.futures.ThreadPoolExecutor(
+            max_workers=config.workers, thread_name_prefix='jobslib-queue')
+
+    def _process_batch(self, pool, func, batch, counters):
+        """
+        Process items of the *batch* by the *pool*, acknowledge each item
+        as soon as it is processed. Return number of the processed items.
+        """
+        futures = {pool.submit(func, item): item for item in batch}
+        processed = 0
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                item = futures[future]
+                exc = future.exception()
+                if exc is not None:
+                    # Item is fetched again when its lease expires
+                    self.logger.error(
+                        "Processing of the item %r failed", item,
+                        exc_info=exc)
+                    counters['failed'].inc()
+                    continue
+                try:
+                    self.ack(item)
+                except Exception:
+                    self.logger.exception(
+                        "Can't acknowledge the item %r", item)
+                processed += 1
+                counters['processed'].inc()
+        finally:
+            # Items which have not been started yet are not processed when
+            # the batch is interrupted (e.g. by Terminate), their leases
+            # expire. Executor.shutdown(cancel_futures=True) is not
+            # available in Python < 3.9.
+            for future in futures:
+                future.cancel()
+        return processed
+
+    def task(self):
+        config = self.context.config.queue
+        metrics = self.context.metrics
+        tags = {'task': self.name}
+        counters = {
+            status: metrics.counter(
+                'queue_items', tags=dict(tags, status=status))
+            for status in ('processed', 'failed')
+        }
+        func = self._get_process_func(config.pool)
+        deadline = self.context.deadline
+        start_time = time.monotonic()
+        processed = 0
+
+        pool = self._create_pool(config)
+        fetcher = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='jobslib-prefetch')
+        next_batch = None
+        try:
+            batch = self.fetch_batch()
+            while batch:
+                if config.prefetch:
+                    next_batch = fetcher.submit(self.fetch_batch)
+                with metrics.timer('queue_batch_seconds', tags=tags):
+                    processed += self._process_batch(
+                        pool, func, batch, counters)
+                # Lock uses signals, so it is refreshed in the main thread
+                # after each batch, heartbeat doesn't refresh it again
+                self.extend_lock()
+                self._heartbeat(
+                    None, {'processed': processed}, refresh_lock=False)
+                if deadline.expired():
+                    self.logger.info(
+                        "Deadline has expired, queue is not drained")
+                    break
+                if next_batch is not None:
+                    batch, next_batch = next_batch.result(), None
+                else:
+                    batch = self.fetch_batch()
+        finally:
+            pool.shutdown()
+            fetcher.shutdown()
+            if next_batch is not None and next_batch.exception() is None:
+                # Prefetched batch is not processed, release its items
+                for item in next_batch.result():
+                    try:
+                        self.nack(item)
+                    except Exception:
+                        self.logger.exception(
+                            "Can't release the item %r", item)
+        duration = time.monotonic() - start_time
+        if processed and duration > 0:
+            metrics.gauge('queue_items_per_second', tags=tags).set(
+                processed / duration)
+        self.logger.info(
+            "%d items have been processed in %.1f seconds", processed,
+            duration)
+
 
 class _Task(BaseTask):
     """
@@ -251,4 +750,5 @@ class _Task(BaseTask):
 
     def __call__(self):
         self.context.config._configure_logging()
+        self.context.config.validate()
         self.task()
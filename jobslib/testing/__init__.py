@@ -0,0 +1,5 @@
+"""
+Package :mod:`jobslib.testing` provides lightweight in-process stand-ins
+of the backend servers. They are useful for testing and benchmarking of
+the tasks without real infrastructure.
+"""
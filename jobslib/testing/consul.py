@@ -0,0 +1,594 @@
+"""
+Module :mod:`jobslib.testing.consul` provides :class:`FakeConsulServer`,
+in-process stand-in of the Consul HTTP API used by the
+:class:`~jobslib.oneinstance.consul.ConsulLock` and
+:class:`~jobslib.liveness.consul.ConsulLiveness`.
+"""
+
+import base64
+import http.server
+import json
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+
+__all__ = ['FakeConsulServer', 'parse_duration']
+
+DURATION_UNITS = {
+    'ns': 1e-9,
+    'us': 1e-6,
+    'ms': 1e-3,
+    's': 1.0,
+    'm': 60.0,
+    'h': 3600.0,
+}
+
+DURATION_RE = re.compile(r'(\d+(?:\.\d*)?)(ns|us|ms|s|m|h)')
+
+MAX_WAIT = 300.0
+
+
+def parse_duration(value):
+    """
+    Return Consul's (Go) duration *value* (e.g. ``15s``, ``100ms``,
+    ``1m30s``) in seconds. Number without unit is in seconds.
+    """
+    value = value.strip()
+    if not value:
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    seconds = 0.0
+    pos = 0
+    for match in DURATION_RE.finditer(value):
+        if match.start() != pos:
+            break
+        seconds += float(match.group(1)) * DURATION_UNITS[match.group(2)]
+        pos = match.end()
+    if pos != len(value):
+        raise ValueError('Invalid duration {!r}'.format(value))
+    return seconds
+
+
+class ConsulError(Exception):
+    """
+    Request can't be processed, it is responded with HTTP *status*.
+    """
+
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.status = status
+
+
+class FakeConsulServer(object):
+    """
+    HTTP server listening on *host* which implements subset of the Consul
+    HTTP API:
+
+    * sessions (``/v1/session/create``, ``destroy``, ``renew``, ``info``
+      and ``list``) with TTL, ``release`` and ``delete`` behavior and lock
+      delay; session expires *ttl_grace* times TTL after the last renewal,
+      default is exactly after TTL (real Consul waits up to twice the TTL)
+    * key/value store (``/v1/kv/<key>``) including ``acquire``,
+      ``release``, ``cas``, ``flags``, ``recurse`` and ``keys``
+    * blocking queries (``index`` and ``wait`` parameters)
+    * transactions of the key/value operations (``/v1/txn``)
+
+    Sessions are stored in :attr:`sessions`, keys in :attr:`kv`, raft
+    index in :attr:`index` and number of HTTP requests in
+    :attr:`requests`. Every response is delayed by :attr:`latency`
+    seconds and faults can be injected by :meth:`inject_fault`, so both
+    slow and failing Consul agent can be simulated.
+
+    .. code-block:: python
+
+        with FakeConsulServer() as server:
+            host, port = server.address
+            server.inject_fault(status=500, count=2)
+            ...
+            server.expire_session(session_id)
+    """
+
+    def __init__(self, host='127.0.0.1', latency=0.0, clock=time.monotonic,
+                 ttl_grace=1.0):
+        self.sessions = {}
+        self.kv = {}
+        self.requests = 0
+        self.index = 1
+        self.latency = latency
+        self._clock = clock
+        self._ttl_grace = ttl_grace
+        self._faults = []
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._httpd = http.server.ThreadingHTTPServer(
+            (host, 0), self._create_handler())
+        self._httpd.daemon_threads = True
+        self.address = self._httpd.server_address[:2]
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, unused_exc_type, unused_exc_value, unused_tb):
+        self.stop()
+
+    def inject_fault(self, status=500, count=1, path=''):
+        """
+        Respond next *count* requests whose path starts with *path* with
+        HTTP *status*. If *status* is :data:`!None`, connection is closed
+        without response. If *count* is :data:`!None`, fault lasts until
+        :meth:`clear_faults` is called.
+        """
+        with self._lock:
+            self._faults.append({
+                'status': status,
+                'count': count,
+                'path': path,
+            })
+
+    def clear_faults(self):
+        """
+        Remove all injected faults.
+        """
+        with self._lock:
+            self._faults = []
+
+    def _take_fault(self, path):
+        with self._lock:
+            for fault in self._faults:
+                if not path.startswith(fault['path']):
+                    continue
+                if fault['count'] is not None:
+                    fault['count'] -= 1
+                    if fault['count'] <= 0:
+                        self._faults.remove(fault)
+                return fault
+        return None
+
+    def _next_index(self):
+        self.index += 1
+        self._changed.notify_all()
+        return self.index
+
+    # Sessions
+
+    def create_session(self, body):
+        """
+        Create session according to request *body* and return its ID.
+        """
+        session_id = str(uuid.uuid4())
+        ttl = parse_duration(body.get('ttl', body.get('TTL', '')))
+        with self._lock:
+            index = self._next_index()
+            self.sessions[session_id] = {
+                'ID': session_id,
+                'Name': body.get('name', body.get('Name', '')),
+                'TTL': body.get('ttl', body.get('TTL', '')),
+                'LockDelay': parse_duration(
+                    body.get('lockdelay', body.get('LockDelay', '15s'))),
+                'Behavior': body.get(
+                    'behavior', body.get('Behavior', 'release')),
+                'CreateIndex': index,
+                'ModifyIndex': index,
+                'ExpiresAt':
+                    self._clock() + ttl * self._ttl_grace if ttl else None,
+            }
+        return session_id
+
+    def _invalidate_session(self, session_id):
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return
+        now = self._clock()
+        index = self._next_index()
+        for key, entry in list(self.kv.items()):
+            if entry['Session'] != session_id:
+                continue
+            if session['Behavior'] == 'delete':
+                del self.kv[key]
+                continue
+            entry['Session'] = None
+            entry['ModifyIndex'] = index
+            entry['LockDelayUntil'] = now + session['LockDelay']
+
+    def _expire_sessions(self):
+        now = self._clock()
+        for session_id, session in list(self.sessions.items()):
+            if session['ExpiresAt'] is not None and \
+                    session['ExpiresAt'] <= now:
+                self._invalidate_session(session_id)
+
+    def destroy_session(self, session_id):
+        """
+        Destroy session *session_id*, locks held by it are released (or
+        deleted, according to the session's behavior).
+        """
+        with self._lock:
+            self._invalidate_session(session_id)
+
+    def expire_session(self, session_id):
+        """
+        Invalidate session *session_id* as if its TTL expired.
+        """
+        self.destroy_session(session_id)
+
+    def renew_session(self, session_id):
+        """
+        Extend TTL of the session *session_id* and return the session, or
+        :data:`!None` if session doesn't exist.
+        """
+        with self._lock:
+            self._expire_sessions()
+            session = self.sessions.get(session_id)
+            if session is None:
+                return None
+            ttl = parse_duration(session['TTL'])
+            if ttl:
+                session['ExpiresAt'] = self._clock() + ttl * self._ttl_grace
+            return self._format_session(session)
+
+    def get_session(self, session_id):
+        """
+        Return session *session_id*, or :data:`!None` if session doesn't
+        exist.
+        """
+        with self._lock:
+            self._expire_sessions()
+            session = self.sessions.get(session_id)
+            return None if session is None else self._format_session(session)
+
+    @staticmethod
+    def _format_session(session):
+        session = dict(session)
+        del session['ExpiresAt']
+        session['LockDelay'] = int(session['LockDelay'] * 1e9)
+        return session
+
+    # Key/value store
+
+    def _set_key(self, kv, key, value, index, flags=None, session=None,
+                 acquire=None, release=None, cas=None):
+        entry = kv.get(key)
+        if cas is not None and (entry['ModifyIndex'] if entry else 0) != cas:
+            return False
+        session_id = entry['Session'] if entry else None
+        lock_index = entry['LockIndex'] if entry else 0
+        if acquire is not None:
+            if acquire not in self.sessions:
+                raise ConsulError('invalid session "{}"'.format(acquire))
+            if session_id not in (None, acquire):
+                return False
+            if session_id is None:
+                if entry and entry.get('LockDelayUntil', 0) > self._clock():
+                    return False
+                lock_index += 1
+            session_id = acquire
+        elif release is not None:
+            if session_id != release:
+                return False
+            session_id = None
+        kv[key] = {
+            'Key': key,
+            'Value': value,
+            'Flags': entry['Flags'] if flags is None and entry else flags or 0,
+            'Session': session_id,
+            'LockIndex': lock_index,
+            'CreateIndex': entry['CreateIndex'] if entry else index,
+            'ModifyIndex': index,
+            'LockDelayUntil': entry.get('LockDelayUntil', 0) if entry else 0,
+        }
+        return True
+
+    def put_key(self, key, value, params):
+        """
+        Set *value* of the *key* according to query *params* (``acquire``,
+        ``release``, ``cas``, ``flags``), return :data:`!True` if value has
+        been set.
+        """
+        with self._lock:
+            self._expire_sessions()
+            flags = params.get('flags')
+            cas = params.get('cas')
+            result = self._set_key(
+                self.kv, key, value, self.index + 1,
+                flags=None if flags is None else int(flags),
+                acquire=params.get('acquire'),
+                release=params.get('release'),
+                cas=None if cas is None else int(cas))
+            if result:
+                self._next_index()
+            return result
+
+    def delete_key(self, key, params=None):
+        """
+        Delete *key* (or all keys with the prefix *key* if ``recurse`` is
+        in *params*), return :data:`!False` if ``cas`` doesn't match.
+        """
+        params = params or {}
+        with self._lock:
+            if 'recurse' in params:
+                keys = [k for k in self.kv if k.startswith(key)]
+            else:
+                keys = [key] if key in self.kv else []
+            if 'cas' in params and keys:
+                if self.kv[key]['ModifyIndex'] != int(params['cas']):
+                    return False
+            for k in keys:
+                del self.kv[k]
+            self._next_index()
+            return True
+
+    @staticmethod
+    def _format_entry(entry):
+        entry = dict(entry)
+        del entry['LockDelayUntil']
+        if entry['Value'] is not None:
+            entry['Value'] = base64.b64encode(entry['Value']).decode('ascii')
+        if entry['Session'] is None:
+            del entry['Session']
+        return entry
+
+    def get_key(self, key, recurse=False):
+        """
+        Return :class:`!list` of entries of the *key* (or keys with prefix
+        *key* if *recurse* is :data:`!True`) in format of the Consul API.
+        """
+        with self._lock:
+            self._expire_sessions()
+            if recurse:
+                entries = [
+                    self.kv[k] for k in sorted(self.kv) if k.startswith(key)]
+            else:
+                entries = [self.kv[key]] if key in self.kv else []
+            return [self._format_entry(entry) for entry in entries]
+
+    def wait_for_index(self, index, timeout):
+        """
+        Block until :attr:`index` is greater than *index* or *timeout*
+        seconds elapse (blocking query).
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self.index <= index:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+
+    # Transactions
+
+    def txn(self, operations):
+        """
+        Execute key/value *operations* atomically. Return ``(results,
+        errors)``, if any operation fails, nothing is changed and
+        *results* are :data:`!None`.
+        """
+        with self._lock:
+            self._expire_sessions()
+            kv = {key: dict(entry) for key, entry in self.kv.items()}
+            index = self.index + 1
+            results = []
+            errors = []
+            for op_index, operation in enumerate(operations):
+                try:
+                    entry = self._txn_operation(kv, operation['KV'], index)
+                except ConsulError as exc:
+                    errors.append({'OpIndex': op_index, 'What': str(exc)})
+                    continue
+                if entry is not None:
+                    results.append({'KV': entry})
+            if errors:
+                return None, errors
+            if kv != self.kv:
+                self.kv = kv
+                self._next_index()
+            return results, None
+
+    def _txn_operation(self, kv, operation, index):
+        verb = operation['Verb']
+        key = operation.get('Key', '')
+        value = operation.get('Value')
+        if value is not None:
+            value = base64.b64decode(value)
+        entry = kv.get(key)
+        cas = operation.get('Index')
+        flags = operation.get('Flags')
+        session = operation.get('Session')
+
+        if verb == 'set':
+            self._set_key(kv, key, value, index, flags=flags)
+        elif verb == 'cas':
+            if not self._set_key(kv, key, value, index, flags=flags,
+                                 cas=cas or 0):
+                raise ConsulError('failed to set key "{}", index is '
+                                  'stale'.format(key))
+        elif verb == 'lock':
+            if not self._set_key(kv, key, value, index, flags=flags,
+                                 acquire=session):
+                raise ConsulError('failed to lock key "{}"'.format(key))
+        elif verb == 'unlock':
+            if not self._set_key(kv, key, value, index, flags=flags,
+                                 release=session):
+                raise ConsulError('failed to unlock key "{}"'.format(key))
+        elif verb in ('get', 'check-index', 'check-session'):
+            if entry is None:
+                raise ConsulError('key "{}" doesn\'t exist'.format(key))
+            if verb == 'check-index' and entry['ModifyIndex'] != cas:
+                raise ConsulError(
+                    'current index {} does not match {}'.format(
+                        entry['ModifyIndex'], cas))
+            if verb == 'check-session' and entry['Session'] != session:
+                raise ConsulError(
+                    'key "{}" is not locked by session "{}"'.format(
+                        key, session))
+        elif verb == 'check-not-exists':
+            if entry is not None:
+                raise ConsulError('key "{}" exists'.format(key))
+            return None
+        elif verb == 'delete':
+            kv.pop(key, None)
+            return None
+        elif verb == 'delete-cas':
+            if (entry['ModifyIndex'] if entry else 0) != cas:
+                raise ConsulError('failed to delete key "{}", index is '
+                                  'stale'.format(key))
+            kv.pop(key, None)
+            return None
+        else:
+            raise ConsulError('unknown KV verb "{}"'.format(verb))
+
+        entry = self._format_entry(kv[key])
+        if verb != 'get':
+            entry['Value'] = None
+        return entry
+
+    def _create_handler(self):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def _respond(self, status, data=None):
+                if isinstance(data, str):
+                    body = data.encode('utf-8')
+                else:
+                    body = b'' if data is None else json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('X-Consul-Index', str(server.index))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_body(self):
+                length = int(self.headers.get('Content-Length', 0))
+                return self.rfile.read(length) if length else b''
+
+            def _dispatch(self, method):
+                url = urllib.parse.urlsplit(self.path)
+                path = urllib.parse.unquote(url.path)
+                params = dict(urllib.parse.parse_qsl(
+                    url.query, keep_blank_values=True))
+                body = self._read_body()
+                with server._lock:
+                    server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                fault = server._take_fault(path)
+                if fault is not None:
+                    if fault['status'] is None:
+                        self.close_connection = True
+                        return
+                    self._respond(fault['status'], 'Injected fault')
+                    return
+                try:
+                    if path.startswith('/v1/kv/'):
+                        self._handle_kv(
+                            method, path[len('/v1/kv/'):], params, body)
+                    elif path.startswith('/v1/session/'):
+                        self._handle_session(
+                            method, path[len('/v1/session/'):], body)
+                    elif path == '/v1/txn' and method == 'PUT':
+                        self._handle_txn(body)
+                    else:
+                        self._respond(404)
+                except ConsulError as exc:
+                    self._respond(exc.status, str(exc))
+
+            def _handle_kv(self, method, key, params, body):
+                if method == 'GET':
+                    if 'index' in params:
+                        server.wait_for_index(
+                            int(params['index']),
+                            min(parse_duration(params.get('wait', '5m')),
+                                MAX_WAIT))
+                    entries = server.get_key(key, recurse='recurse' in params)
+                    if 'keys' in params:
+                        entries = server.get_key(key, recurse=True)
+                        self._respond(200, [e['Key'] for e in entries])
+                    elif not entries:
+                        self._respond(404)
+                    else:
+                        self._respond(200, entries)
+                elif method == 'PUT':
+                    self._respond(200, server.put_key(key, body, params))
+                else:
+                    self._respond(200, server.delete_key(key, params))
+
+            def _handle_session(self, method, path, body):
+                action, unused_sep, session_id = path.partition('/')
+                if action == 'create' and method == 'PUT':
+                    data = json.loads(body.decode('utf-8')) if body else {}
+                    self._respond(200, {'ID': server.create_session(data)})
+                elif action == 'destroy' and method == 'PUT':
+                    server.destroy_session(session_id)
+                    self._respond(200, True)
+                elif action == 'renew' and method == 'PUT':
+                    session = server.renew_session(session_id)
+                    if session is None:
+                        self._respond(
+                            404, 'Session id "{}" not found'.format(
+                                session_id))
+                    else:
+                        self._respond(200, [session])
+                elif action == 'info':
+                    session = server.get_session(session_id)
+                    self._respond(200, [] if session is None else [session])
+                elif action == 'list':
+                    with server._lock:
+                        session_ids = list(server.sessions)
+                    sessions = [server.get_session(s) for s in session_ids]
+                    self._respond(200, [s for s in sessions if s])
+                else:
+                    self._respond(404)
+
+            def _handle_txn(self, body):
+                operations = json.loads(body.decode('utf-8'))
+                results, errors = server.txn(operations)
+                if errors:
+                    self._respond(409, {'Results': None, 'Errors': errors})
+                else:
+                    self._respond(200, {'Results': results, 'Errors': None})
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_PUT(self):
+                self._dispatch('PUT')
+
+            def do_DELETE(self):
+                self._dispatch('DELETE')
+
+            def log_message(self, fmt, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        """
+        Start the server in a background thread.
+        """
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, kwargs={'poll_interval': 0.05},
+            daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the server.
+        """
+        with self._lock:
+            # Wake up blocking queries
+            self._changed.notify_all()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
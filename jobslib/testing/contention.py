@@ -0,0 +1,322 @@
+"""
+Module :mod:`jobslib.testing.contention` provides lock contention
+simulator. Fleet of worker processes, each of them with its own
+:class:`~jobslib.oneinstance.consul.ConsulLock`, contends on one or
+several keys of the :class:`~jobslib.testing.consul.FakeConsulServer`.
+Workers are processes, because :class:`ConsulLock` uses **SIGALRM**, so
+it can't be shared by threads.
+
+Worker repeats the loop of the :class:`jobslib.BaseTask`: it tries to
+acquire the lock, holds it for *hold_time* seconds and releases it, or
+it reads the lock owner info when the lock is held by someone else. Then
+it sleeps for *sleep_interval* seconds. Holder refreshes the lock every
+half of the TTL (like :meth:`jobslib.BaseTask.extend_lock`), so it may
+hold the lock longer than TTL. If *refresh* is disabled, holder which
+holds the lock longer than TTL is interrupted by the lock's watchdog.
+With *kill_rate* probability the holder is killed without releasing the
+lock, so the lock is released when its session TTL expires and the
+killed worker is started again.
+
+Server's time and the lock's watchdog run *time_scale* times faster, so
+TTL and lock delay of the hours-long deployment can be simulated in
+minutes. Sessions expire after twice the TTL, like in the Consul. All
+durations (except latencies of the requests) are in the simulated
+seconds.
+
+.. code-block:: python
+
+    report = simulate_lock_contention(
+        workers=200, keys=4, duration=600, ttl=30, lock_delay=15,
+        hold_time=5, sleep_interval=10, kill_rate=0.05, time_scale=20)
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import signal
+import time
+
+from ..bench import percentile
+from ..deadline import Deadline
+from .consul import FakeConsulServer
+
+__all__ = ['simulate_lock_contention', 'fairness_index']
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+def fairness_index(values):
+    """
+    Return Jain's fairness index of *values*, 1.0 means all values are
+    equal, ``1 / len(values)`` means one value gets everything.
+    """
+    total = sum(values)
+    squares = sum(value * value for value in values)
+    if not squares:
+        return None
+    return total * total / (len(values) * squares)
+
+
+def summarize(values):
+    """
+    Return count, percentiles and maximum of the *values* as a
+    :class:`!dict`.
+    """
+    values = sorted(values)
+    stats = {
+        'count': len(values),
+        'max': values[-1] if values else None,
+    }
+    for q in PERCENTILES:
+        stats['p{:g}'.format(q * 100)] = percentile(values, q)
+    return stats
+
+
+class WorkerContext(object):
+    """
+    Minimal context of the worker's lock.
+    """
+
+    def __init__(self, fqdn):
+        self.fqdn = fqdn
+        self.deadline = Deadline()
+
+
+def hold_lock(lock, hold_time, refresh_interval, stop):
+    """
+    Hold the *lock* for *hold_time* seconds, refresh it every
+    *refresh_interval* seconds if it is not :data:`!None`.
+    """
+    end = time.monotonic() + hold_time
+    while not stop.is_set():
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            return
+        if refresh_interval is None:
+            stop.wait(remaining)
+        else:
+            stop.wait(min(remaining, refresh_interval))
+            lock.refresh()
+
+
+def run_worker(worker_id, key, settings, hold_time, sleep_interval,
+               kill_rate, refresh, time_scale, seed, stop, events):
+    """
+    Entry point of the worker process, *hold_time* and *sleep_interval*
+    are in real seconds. Events ``(worker_id, key, event, time, latency)``
+    are put into *events* queue.
+    """
+    # ConsulLock is imported in the worker, it is not needed for reporting
+    from ..oneinstance import OneInstanceWatchdogError
+    from ..oneinstance.consul import ConsulLock
+
+    class ScaledConsulLock(ConsulLock):
+
+        def _set_alarm(self, seconds):
+            # Watchdog runs as fast as the server's clock
+            signal.setitimer(signal.ITIMER_REAL, seconds / time_scale)
+
+    # Unsuccessful acquires are expected, they are reported as events
+    logging.getLogger('jobslib.oneinstance.consul').disabled = True
+    rng = random.Random(seed)
+    settings = dict(settings, key=key)
+    lock = ScaledConsulLock(
+        WorkerContext('worker-{}'.format(worker_id)),
+        ScaledConsulLock.OptionsConfig(settings, None))
+    refresh_interval = settings['ttl'] / 2 / time_scale if refresh else None
+
+    while not stop.is_set():
+        start = time.monotonic()
+        try:
+            acquired = lock.acquire()
+        except Exception:
+            acquired = None
+        latency = time.monotonic() - start
+        if acquired:
+            events.put((worker_id, key, 'acquired', time.monotonic(), latency))
+            try:
+                hold_lock(lock, hold_time, refresh_interval, stop)
+            except OneInstanceWatchdogError:
+                # Lock has not been refreshed in time, the task is
+                # interrupted and the lock is released
+                events.put(
+                    (worker_id, key, 'expired', time.monotonic(), None))
+                lock.release()
+                stop.wait(sleep_interval)
+                continue
+            if kill_rate and rng.random() < kill_rate:
+                events.put((worker_id, key, 'killed', time.monotonic(), None))
+                events.close()
+                events.join_thread()
+                os._exit(1)
+            lock.release()
+        elif acquired is False:
+            lock.get_lock_owner_info()
+            events.put((worker_id, key, 'failed', time.monotonic(), latency))
+        else:
+            events.put((worker_id, key, 'error', time.monotonic(), latency))
+        stop.wait(sleep_interval)
+
+
+def build_report(events, workers, keys, duration, time_scale):
+    """
+    Return report of the simulation from the worker *events*.
+    """
+    events = sorted(events, key=lambda event: event[3])
+    counts = {
+        'acquired': 0,
+        'failed': 0,
+        'error': 0,
+        'killed': 0,
+        'expired': 0,
+    }
+    acquires = {worker_id: 0 for worker_id in range(workers)}
+    latencies = []
+    failovers = []
+    pending_kills = {}
+    for worker_id, key, event, timestamp, latency in events:
+        counts[event] += 1
+        if latency is not None:
+            latencies.append(latency)
+        if event == 'acquired':
+            acquires[worker_id] += 1
+            killed_at = pending_kills.pop(key, None)
+            if killed_at is not None:
+                failovers.append((timestamp - killed_at) * time_scale)
+        elif event == 'killed':
+            pending_kills[key] = timestamp
+
+    fairness = []
+    for key in keys:
+        key_acquires = [
+            acquires[worker_id] for worker_id in range(workers)
+            if keys[worker_id % len(keys)] == key]
+        index = fairness_index(key_acquires)
+        if index is not None:
+            fairness.append(index)
+
+    attempts = counts['acquired'] + counts['failed'] + counts['error']
+    failover = summarize(failovers)
+    failover['unrecovered'] = len(pending_kills)
+    return {
+        'workers': workers,
+        'keys': len(keys),
+        'duration': duration,
+        'attempts': attempts,
+        'acquires': counts['acquired'],
+        'errors': counts['error'],
+        'kills': counts['killed'],
+        'expirations': counts['expired'],
+        'acquire_rate': counts['acquired'] / duration,
+        'acquire_latency': summarize(latencies),
+        'failover': failover,
+        'fairness': sum(fairness) / len(fairness) if fairness else None,
+        'acquires_per_worker': {
+            'min': min(acquires.values()),
+            'max': max(acquires.values()),
+        },
+    }
+
+
+def simulate_lock_contention(
+        workers=10, keys=1, duration=60.0, ttl=10, lock_delay=1,
+        hold_time=1.0, sleep_interval=1.0, kill_rate=0.0, refresh=True,
+        time_scale=1.0, latency=0.0, seed=None, start_method=None):
+    """
+    Run *workers* processes contending on *keys* lock keys for
+    *duration* seconds and return report as a :class:`!dict`. *ttl* and
+    *lock_delay* are options of the :class:`ConsulLock`, *latency* is
+    delay of each server's response in real seconds. If *refresh* is
+    :data:`!False`, holders don't refresh the lock. *start_method* is
+    :mod:`multiprocessing` start method, default is platform's default.
+
+    Report contains number of the acquire ``attempts``, ``acquires``,
+    ``errors``, ``kills`` and ``expirations`` (holders interrupted by
+    the lock's watchdog), ``acquire_rate`` (acquires per second),
+    ``server_requests`` and ``server_request_rate`` (requests per
+    second), ``acquire_latency`` (real seconds) and ``failover`` (time
+    between killing the holder and next acquire) percentiles,
+    ``fairness`` (mean Jain's fairness index of the acquires among the
+    workers of the same key) and ``acquires_per_worker``.
+    """
+    if workers <= 0:
+        raise ValueError('workers must be positive')
+    if keys <= 0:
+        raise ValueError('keys must be positive')
+    if time_scale <= 0:
+        raise ValueError('time_scale must be positive')
+
+    key_names = ['jobs/simulation/{}/lock'.format(i) for i in range(keys)]
+    rng = random.Random(seed)
+    mp_context = multiprocessing.get_context(start_method)
+    stop = mp_context.Event()
+    events_queue = mp_context.Queue()
+    events = []
+
+    def drain(timeout):
+        try:
+            events.append(events_queue.get(timeout=timeout))
+            while True:
+                events.append(events_queue.get_nowait())
+        except queue.Empty:
+            pass
+
+    origin = time.monotonic()
+
+    def clock():
+        return origin + (time.monotonic() - origin) * time_scale
+
+    with FakeConsulServer(
+            latency=latency, clock=clock, ttl_grace=2.0) as server:
+        host, port = server.address
+        settings = {
+            'host': host,
+            'port': port,
+            'ttl': ttl,
+            'lock_delay': lock_delay,
+        }
+
+        def start_worker(worker_id):
+            process = mp_context.Process(
+                target=run_worker,
+                args=(worker_id, key_names[worker_id % keys], settings,
+                      hold_time / time_scale, sleep_interval / time_scale,
+                      kill_rate, refresh, time_scale, rng.random(), stop,
+                      events_queue),
+                daemon=True)
+            process.start()
+            return process
+
+        processes = [start_worker(worker_id) for worker_id in range(workers)]
+        start = time.monotonic()
+        end = start + duration / time_scale
+        while time.monotonic() < end:
+            drain(0.05)
+            for worker_id, process in enumerate(processes):
+                if process.exitcode is not None:
+                    # Killed holder is replaced by new instance
+                    process.join()
+                    processes[worker_id] = start_worker(worker_id)
+        requests = server.requests
+        stopped = time.monotonic()
+        elapsed = (stopped - start) * time_scale
+
+        stop.set()
+        join_end = time.monotonic() + hold_time / time_scale + 5.0
+        while time.monotonic() < join_end and \
+                any(process.is_alive() for process in processes):
+            drain(0.05)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        drain(0.0)
+
+    # Events of the shutdown are not included
+    events = [event for event in events if event[3] <= stopped]
+    report = build_report(events, workers, key_names, elapsed, time_scale)
+    report['server_requests'] = requests
+    report['server_request_rate'] = requests / elapsed
+    return report
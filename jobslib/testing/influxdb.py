@@ -0,0 +1,139 @@
+"""
+Module :mod:`jobslib.testing.influxdb` provides :class:`FakeInfluxDBServer`,
+in-process stand-in of the InfluxDB HTTP and UDP write API.
+"""
+
+import gzip
+import http.server
+import socket
+import threading
+import urllib.parse
+
+__all__ = ['FakeInfluxDBServer']
+
+
+class FakeInfluxDBServer(object):
+    """
+    HTTP server listening on *host* which accepts InfluxDB 1.x ``/write``
+    requests (optionally gzip compressed) and ``/ping`` requests. If
+    *udp* is :data:`!True`, UDP socket accepting line protocol is opened
+    too. Received lines are stored in :attr:`lines`, number of HTTP
+    requests in :attr:`requests` and number of TCP connections in
+    :attr:`connections`.
+
+    .. code-block:: python
+
+        with FakeInfluxDBServer() as server:
+            host, port = server.address
+            ...
+        assert server.lines
+    """
+
+    def __init__(self, host='127.0.0.1', udp=False):
+        self.lines = []
+        self.requests = 0
+        self.connections = 0
+        self.databases = set()
+        self._lock = threading.Lock()
+        self._httpd = http.server.ThreadingHTTPServer(
+            (host, 0), self._create_handler())
+        self._httpd.daemon_threads = True
+        self.address = self._httpd.server_address[:2]
+        self._udp = None
+        self.udp_address = None
+        if udp:
+            self._udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._udp.bind((host, 0))
+            self._udp.settimeout(0.1)
+            self.udp_address = self._udp.getsockname()[:2]
+        self._threads = []
+        self._stopped = threading.Event()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, unused_exc_type, unused_exc_value, unused_tb):
+        self.stop()
+
+    def _add_lines(self, data):
+        lines = [
+            line for line in data.decode('utf-8').split('\n') if line]
+        with self._lock:
+            self.lines.extend(lines)
+
+    def _create_handler(self):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def _respond(self, status):
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def do_GET(self):
+                if self.path.startswith('/ping'):
+                    self._respond(204)
+                else:
+                    self._respond(404)
+
+            def do_POST(self):
+                url = urllib.parse.urlsplit(self.path)
+                length = int(self.headers.get('Content-Length', 0))
+                data = self.rfile.read(length)
+                if url.path != '/write':
+                    self._respond(404)
+                    return
+                if self.headers.get('Content-Encoding') == 'gzip':
+                    data = gzip.decompress(data)
+                params = urllib.parse.parse_qs(url.query)
+                with server._lock:
+                    server.requests += 1
+                    server.databases.update(params.get('db', []))
+                server._add_lines(data)
+                self._respond(204)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        return Handler
+
+    def _serve_udp(self):
+        while not self._stopped.is_set():
+            try:
+                data = self._udp.recv(65535)
+            except socket.timeout:
+                continue
+            self._add_lines(data)
+
+    def start(self):
+        """
+        Start the server in background threads.
+        """
+        self._threads.append(threading.Thread(
+            target=self._httpd.serve_forever, daemon=True))
+        if self._udp is not None:
+            self._threads.append(threading.Thread(
+                target=self._serve_udp, daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """
+        Stop the server.
+        """
+        self._stopped.set()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        for thread in self._threads:
+            thread.join()
+        if self._udp is not None:
+            self._udp.close()
@@ -51,11 +51,12 @@ setup(
         'influxdb',
         'objectvalidator',
         'python-consul2',
-        'retrying',
     ],
     entry_points={
         'console_scripts': [
             'runjob = jobslib.main:main',
+            'runjob-server = jobslib.server:server_main',
+            'runjob-client = jobslib.client:client_main',
         ]
     },
 )
@@ -0,0 +1,81 @@
+"""
+Shared factories of the :class:`~jobslib.Config`, of the tasks and of the
+metrics backends. Plain functions are usable by the benchmarks and by the
+scripts which run in a subprocess, tests use them through the fixtures.
+"""
+
+import argparse
+import types
+from unittest import mock
+
+import pytest
+
+from jobslib.config import Config
+from jobslib.context import Context
+from jobslib.tasks import BaseTask
+
+DEFAULT_SETTINGS = {
+    'ONE_INSTANCE': {
+        'backend': 'jobslib.oneinstance.dummy.DummyLock',
+    },
+}
+
+
+def create_args_parser(**kwargs):
+    """
+    Return :class:`argparse.Namespace` with the command line arguments
+    of the task, *kwargs* override the defaults.
+    """
+    args = dict(
+        disable_one_instance=False, run_once=True, run_interval=None,
+        sleep_interval=None, keep_lock=None, release_on_error=None)
+    args.update(kwargs)
+    return argparse.Namespace(**args)
+
+
+def create_config(task_cls=None, args=None, **settings):
+    """
+    Return :class:`~jobslib.Config` of the *task_cls*. Keyword arguments
+    *settings* override :data:`DEFAULT_SETTINGS`, :class:`!dict` *args*
+    overrides the default command line arguments.
+    """
+    if task_cls is None:
+        task_cls = mock.Mock()
+    return Config(
+        types.SimpleNamespace(**dict(DEFAULT_SETTINGS, **settings)),
+        create_args_parser(**(args or {})),
+        task_cls)
+
+
+def create_task(task_cls, args=None, **settings):
+    """
+    Return instance of the *task_cls*, arguments are the same as
+    :func:`create_config` arguments.
+    """
+    return task_cls(create_config(task_cls, args=args, **settings))
+
+
+def create_metrics(metrics_cls, task_name='hello', **options):
+    """
+    Return instance of the *metrics_cls* backend of the task named
+    *task_name* with the real :class:`~jobslib.Context`, keyword arguments
+    *options* are options of the backend.
+    """
+    task_cls = type('Task', (BaseTask,), {'name': task_name})
+    context = Context(create_config(task_cls))
+    return metrics_cls(context, metrics_cls.OptionsConfig(options, None))
+
+
+@pytest.fixture
+def make_config():
+    return create_config
+
+
+@pytest.fixture
+def make_task():
+    return create_task
+
+
+@pytest.fixture
+def make_metrics():
+    return create_metrics
@@ -0,0 +1,93 @@
+
+import json
+import signal
+import socket
+
+from jobslib.bench import BenchBackends, percentile
+from jobslib.main import main
+from jobslib.testing.consul import FakeConsulServer
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile(values, 1.0) == 100
+    assert percentile([7], 0.5) == 7
+    assert percentile([], 0.5) is None
+
+
+def test_bench_backends(capsys, monkeypatch):
+    monkeypatch.setenv(
+        'JOBSLIB_ONE_INSTANCE_BACKEND', 'jobslib.oneinstance.dummy.DummyLock')
+    main([
+        'bench-backends', '--iterations', '20', '--metrics-size', '5',
+        '--format', 'json',
+    ])
+    results = json.loads(capsys.readouterr().out)
+    assert sorted(results) == [
+        'liveness.read', 'liveness.write', 'lock.acquire', 'lock.release',
+        'metrics.push']
+    for stats in results.values():
+        assert stats['count'] == 20
+        assert stats['errors'] == 0
+        assert stats['p50'] <= stats['p95'] <= stats['p99'] <= stats['max']
+
+
+def test_bench_backends_table(capsys):
+    main([
+        '--disable-one-instance', 'bench-backends', '--iterations', '3',
+        '--backend', 'metrics',
+    ])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split()[:4] == ['operation', 'count', 'errors', 'ops/s']
+    assert lines[1].split()[:3] == ['metrics.push', '3', '0']
+    assert len(lines) == 2
+    assert BenchBackends.name == 'bench-backends'
+
+
+def test_bench_backends_consul(capsys, monkeypatch):
+    with FakeConsulServer() as server:
+        host, port = server.address
+        backends = {
+            'ONE_INSTANCE': 'jobslib.oneinstance.consul.ConsulLock',
+            'LIVENESS': 'jobslib.liveness.consul.ConsulLiveness',
+        }
+        for name, backend in backends.items():
+            prefix = 'JOBSLIB_{}_CONSUL_'.format(name)
+            monkeypatch.setenv('JOBSLIB_{}_BACKEND'.format(name), backend)
+            monkeypatch.setenv(prefix + 'HOST', host)
+            monkeypatch.setenv(prefix + 'PORT', str(port))
+            monkeypatch.setenv(prefix + 'KEY', 'jobs/bench/' + name.lower())
+        try:
+            main([
+                'bench-backends', '--iterations', '5', '--format', 'json',
+                '--backend', 'lock', '--backend', 'liveness',
+            ])
+        finally:
+            signal.alarm(0)
+            signal.signal(signal.SIGALRM, signal.SIG_DFL)
+    results = json.loads(capsys.readouterr().out)
+    # session renewal is measured instead of refresh, which is a no-op
+    assert results['lock.renew']['count'] == 5
+    for stats in results.values():
+        assert stats['errors'] == 0
+
+
+def test_bench_backends_unreachable(capsys, monkeypatch):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    monkeypatch.setenv(
+        'JOBSLIB_LIVENESS_BACKEND', 'jobslib.liveness.consul.ConsulLiveness')
+    monkeypatch.setenv('JOBSLIB_LIVENESS_CONSUL_HOST', '127.0.0.1')
+    monkeypatch.setenv('JOBSLIB_LIVENESS_CONSUL_PORT', str(port))
+    monkeypatch.setenv('JOBSLIB_LIVENESS_CONSUL_KEY', 'jobs/bench/liveness')
+    main([
+        '--disable-one-instance', 'bench-backends', '--iterations', '3',
+        '--backend', 'liveness', '--format', 'json',
+    ])
+    results = json.loads(capsys.readouterr().out)
+    # liveness logs the errors, but they are reported
+    assert results['liveness.write']['errors'] == 3
+    assert results['liveness.read']['errors'] == 3
@@ -0,0 +1,156 @@
+
+from unittest import mock
+
+import pytest
+
+from jobslib import BaseTask
+from jobslib.checkpoint import CheckpointConflictError
+from jobslib.checkpoint.consul import ConsulCheckpoint
+from jobslib.checkpoint.dummy import DummyCheckpoint
+from jobslib.checkpoint.file import FileCheckpoint
+from jobslib.checkpoint.sqlite import SQLiteCheckpoint
+from jobslib.deadline import Deadline
+from jobslib.exceptions import Terminate
+from jobslib.testing.consul import FakeConsulServer
+
+
+@pytest.fixture(params=['dummy', 'file', 'sqlite', 'consul'])
+def create_checkpoint(request, tmp_path):
+    context = mock.Mock(fqdn='localhost', deadline=Deadline())
+    dummy = {}
+
+    def _create(backend, settings):
+        return backend(context, backend.OptionsConfig(settings, None))
+
+    if request.param == 'dummy':
+        def create():
+            # Two instances of the dummy checkpoint share the storage
+            checkpoint = _create(DummyCheckpoint, {})
+            checkpoint._values = dummy
+            return checkpoint
+        yield create
+    elif request.param == 'file':
+        path = str(tmp_path / 'checkpoint.json')
+        yield lambda: _create(FileCheckpoint, {'path': path})
+    elif request.param == 'sqlite':
+        path = str(tmp_path / 'checkpoint.sqlite')
+        yield lambda: _create(SQLiteCheckpoint, {'path': path})
+    else:
+        with FakeConsulServer() as server:
+            host, port = server.address
+            yield lambda: _create(ConsulCheckpoint, {
+                'host': host, 'port': port, 'key': 'jobs/test/checkpoint'})
+
+
+def test_checkpoint(create_checkpoint):
+    checkpoint = create_checkpoint()
+    assert checkpoint.get('cursor') is None
+    assert checkpoint.get('cursor', 0) == 0
+    assert checkpoint.commit() is False
+
+    value = {'last_id': 10}
+    checkpoint.put('cursor', value)
+    value['last_id'] = 20
+    assert checkpoint.get('cursor') == {'last_id': 10}
+    assert checkpoint.dirty
+    # value is not written until commit
+    assert create_checkpoint().get('cursor') is None
+    assert checkpoint.commit() is True
+    assert not checkpoint.dirty
+    assert create_checkpoint().get('cursor') == {'last_id': 10}
+
+    checkpoint.put('cursor', {'last_id': 30})
+    checkpoint.rollback()
+    assert checkpoint.get('cursor') == {'last_id': 10}
+
+
+def test_checkpoint_compare_and_set(create_checkpoint):
+    checkpoint = create_checkpoint()
+    assert checkpoint.compare_and_set('cursor', None, 1) is True
+    assert checkpoint.compare_and_set('cursor', None, 2) is False
+    assert checkpoint.compare_and_set('cursor', 1, 2) is True
+    checkpoint.commit()
+    assert create_checkpoint().get('cursor') == 2
+
+
+def test_checkpoint_conflict(create_checkpoint):
+    checkpoint = create_checkpoint()
+    checkpoint.put('cursor', 1)
+    checkpoint.put('other', 1)
+    checkpoint.commit()
+
+    other = create_checkpoint()
+    assert checkpoint.get('cursor') == other.get('cursor') == 1
+    other.put('cursor', 2)
+    other.commit()
+
+    checkpoint.put('cursor', 3)
+    checkpoint.put('other', 3)
+    with pytest.raises(CheckpointConflictError):
+        checkpoint.commit()
+    # nothing is written
+    assert checkpoint.get('cursor') == 2
+    assert checkpoint.get('other') == 1
+
+
+class CursorTask(BaseTask):
+
+    name = 'cursor'
+    fail = False
+
+    def task(self):
+        cursor = self.context.checkpoint.get('cursor', 0)
+        if cursor == 3:
+            raise Terminate
+        self.context.checkpoint.put('cursor', cursor + 1)
+        if self.fail:
+            raise ValueError('Task failed')
+
+
+@pytest.fixture
+def create_task(make_task, tmp_path):
+    def create(run_once):
+        return make_task(
+            CursorTask, args={'run_once': run_once, 'sleep_interval': 1},
+            CHECKPOINT={
+                'backend': 'jobslib.checkpoint.sqlite.SQLiteCheckpoint',
+                'options': {'path': str(tmp_path / 'checkpoint.sqlite')},
+            })
+    return create
+
+
+def test_task_commits_checkpoint(create_task):
+    task = create_task(run_once=False)
+    checkpoint = task.context.checkpoint
+    calls = []
+    commit = checkpoint.commit
+
+    def checkpoint_commit():
+        calls.append('commit')
+        return commit()
+
+    def liveness_write():
+        calls.append(('liveness', checkpoint.get('cursor')))
+
+    with mock.patch.object(task.context.liveness, 'write', liveness_write), \
+            mock.patch.object(checkpoint, 'commit', checkpoint_commit), \
+            mock.patch('time.sleep'):
+        with pytest.raises(Terminate):
+            task()
+    # checkpoint is committed before liveness is written
+    assert calls == [
+        'commit', ('liveness', 1),
+        'commit', ('liveness', 2),
+        'commit', ('liveness', 3),
+    ]
+
+
+def test_task_rollbacks_checkpoint(create_task):
+    task = create_task(run_once=True)
+    task.fail = True
+    with mock.patch.object(task.context.liveness, 'write') as m_write:
+        with pytest.raises(ValueError):
+            task()
+    m_write.assert_not_called()
+    assert not task.context.checkpoint.dirty
+    assert task.context.checkpoint.get('cursor') is None
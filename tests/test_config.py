@@ -7,7 +7,7 @@ from unittest import mock
 import pytest
 
 from jobslib import BaseTask
-from jobslib.config import Config, ConfigGroup, option
+from jobslib.config import Config, ConfigGroup, lazy_option, option
 from jobslib.context import Context
 from jobslib.liveness.consul import ConsulLiveness
 from jobslib.metrics.influxdb import InfluxDBMetrics
@@ -38,6 +38,76 @@ def test_config_group():
     assert test_config.as_kwargs == {'baz': 1, 'bar': 2}
 
 
+def test_lazy_option():
+    calls = []
+
+    class TestConfig(ConfigGroup):
+
+        @option
+        def baz(self):
+            return 1
+
+        @lazy_option(required=True, attrtype=int)
+        def bar(self):
+            calls.append('bar')
+            return 2
+
+        @lazy_option
+        def foo(self):
+            raise KeyError('foo')
+
+    test_config = TestConfig(None, None)
+    assert calls == []
+    assert test_config.as_kwargs == {'baz': 1}
+    assert test_config.bar == 2
+    assert test_config.bar == 2
+    assert calls == ['bar']
+    with pytest.raises(ValueError):
+        test_config.foo
+    with pytest.raises(TypeError):
+        test_config.bar = 3
+
+
+def test_config_invalid_backend(make_config):
+    with pytest.raises(ValueError, match='nonexistent'):
+        make_config(ONE_INSTANCE={
+            'backend': 'jobslib.oneinstance.nonexistent.NonexistentLock',
+        })
+
+
+@pytest.mark.parametrize('one_instance, match', [
+    ({'backend': 'jobslib.oneinstance.consul.NonexistentLock'},
+     'NonexistentLock'),
+    ({'backend': 'jobslib.oneinstance.consul.ConsulLock',
+      'options': {'key': 'jobs/example/lock', 'ttl': 5}},
+     'ttl'),
+])
+def test_config_validate(make_config, one_instance, match):
+    task_cls = TaskModuleMockClass.TaskClassMockClass
+    config = make_config(task_cls, ONE_INSTANCE=one_instance)
+    with pytest.raises(ValueError, match=match):
+        config.validate()
+    # task fails before the first iteration
+    with pytest.raises(ValueError, match=match):
+        task_cls(config)()
+
+
+def test_config_diff(make_config):
+    config = make_config(args={'run_once': False}, SLEEP_INTERVAL=10)
+    assert config.diff(config.reload()) == []
+
+    settings = config._settings
+    settings.SLEEP_INTERVAL = 20
+    settings.METRICS = {
+        'backend': 'jobslib.metrics.dummy.DummyMetrics',
+        'summary_interval': 60,
+    }
+    new_config = config.reload()
+    assert new_config.sleep_interval == 20
+    assert config.diff(new_config) == [
+        'metrics.summary_interval', 'sleep_interval']
+
+
 @pytest.mark.parametrize(
     'run_interval, sleep_interval',
     [(None, None), (300, None), (None, 300)]
@@ -0,0 +1,131 @@
+import os
+import sys
+
+import pytest
+
+from jobslib import BaseTask
+from jobslib.config import Config
+from jobslib.configcache import ConfigCache
+from jobslib.main import main
+from jobslib.metrics.dummy import DummyMetrics
+
+from .conftest import create_args_parser
+
+SETTINGS = '''
+ONE_INSTANCE = {
+    'backend': 'jobslib.oneinstance.dummy.DummyLock',
+}
+
+METRICS = {
+    'backend': 'jobslib.metrics.dummy.DummyMetrics',
+    'summary_quantiles': (0.5, 0.99),
+    'histogram_buckets': (0.1, 1.0),
+}
+
+SLEEP_INTERVAL = 5
+'''
+
+
+class Task(BaseTask):
+
+    name = 'cached'
+    configs = []
+
+    def task(self):
+        self.configs.append(self.context.config)
+
+
+@pytest.fixture
+def settings_module(tmp_path, monkeypatch):
+    (tmp_path / 'cached_settings.py').write_text(SETTINGS)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield 'cached_settings'
+    sys.modules.pop('cached_settings', None)
+
+
+def test_config_cache(tmp_path, settings_module, monkeypatch):
+    import cached_settings
+
+    cache = ConfigCache(str(tmp_path / 'cache'))
+    args_parser = create_args_parser()
+    config = Config(cached_settings, args_parser, Task)
+    assert cache.load(settings_module, args_parser, Task) is None
+    assert cache.store(config, settings_module, args_parser)
+
+    cached = cache.load(settings_module, args_parser, Task)
+    assert isinstance(cached, Config)
+    assert cached is not config
+    assert cached.sleep_interval == 5
+    assert cached.run_once is True
+    assert cached.task_class is Task
+    assert cached.logging == config.logging
+    assert cached.metrics.summary_quantiles == (0.5, 0.99)
+    assert cached.metrics.histogram_buckets == (0.1, 1.0)
+    assert cached.metrics.backend is DummyMetrics
+    assert cached.metrics.options.as_kwargs == config.metrics.options.as_kwargs
+
+    # Different arguments or environment
+    assert cache.load(
+        settings_module, create_args_parser(run_once=False), Task) is None
+    monkeypatch.setenv('JOBSLIB_SLEEP_INTERVAL', '10')
+    assert cache.load(settings_module, args_parser, Task) is None
+    monkeypatch.delenv('JOBSLIB_SLEEP_INTERVAL')
+    assert cache.load(settings_module, args_parser, Task) is not None
+
+    # Modified settings
+    path = cached_settings.__file__
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache.load(settings_module, args_parser, Task) is None
+
+
+def test_config_cache_main(tmp_path, settings_module, monkeypatch):
+    monkeypatch.setenv('JOBSLIB_CONFIG_CACHE', str(tmp_path / 'cache'))
+    args = ['-s', settings_module, '--run-once', __name__ + '.Task']
+    Task.configs = []
+
+    main(args)
+    assert settings_module in sys.modules
+    assert len(os.listdir(str(tmp_path / 'cache'))) == 1
+
+    sys.modules.pop(settings_module)
+    main(args)
+    # Settings module is not imported when config is cached
+    assert settings_module not in sys.modules
+    first, second = Task.configs
+    assert second.sleep_interval == first.sleep_interval == 5
+
+
+def test_config_cache_dependencies(tmp_path, monkeypatch):
+    (tmp_path / 'base_settings.py').write_text(
+        "SLEEP_INTERVAL = 5\nCONFIG_CACHE_ENVIRON = ['MYAPP_VALUE']\n")
+    (tmp_path / 'derived_settings.py').write_text(
+        'from base_settings import *  # noqa\n' + SETTINGS)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delenv('MYAPP_VALUE', raising=False)
+    cache = ConfigCache(str(tmp_path / 'cache'))
+    args_parser = create_args_parser()
+    try:
+        with cache.track_imports():
+            import derived_settings
+            config = Config(derived_settings, args_parser, Task)
+        assert cache.store(config, 'derived_settings', args_parser)
+        assert cache.load('derived_settings', args_parser, Task) is not None
+
+        # Unrelated environment variables don't invalidate snapshot
+        monkeypatch.setenv('UNRELATED_VALUE', '1')
+        assert cache.load('derived_settings', args_parser, Task) is not None
+        # Variables declared by settings do
+        monkeypatch.setenv('MYAPP_VALUE', '1')
+        assert cache.load('derived_settings', args_parser, Task) is None
+        monkeypatch.delenv('MYAPP_VALUE')
+        assert cache.load('derived_settings', args_parser, Task) is not None
+
+        # Modified module imported by settings
+        path = str(tmp_path / 'base_settings.py')
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert cache.load('derived_settings', args_parser, Task) is None
+    finally:
+        sys.modules.pop('derived_settings', None)
+        sys.modules.pop('base_settings', None)
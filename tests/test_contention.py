@@ -0,0 +1,82 @@
+
+import json
+
+import pytest
+
+from jobslib.main import main
+from jobslib.testing.contention import (
+    build_report, fairness_index, simulate_lock_contention)
+
+
+def test_fairness_index():
+    assert fairness_index([5, 5, 5, 5]) == 1.0
+    assert fairness_index([4, 0, 0, 0]) == 0.25
+    assert fairness_index([0, 0]) is None
+
+
+def test_build_report():
+    keys = ['a', 'b']
+    events = [
+        (0, 'a', 'acquired', 1.0, 0.01),
+        (1, 'b', 'acquired', 1.5, 0.01),
+        (2, 'a', 'failed', 1.6, 0.02),
+        (0, 'a', 'killed', 2.0, None),
+        (2, 'a', 'acquired', 3.0, 0.01),
+        (1, 'b', 'killed', 4.0, None),
+        (3, 'b', 'error', 4.5, 0.5),
+    ]
+    report = build_report(events, 4, keys, 10.0, time_scale=2.0)
+    assert report['attempts'] == 5
+    assert report['acquires'] == 3
+    assert report['errors'] == 1
+    assert report['kills'] == 2
+    assert report['acquire_rate'] == 0.3
+    assert report['failover']['count'] == 1
+    assert report['failover']['max'] == 2.0
+    assert report['failover']['unrecovered'] == 1
+    # key a: workers 0 and 2 acquired once, key b: only worker 1
+    assert report['fairness'] == pytest.approx((1.0 + 0.5) / 2)
+    assert report['acquires_per_worker'] == {'min': 0, 'max': 1}
+
+
+def test_simulate_lock_contention():
+    report = simulate_lock_contention(
+        workers=3, keys=1, duration=20, ttl=10, lock_delay=0, hold_time=1,
+        sleep_interval=1, kill_rate=0.5, time_scale=20, seed=1)
+    assert report['workers'] == 3
+    assert report['acquires'] > 0
+    assert report['attempts'] >= report['acquires']
+    assert report['server_requests'] > 0
+    assert report['failover']['count'] <= report['kills']
+    for value in report['failover']['p50'], report['failover']['max']:
+        # session of the killed holder expires after TTL
+        assert value is None or value >= (10 - 1) * 0.9
+
+
+@pytest.mark.parametrize('refresh', [True, False])
+def test_simulate_lock_contention_long_hold(refresh):
+    report = simulate_lock_contention(
+        workers=2, keys=1, duration=60, ttl=10, lock_delay=0, hold_time=25,
+        sleep_interval=1, refresh=refresh, time_scale=20, seed=1)
+    assert report['acquires'] > 0
+    if refresh:
+        # holder refreshes the lock, so it holds it longer than TTL
+        assert report['expirations'] == 0
+    else:
+        # watchdog interrupts holder after TTL
+        assert report['expirations'] > 0
+
+
+def test_simulate_lock_contention_invalid():
+    with pytest.raises(ValueError):
+        simulate_lock_contention(workers=0)
+
+
+def test_simulate_lock_contention_task(capsys):
+    main([
+        '--disable-one-instance', 'simulate-lock-contention', '--workers',
+        '2', '--duration', '5', '--time-scale', '10', '--format', 'json',
+    ])
+    report = json.loads(capsys.readouterr().out)
+    assert report['workers'] == 2
+    assert report['acquires'] > 0
@@ -0,0 +1,96 @@
+
+import time
+
+from unittest import mock
+
+import pytest
+
+from jobslib import BaseTask
+from jobslib.context import Context
+from jobslib.deadline import Deadline
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.time = 1000.0
+
+    def __call__(self):
+        return self.time
+
+
+def test_deadline():
+    clock = Clock()
+    deadline = Deadline(10.0, clock=clock)
+    assert deadline.remaining() == 10.0
+    assert deadline.timeout(5.0) == 5.0
+    assert deadline.timeout() == 10.0
+    assert deadline.expired() is False
+
+    clock.time += 8
+    assert deadline.timeout(5.0) == 2.0
+    clock.time += 5
+    assert deadline.remaining() == 0.0
+    assert deadline.expired() is True
+    assert deadline.timeout(5.0) == 0.5
+    assert deadline.timeout(5.0, minimum=0.1) == 0.1
+
+
+def test_deadline_never_expires():
+    deadline = Deadline()
+    assert deadline.remaining() is None
+    assert deadline.expired() is False
+    assert deadline.timeout(5.0) == 5.0
+    assert deadline.timeout() is None
+
+
+@pytest.mark.parametrize(
+    'iteration_timeout, run_interval, sleep_interval, expected',
+    [
+        (0, 0, 0, None),
+        (0, 60, 0, None),
+        (0, 60, 30, None),
+        (20, 60, 0, 20.0),
+        (20, 0, 30, 20.0),
+    ]
+)
+def test_context_reset_deadline(
+        make_config, iteration_timeout, run_interval, sleep_interval,
+        expected):
+    config = make_config(
+        args={
+            'run_once': False,
+            'run_interval': run_interval,
+            'sleep_interval': sleep_interval,
+        },
+        ITERATION_TIMEOUT=iteration_timeout)
+    context = Context(config)
+    assert context.deadline.remaining() is None
+    with mock.patch('time.monotonic', return_value=1000.0):
+        deadline = context.reset_deadline()
+        assert context.deadline is deadline
+        assert deadline.remaining() == expected
+    context.clear_deadline()
+    assert context.deadline.remaining() is None
+
+
+class SlowTask(BaseTask):
+
+    name = 'slow'
+
+    def task(self):
+        time.sleep(0.2)
+
+
+def test_bookkeeping_deadline(make_task):
+    task = make_task(
+        SlowTask, ITERATION_TIMEOUT=0.1, BOOKKEEPING_TIMEOUT=10)
+    deadlines = []
+
+    def write():
+        deadlines.append(task.context.deadline.remaining())
+
+    with mock.patch.object(task.context.liveness, 'write', write):
+        task()
+    # liveness gets a fresh window, although the iteration has overrun
+    assert 9.0 < deadlines[0] <= 10.0
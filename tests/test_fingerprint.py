@@ -0,0 +1,73 @@
+import os
+from unittest import mock
+
+import pytest
+
+from jobslib import BaseTask
+from jobslib.fingerprint import file_fingerprint, fingerprint
+
+
+def test_fingerprint():
+    assert fingerprint({'a': 1, 'b': [1, 2]}) == \
+        fingerprint({'b': [1, 2], 'a': 1})
+    assert fingerprint({'a': 1}) != fingerprint({'a': 2})
+
+
+def test_file_fingerprint(tmp_path):
+    path = tmp_path / 'source.txt'
+    assert file_fingerprint(path) == [[str(path), None, None]]
+    path.write_text('data')
+    os.utime(path, ns=(1, 1000))
+    assert file_fingerprint(path) == [[str(path), 1000, 4]]
+
+
+class ReportTask(BaseTask):
+
+    name = 'report'
+    fail = False
+
+    def initialize(self):
+        self.builds = 0
+
+    def task(self):
+        self.skip_if_unchanged(source=file_fingerprint(self.source))
+        self.builds += 1
+        if self.fail:
+            raise ValueError('Task failed')
+
+
+def run_task(make_task, tmp_path, fail=False):
+    task = make_task(
+        ReportTask, args={'sleep_interval': 1},
+        CHECKPOINT={
+            'backend': 'jobslib.checkpoint.sqlite.SQLiteCheckpoint',
+            'options': {'path': str(tmp_path / 'checkpoint.sqlite')},
+        })
+    task.source = tmp_path / 'source.txt'
+    task.fail = fail
+    with mock.patch.object(task.context.metrics, 'push') as m_push, \
+            mock.patch.object(task.context.liveness, 'write') as m_write:
+        task()
+    m_write.assert_called_once()
+    metrics_data = m_push.call_args[0][0]
+    return task.builds, metrics_data['job_duration_seconds']['tags']['status']
+
+
+def test_task_skips_unchanged_inputs(make_task, tmp_path):
+    source = tmp_path / 'source.txt'
+    source.write_text('first')
+    os.utime(source, ns=(1, 1000))
+    assert run_task(make_task, tmp_path) == (1, 'succeeded')
+    # memo is persisted, so task started again skips unchanged inputs
+    assert run_task(make_task, tmp_path) == (0, 'skipped')
+    os.utime(source, ns=(1, 2000))
+    assert run_task(make_task, tmp_path) == (1, 'succeeded')
+    assert run_task(make_task, tmp_path) == (0, 'skipped')
+
+
+def test_task_doesnt_memoize_failed_iteration(make_task, tmp_path):
+    source = tmp_path / 'source.txt'
+    source.write_text('first')
+    with pytest.raises(ValueError):
+        run_task(make_task, tmp_path, fail=True)
+    assert run_task(make_task, tmp_path) == (1, 'succeeded')
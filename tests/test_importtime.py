@@ -0,0 +1,97 @@
+import json
+import os
+import subprocess
+import sys
+
+SCRIPT = '''
+import json
+import sys
+
+from jobslib import BaseTask
+
+# jobslib is imported first, so its import time is measured as a whole
+from tests.conftest import create_config
+
+
+class Task(BaseTask):
+
+    name = 'example'
+
+
+config = create_config(
+    Task, args={'disable_one_instance': True},
+    ONE_INSTANCE={
+        'backend': 'jobslib.oneinstance.consul.ConsulLock',
+        'options': {'key': 'jobs/example/lock'},
+    },
+    LIVENESS={
+        'backend': 'jobslib.liveness.consul.ConsulLiveness',
+        'options': {'key': 'jobs/example/liveness'},
+    },
+    METRICS={
+        'backend': 'jobslib.metrics.influxdb.InfluxDBMetrics',
+        'options': {'database': 'example'},
+    })
+config.one_instance.backend
+print(json.dumps(sorted(sys.modules)))
+'''
+
+HEAVY_MODULES = ('consul', 'influxdb', 'requests')
+
+# Generous limit of the cumulative import time of the jobslib package in
+# microseconds, it catches only gross regressions.
+IMPORT_TIME_LIMIT = 1000000
+
+
+def parse_importtime(stderr):
+    """
+    Return :class:`!dict` of the cumulative import times in microseconds
+    from the ``python -X importtime`` output.
+    """
+    res = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        unused_self, cumulative, name = line[12:].split('|')
+        cumulative = cumulative.strip()
+        if cumulative.isdigit():
+            res[name.strip()] = int(cumulative)
+    return res
+
+
+def test_importtime():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))] +
+        [p for p in [env.get('PYTHONPATH')] if p])
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SCRIPT],
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, timeout=60)
+    assert proc.returncode == 0, proc.stderr
+    import_times = parse_importtime(proc.stderr)
+    modules = json.loads(proc.stdout)
+
+    assert import_times['jobslib'] < IMPORT_TIME_LIMIT
+    # Backends are configured, but they are not imported until they are
+    # used. One instance lock is dummy due to --disable-one-instance.
+    assert 'jobslib.oneinstance.dummy' in modules
+    for module in HEAVY_MODULES:
+        assert module not in modules, '{} has been imported'.format(module)
+
+
+def test_importtime_client():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.path.dirname(
+        os.path.dirname(os.path.abspath(__file__)))
+    script = (
+        'import json, sys, jobslib.client; '
+        'print(json.dumps(sorted(sys.modules)))')
+    proc = subprocess.run(
+        [sys.executable, '-c', script], env=env, stdout=subprocess.PIPE,
+        universal_newlines=True, timeout=60)
+    assert proc.returncode == 0
+    modules = json.loads(proc.stdout)
+    # Client imports only Python's standard library
+    assert 'jobslib.config' not in modules
+    assert 'objectvalidator' not in modules
@@ -0,0 +1,103 @@
+from unittest import mock
+
+import pytest
+
+from jobslib.deadline import Deadline
+from jobslib.liveness import BaseLiveness, CheckLiveness
+from jobslib.liveness.consul import ConsulLiveness
+from jobslib.testing.consul import FakeConsulServer
+
+
+class Liveness(BaseLiveness):
+
+    def __init__(self, record):
+        super().__init__(mock.Mock(fqdn='localhost'), None)
+        self.record = record
+
+    def write(self):
+        pass
+
+    def read(self):
+        return self.record
+
+
+@pytest.mark.parametrize(
+    'record, max_age, expected',
+    [
+        ({'timestamp': 1000}, 100, True),
+        ({'timestamp': 800}, 100, False),
+        ({'heartbeat': {'timestamp': 1000}}, 100, False),
+    ]
+)
+def test_check(record, max_age, expected):
+    liveness = Liveness(record)
+    with mock.patch('jobslib.liveness.get_current_time', return_value=1050):
+        assert liveness.check(max_age) is expected
+
+
+@pytest.mark.parametrize(
+    'record, max_age, expected',
+    [
+        ({'timestamp': 800}, 100, None),
+        ({'timestamp': 800, 'heartbeat': None}, 100, None),
+        ({'timestamp': 800, 'heartbeat': {'timestamp': 1000}}, 100, True),
+        ({'timestamp': 800, 'heartbeat': {'timestamp': 900}}, 100, False),
+    ]
+)
+def test_check_progress(record, max_age, expected):
+    liveness = Liveness(record)
+    with mock.patch('jobslib.liveness.get_current_time', return_value=1050):
+        assert liveness.check_progress(max_age) is expected
+
+
+@pytest.mark.parametrize(
+    'record, expected',
+    [
+        ({'timestamp': 1000}, 0),
+        ({'timestamp': 800}, 1),
+        # completion is older than max age, but running task is alive
+        ({'timestamp': 800, 'heartbeat': {'timestamp': 1000}}, 0),
+        ({'timestamp': 1000, 'heartbeat': {'timestamp': 900}}, 1),
+    ]
+)
+def test_check_liveness_task(make_task, capsys, record, expected):
+    task = make_task(
+        CheckLiveness, args={'max_age': 100, 'max_progress_age': 100})
+    task.context.__dict__['liveness'] = Liveness(record)
+    with mock.patch('jobslib.liveness.get_current_time', return_value=1050):
+        with pytest.raises(SystemExit) as exc_info:
+            task()
+    assert exc_info.value.code == expected
+    assert capsys.readouterr().out == ('FAIL\n' if expected else 'PASS\n')
+
+
+def test_consul_liveness():
+    with FakeConsulServer() as server:
+        host, port = server.address
+        options = ConsulLiveness.OptionsConfig(
+            {'host': host, 'port': port, 'key': 'jobs/test/liveness',
+             'retry_max_attempts': 2, 'retry_wait_multiplier': 1},
+            None)
+        context = mock.Mock(fqdn='localhost', deadline=Deadline())
+        liveness = ConsulLiveness(context, options)
+
+        with pytest.raises(KeyError):
+            liveness.read()
+
+        liveness.write()
+        record = liveness.read()
+        assert record['fqdn'] == 'localhost'
+        assert 'heartbeat' not in record
+
+        server.inject_fault(status=500, count=1)
+        liveness.heartbeat(progress=0.5, items=10)
+        record = liveness.read()
+        assert record['heartbeat']['progress'] == 0.5
+        assert record['heartbeat']['info'] == {'items': 10}
+        assert record['timestamp'] == liveness._state['timestamp']
+
+        # errors are logged, they don't fail the task
+        server.inject_fault(status=500, count=None)
+        liveness.write()
+        server.clear_faults()
+        assert liveness.read()['heartbeat']['progress'] == 0.5
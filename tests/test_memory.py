@@ -0,0 +1,47 @@
+import os
+import tracemalloc
+
+from jobslib.memory import MemoryTracker
+
+
+def test_memory_tracker(tmp_path):
+    leak = []
+    tracker = MemoryTracker(
+        2, top=3, dump_dir=str(tmp_path), dump_threshold=1024 * 1024)
+    tracker.start()
+    try:
+        assert tracker.iteration() == {}
+        # First snapshot is only a baseline
+        metrics = tracker.iteration({'type': 'task'})
+        assert metrics['memory_traced_bytes']['value'] > 0
+        assert metrics['memory_traced_bytes']['tags'] == {'type': 'task'}
+        assert 'memory_growth_bytes' not in metrics
+
+        leak.append(bytearray(2 * 1024 * 1024))
+        tracker.iteration()
+        metrics = tracker.iteration({'type': 'task'})
+    finally:
+        tracker.stop()
+    assert not tracemalloc.is_tracing()
+
+    growth = metrics['memory_growth_bytes']
+    assert len(growth) <= 3
+    assert growth[0]['value'] >= 2 * 1024 * 1024
+    assert growth[0]['tags']['site'].startswith(__file__)
+    dumps = os.listdir(str(tmp_path))
+    assert len(dumps) == 1
+    snapshot = tracemalloc.Snapshot.load(str(tmp_path / dumps[0]))
+    assert snapshot.traces
+
+
+def test_memory_tracker_keeps_foreign_tracing():
+    tracemalloc.start()
+    try:
+        tracker = MemoryTracker(1)
+        tracker.start()
+        tracker.iteration()
+        tracker.stop()
+        # Tracing has been enabled before the tracker started
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,254 @@
+import threading
+import time
+
+from unittest import mock
+
+import pytest
+import requests
+
+from jobslib.config import ConfigGroup, SpoolConfigMixin
+from jobslib.context import Context
+from jobslib.deadline import Deadline
+from jobslib.metrics import BaseMetrics, iter_metrics
+from jobslib.metrics.buffer import MetricsBuffer
+from jobslib.metrics.influxdb import InfluxDBMetrics
+from jobslib.metrics.registry import MetricsRegistry
+from jobslib.metrics.spool import MetricsSpool
+from jobslib.metrics.summary import QuantileSketch
+from jobslib.testing.influxdb import FakeInfluxDBServer
+
+
+def test_metrics_buffer_batches():
+    batches = []
+    buffer = MetricsBuffer(
+        batches.append, max_size=100, batch_size=3, flush_interval=60.0)
+    buffer.put(range(7))
+    assert buffer.flush(5.0)
+    buffer.close(5.0)
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+@pytest.mark.parametrize(
+    'overflow_policy, expected',
+    [
+        ('drop_oldest', [3, 4, 5]),
+        ('drop_newest', [0, 1, 2]),
+    ]
+)
+def test_metrics_buffer_overflow(overflow_policy, expected):
+    written = []
+    event = threading.Event()
+
+    def write(batch):
+        event.wait(5.0)
+        written.extend(batch)
+
+    buffer = MetricsBuffer(
+        write, max_size=3, batch_size=10, flush_interval=60.0,
+        overflow_policy=overflow_policy)
+    buffer.put(range(6))
+    assert buffer.dropped == 3
+    event.set()
+    buffer.close(5.0)
+    assert written == expected
+
+
+def test_metrics_buffer_overflow_block():
+    written = []
+    event = threading.Event()
+
+    def write(batch):
+        event.wait(5.0)
+        written.extend(batch)
+
+    buffer = MetricsBuffer(
+        write, max_size=2, batch_size=10, flush_interval=0.2,
+        overflow_policy='block')
+    start_time = time.monotonic()
+    buffer.put(range(12))
+    # put() waits at most flush_interval in total, not for each point
+    assert time.monotonic() - start_time < 1.0
+    assert buffer.dropped == 8
+    event.set()
+    buffer.close(5.0)
+    assert written == [0, 1, 2, 3]
+
+
+def test_metrics_buffer_write_error():
+    write = mock.Mock(side_effect=[Exception('Backend is down'), None])
+    buffer = MetricsBuffer(
+        write, max_size=100, batch_size=2, flush_interval=60.0)
+    buffer.put([1, 2, 3, 4])
+    buffer.close(5.0)
+    assert write.call_args_list == [mock.call([1, 2]), mock.call([3, 4])]
+
+
+def test_metrics_registry():
+    registry = MetricsRegistry()
+    registry.histogram_buckets = (2.5, 1)
+    registry.counter('items', {'queue': 'a'}).inc()
+    registry.counter('items', {'queue': 'a'}).inc(2)
+    registry.counter('items', {'queue': 'b'}).inc()
+    registry.gauge('size').set(10)
+    histogram = registry.histogram('latency')
+    for value in (3, 1, 2):
+        histogram.observe(value)
+
+    metrics = registry.collect({'job_duration_seconds': {'value': 1.0}})
+    assert metrics == {
+        'job_duration_seconds': {'value': 1.0},
+        'items': [
+            {'value': 3, 'tags': {'queue': 'a'}, 'type': 'counter'},
+            {'value': 1, 'tags': {'queue': 'b'}, 'type': 'counter'},
+        ],
+        'size': [{'value': 10, 'tags': {}, 'type': 'gauge'}],
+        'latency_count': [{'value': 3, 'tags': {}, 'type': 'counter'}],
+        'latency_sum': [{'value': 6.0, 'tags': {}, 'type': 'counter'}],
+        'latency_min': [{'value': 1, 'tags': {}, 'type': 'gauge'}],
+        'latency_max': [{'value': 3, 'tags': {}, 'type': 'gauge'}],
+        'latency_bucket': [
+            {'value': 1, 'tags': {'le': '1.0'}, 'type': 'counter'},
+            {'value': 2, 'tags': {'le': '2.5'}, 'type': 'counter'},
+            {'value': 3, 'tags': {'le': '+Inf'}, 'type': 'counter'},
+        ],
+    }
+    # Metrics are pushed only when they have been updated since the last
+    # push, gauges keep the last value
+    assert registry.collect() == {}
+    registry.gauge('size').inc()
+    assert registry.collect() == {
+        'size': [{'value': 11, 'tags': {}, 'type': 'gauge'}],
+    }
+
+
+def test_metrics_registry_timer():
+    registry = MetricsRegistry()
+    with registry.timer('duration'):
+        pass
+    with pytest.raises(TypeError):
+        registry.counter('duration')
+    metrics = registry.collect()
+    assert metrics['duration_count'][0]['value'] == 1
+    assert list(iter_metrics(metrics))[0][0] == 'duration_count'
+
+
+def test_quantile_sketch():
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    assert sketch.quantile(0.5) is None
+    for value in range(1, 10001):
+        sketch.add(value)
+    assert len(sketch) == 10000
+    for q in (0.5, 0.9, 0.99):
+        exact = q * 9999 + 1
+        assert abs(sketch.quantile(q) - exact) <= exact * 0.011
+    assert sketch.quantile(0) == 1
+    assert sketch.quantile(1) == 10000
+
+    other = QuantileSketch(relative_accuracy=0.01)
+    other.add(0)
+    sketch.merge(other)
+    assert sketch.count == 10001
+    assert sketch.quantile(0) == 0
+
+
+def test_metrics_registry_summary():
+    registry = MetricsRegistry()
+    registry.summary_interval = 60
+    registry.summary_quantiles = (0.5, 0.99)
+    summary = registry.timer('duration', {'status': 'succeeded'})
+    assert registry.summary('duration', {'status': 'succeeded'}) is summary
+    for value in range(1, 101):
+        summary.observe(value)
+
+    # Interval has not elapsed yet
+    assert registry.collect() == {}
+
+    metrics = registry.collect(force=True)
+    assert metrics['duration_count'] == [
+        {'value': 100, 'tags': {'status': 'succeeded'}, 'type': 'counter'}]
+    assert metrics['duration_sum'][0]['value'] == 5050
+    quantiles = {
+        item['tags']['quantile']: item['value']
+        for item in metrics['duration']
+    }
+    assert set(quantiles) == {'0.5', '0.99'}
+    assert abs(quantiles['0.5'] - 50.5) <= 1
+    assert abs(quantiles['0.99'] - 99) <= 1.5
+    assert registry.collect(force=True) == {}
+
+
+def test_metrics_spool(tmp_path):
+    spool = MetricsSpool(str(tmp_path), 'task', max_bytes=1000, batch_size=3)
+    spool.append([1, 2])
+    spool.append([3, 4])
+    spool.append([5])
+
+    write = mock.Mock(side_effect=[None, Exception('Backend is down')])
+    with pytest.raises(Exception):
+        spool.replay(write)
+    assert write.call_args_list == [mock.call([1, 2, 3, 4]), mock.call([5])]
+
+    batches = []
+    spool.replay(batches.append)
+    assert batches == [[5]]
+    assert len(spool) == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_metrics_spool_eviction(tmp_path):
+    spool = MetricsSpool(
+        str(tmp_path), 'task', max_bytes=20, segment_size=7)
+    for i in range(5):
+        spool.append([i, i])
+    assert spool.evicted == 3
+    batches = []
+    spool.replay(batches.append)
+    assert batches == [[3, 3], [4, 4]]
+
+
+def test_metrics_spool_backend(make_metrics, tmp_path):
+
+    class Metrics(BaseMetrics):
+
+        class OptionsConfig(SpoolConfigMixin, ConfigGroup):
+            spool_env_prefix = 'JOBSLIB_METRICS_TEST_'
+
+        def push(self, metrics):
+            self.send_points([metrics])
+
+        write_points = mock.Mock(
+            side_effect=[Exception('Backend is down'), None, None])
+
+    metrics = make_metrics(Metrics, spool_dir=str(tmp_path))
+    metrics.push(1)
+    metrics.push(2)
+    assert Metrics.write_points.call_args_list == [
+        mock.call([1]), mock.call([1, 2])]
+    metrics.push(3)
+    assert Metrics.write_points.call_args_list[-1] == mock.call([3])
+
+
+def test_influxdb_metrics_deadline(make_metrics):
+    with FakeInfluxDBServer() as server:
+        host, port = server.address
+        metrics = make_metrics(
+            InfluxDBMetrics, host=host, port=port, database='test')
+        metrics.context.deadline = Deadline(5.0)
+        request = requests.Session.request
+        with mock.patch.object(
+                requests.Session, 'request', autospec=True,
+                side_effect=request) as m_request:
+            assert metrics.push({'duration': {'value': 1.0}}) is True
+    # timeout of the request is trimmed by the iteration's deadline
+    timeout = m_request.call_args[1]['timeout']
+    assert 4.0 < timeout <= 5.0
+
+
+def test_context_close_flushes_metrics(make_config):
+    context = Context(make_config(BOOKKEEPING_TIMEOUT=2))
+    metrics = context.metrics
+    with mock.patch.object(metrics, 'close') as m_close:
+        context.close()
+    # Flush is bounded, unreachable backend doesn't block the exit
+    m_close.assert_called_once_with(2.0)
+    assert context.metrics is not metrics
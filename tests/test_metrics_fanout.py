@@ -0,0 +1,86 @@
+import socket
+import threading
+
+from unittest import mock
+
+from jobslib.deadline import Deadline
+from jobslib.metrics import BaseMetrics
+from jobslib.metrics.fanout import FanoutMetrics
+
+
+class RecordingMetrics(BaseMetrics):
+
+    def __init__(self, context, options):
+        super().__init__(context, options)
+        self.pushed = []
+
+    def push(self, metrics):
+        self.pushed.append(metrics)
+
+
+class BlockingMetrics(BaseMetrics):
+
+    event = threading.Event()
+
+    def push(self, metrics):
+        self.event.wait(5.0)
+
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def create_metrics():
+    settings = {
+        'destinations': [
+            {
+                'backend': 'tests.test_metrics_fanout.RecordingMetrics',
+            },
+            {
+                'name': 'blocking',
+                'backend': 'tests.test_metrics_fanout.BlockingMetrics',
+                'queue_size': 1,
+                'timeout': 0.1,
+            },
+            {
+                # InfluxDB is down, backend logs the error and reports it
+                'name': 'influxdb',
+                'backend': 'jobslib.metrics.influxdbline.InfluxDBLineMetrics',
+                'options': {
+                    'host': '127.0.0.1',
+                    'port': unused_port(),
+                    'database': 'test',
+                    'retry_max_attempts': 1,
+                    'circuit_breaker_threshold': 0,
+                },
+            },
+        ],
+    }
+    options = FanoutMetrics.OptionsConfig(settings, None)
+    return FanoutMetrics(mock.Mock(deadline=Deadline()), options)
+
+
+def test_fanout():
+    metrics = create_metrics()
+    recording, blocking, failing = metrics.destinations
+    assert recording.name == 'RecordingMetrics'
+    for i in range(3):
+        metrics.push({'metric': {'value': i}})
+    assert metrics.flush(1.0) is False
+    assert recording.backend.pushed == [
+        {'metric': {'value': i}} for i in range(3)]
+    assert failing.failed == 3
+    assert blocking.dropped >= 1
+
+    metrics.push({})
+    collected = metrics.registry.collect()
+    assert collected['metrics_fanout_failed'] == [
+        {'value': 3, 'tags': {'destination': 'influxdb'},
+         'type': 'counter'}]
+    assert collected['metrics_fanout_dropped'][0]['value'] >= 1
+
+    BlockingMetrics.event.set()
+    metrics.close()
+    assert blocking.slow >= 1
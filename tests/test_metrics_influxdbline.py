@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from jobslib.metrics.influxdbline import InfluxDBLineMetrics
+from jobslib.testing.influxdb import FakeInfluxDBServer
+
+
+@pytest.fixture
+def influxdb_server():
+    with FakeInfluxDBServer(udp=True) as server:
+        yield server
+
+
+@pytest.fixture
+def create_metrics(make_metrics):
+
+    def create_metrics(host, port, **options):
+        return make_metrics(
+            InfluxDBLineMetrics, host=host, port=port, username='root',
+            password='secret', database='testdb', retry_max_attempts=1,
+            **options)
+
+    return create_metrics
+
+
+METRICS = {
+    'job_duration_seconds': {
+        'value': 1.5,
+        'tags': {'status': 'succeeded', 'type': 'task'},
+    },
+    'processed items': {
+        'value': 2,
+        'tags': {'queue': 'a,b=c'},
+    },
+}
+
+
+def test_make_lines(create_metrics):
+    metrics = create_metrics('localhost', 8086)
+    assert metrics.make_lines(METRICS, timestamp=1) == [
+        'job_duration_seconds,status=succeeded,task=hello,type=task '
+        'value=1.5 1',
+        'processed\\ items,queue=a\\,b\\=c,task=hello value=2.0 1',
+    ]
+
+
+@pytest.mark.parametrize('gzip', [True, False])
+def test_push_http(create_metrics, influxdb_server, gzip):
+    metrics = create_metrics(*influxdb_server.address, gzip=gzip)
+    metrics.push(METRICS)
+    metrics.push(METRICS)
+    metrics.close()
+    assert influxdb_server.requests == 2
+    assert influxdb_server.connections == 1
+    assert influxdb_server.databases == {'testdb'}
+    assert len(influxdb_server.lines) == 4
+    timestamps = [int(line.rsplit(' ', 1)[1])
+                  for line in influxdb_server.lines]
+    assert timestamps[0] < timestamps[2]
+
+
+def test_push_udp(create_metrics, influxdb_server):
+    host, udp_port = influxdb_server.udp_address
+    metrics = create_metrics(host, 0, udp_port=udp_port)
+    metrics.push(METRICS)
+    metrics.close()
+    for _ in range(50):
+        if len(influxdb_server.lines) == 2:
+            break
+        time.sleep(0.1)
+    assert len(influxdb_server.lines) == 2
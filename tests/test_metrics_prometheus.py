@@ -0,0 +1,47 @@
+import urllib.request
+
+from jobslib.metrics.prometheus import PrometheusMetrics
+
+
+def test_textfile(make_metrics, tmp_path):
+    textfile = tmp_path / 'hello.prom'
+    metrics = make_metrics(PrometheusMetrics, textfile=str(textfile))
+    for _ in range(2):
+        metrics.push({
+            'job_duration_seconds': {
+                'value': 1.5,
+                'tags': {'status': 'succeeded'},
+            },
+            'processed_items': {
+                'value': 2,
+                'tags': {'queue': 'a"b'},
+                'type': 'counter',
+            },
+        })
+    assert textfile.read_text() == (
+        '# TYPE job_duration_seconds gauge\n'
+        'job_duration_seconds{status="succeeded",task="hello"} 1.5\n'
+        '# TYPE processed_items counter\n'
+        'processed_items{queue="a\\"b",task="hello"} 4.0\n'
+    )
+    assert [p.name for p in tmp_path.iterdir()] == ['hello.prom']
+
+
+def test_metrics_endpoint(make_metrics):
+    metrics = make_metrics(PrometheusMetrics, host='127.0.0.1', port=0)
+    try:
+        metrics.push({
+            'processed_items': {'value': 3, 'type': 'counter'},
+        })
+        url = 'http://{}:{}/metrics'.format(*metrics.server_address)
+        with urllib.request.urlopen(url, timeout=5.0) as response:
+            content_type = response.headers['Content-Type']
+            body = response.read().decode('utf-8')
+    finally:
+        metrics.close()
+    assert content_type.startswith('application/openmetrics-text')
+    assert body == (
+        '# TYPE processed_items counter\n'
+        'processed_items_total{task="hello"} 3.0\n'
+        '# EOF\n'
+    )
@@ -0,0 +1,86 @@
+import socket
+
+import pytest
+
+from jobslib.metrics.statsd import StatsdMetrics
+
+
+@pytest.fixture
+def statsd_server():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.settimeout(5.0)
+    yield sock
+    sock.close()
+
+
+@pytest.fixture
+def create_metrics(make_metrics):
+
+    def create_metrics(port, **options):
+        return make_metrics(
+            StatsdMetrics, host='127.0.0.1', port=port, **options)
+
+    return create_metrics
+
+
+def test_push(create_metrics, statsd_server):
+    metrics = create_metrics(statsd_server.getsockname()[1], prefix='jobs.')
+    metrics.push({
+        'job_duration_seconds': {
+            'value': 1.5,
+            'tags': {'status': 'succeeded'},
+        },
+        'processed_items': {'value': 2, 'type': 'counter'},
+        'balance': {'value': -3},
+    })
+    metrics.close()
+    assert statsd_server.recv(65535).decode('utf-8').split('\n') == [
+        'jobs.job_duration_seconds:1.5|g|#status:succeeded,task:hello',
+        'jobs.processed_items:2|c|#task:hello',
+        'jobs.balance:0|g|#task:hello',
+        'jobs.balance:-3|g|#task:hello',
+    ]
+
+
+def test_push_telegraf(create_metrics, statsd_server):
+    metrics = create_metrics(
+        statsd_server.getsockname()[1], tags_format='telegraf')
+    metrics.push({
+        'processed_items': {'value': 2, 'tags': {'queue': 'a:b'}},
+    })
+    metrics.close()
+    assert statsd_server.recv(65535) == \
+        b'processed_items,queue=a_b,task=hello:2|g'
+
+
+def test_packets_size(create_metrics, caplog):
+    metrics = create_metrics(8125, max_packet_size=64)
+    data = {'metric_{}'.format(i): {'value': i} for i in range(10)}
+    data['oversize'] = {'value': 1, 'tags': {'path': 'x' * 64}}
+    packets = metrics.format_packets(data)
+    assert len(packets) > 1
+    assert all(len(packet) <= 64 for packet in packets)
+    lines = b'\n'.join(packets).split(b'\n')
+    assert lines[0] == b'metric_0:0|g|#task:hello'
+    # line which doesn't fit into datagram is dropped
+    assert len(lines) == 10
+    assert 'oversize metric is longer than 64 bytes' in caplog.text
+
+
+def test_push_unreachable(create_metrics, caplog):
+    metrics = create_metrics(9)
+    results = []
+    sockets = set()
+    for _ in range(3):
+        results.append(metrics.push({'processed_items': {'value': 1}}))
+        sockets.add(id(metrics._socket))
+    metrics.close()
+    # Datagrams are fire-and-forget, refused one is reported by the next
+    # send, which fails with logged warning
+    assert results[0] is True
+    assert False in results
+    assert caplog.text.count("Can't send StatsD datagram") == \
+        results.count(False)
+    # Socket is reused
+    assert len(sockets) == 1
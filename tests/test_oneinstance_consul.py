@@ -0,0 +1,132 @@
+
+import signal
+from unittest import mock
+
+import pytest
+
+from jobslib.deadline import Deadline
+from jobslib.oneinstance import OneInstanceWatchdogError
+from jobslib.oneinstance.consul import ConsulLock
+from jobslib.testing.consul import FakeConsulServer
+
+
+@pytest.fixture
+def server():
+    with FakeConsulServer() as server:
+        yield server
+
+
+@pytest.fixture
+def create_lock(server):
+    def _create_lock(fqdn='localhost', **settings):
+        host, port = server.address
+        settings.setdefault('key', 'jobs/test/lock')
+        settings.setdefault('lock_delay', 0)
+        settings.update(host=host, port=port)
+        context = mock.Mock(fqdn=fqdn, deadline=Deadline())
+        lock = ConsulLock(context, ConsulLock.OptionsConfig(settings, None))
+        return lock
+
+    yield _create_lock
+    # Cancel watchdog of the locks which have not been released
+    signal.alarm(0)
+    signal.signal(signal.SIGALRM, signal.SIG_DFL)
+
+
+def test_acquire_release(server, create_lock):
+    lock = create_lock(fqdn='host1')
+    assert lock.acquire() is True
+    assert signal.getsignal(signal.SIGALRM) == lock._alarm_handler
+    assert lock.get_lock_owner_info()['fqdn'] == 'host1'
+    assert server.kv['jobs/test/lock']['Session'] == lock._session_id
+
+    assert lock.release() is True
+    assert signal.getsignal(signal.SIGALRM) == signal.SIG_DFL
+    assert server.kv['jobs/test/lock']['Session'] is None
+
+
+def test_contention(server, create_lock):
+    lock1 = create_lock(fqdn='host1')
+    lock2 = create_lock(fqdn='host2')
+    assert lock1.acquire() is True
+    assert lock2.acquire() is False
+    # session of the unsuccessful attempt is destroyed
+    assert list(server.sessions) == [lock1._session_id]
+    assert lock2.get_lock_owner_info()['fqdn'] == 'host1'
+
+    assert lock1.release() is True
+    assert lock2.acquire() is True
+    assert lock1.get_lock_owner_info()['fqdn'] == 'host2'
+    assert lock2.release() is True
+
+
+def test_failover(server, create_lock):
+    lock1 = create_lock(fqdn='host1', lock_delay=5)
+    lock2 = create_lock(fqdn='host2')
+    assert lock1.acquire() is True
+    server.expire_session(lock1._session_id)
+    # lock delay of the expired session prevents immediate failover
+    assert lock2.acquire() is False
+    server.kv['jobs/test/lock']['LockDelayUntil'] = 0
+    assert lock2.acquire() is True
+    assert lock2.get_lock_owner_info()['fqdn'] == 'host2'
+    assert lock2.release() is True
+
+
+def test_acquire_retry(server, create_lock):
+    lock = create_lock(retry_max_attempts=3, retry_wait_multiplier=1)
+    server.inject_fault(status=500, count=2, path='/v1/session/create')
+    server.inject_fault(status=None, count=1, path='/v1/kv/')
+    assert lock.acquire() is True
+    assert lock.release() is True
+
+
+def test_refresh(server, create_lock):
+    lock = create_lock(ttl=10)
+    assert lock.acquire() is True
+    session = server.sessions[lock._session_id]
+    expires_at = session['ExpiresAt']
+    assert lock.refresh() is True
+    with mock.patch('signal.alarm') as alarm:
+        lock._alarm_handler(signal.SIGALRM, None)
+    alarm.assert_called_once_with(10)
+    assert session['ExpiresAt'] > expires_at
+    assert lock._refresh_lock_flag is False
+    assert lock.release() is True
+
+
+def test_refresh_open_circuit(server, create_lock):
+    lock = create_lock(ttl=10)
+    assert lock.acquire() is True
+    # circuit of the Consul agent is opened by failures of the other calls
+    breaker = lock._circuit_breaker
+    for unused_i in range(breaker.failure_threshold):
+        breaker.on_failure()
+    assert breaker.state == 'open'
+    assert lock.refresh() is True
+    with mock.patch('signal.alarm') as alarm:
+        lock._alarm_handler(signal.SIGALRM, None)
+    alarm.assert_called_once_with(10)
+    breaker.on_success()
+    assert lock.release() is True
+
+
+def test_renew_retries_until_lock_delay(server, create_lock):
+    lock = create_lock(lock_delay=1, retry_wait_multiplier=20)
+    assert lock.acquire() is True
+    # retries wait 40, 80 and 160 ms, lock_delay is 1 second
+    server.inject_fault(status=500, count=3, path='/v1/session/renew')
+    assert lock.renew() is True
+    assert lock.release() is True
+
+
+def test_refresh_expired_session(server, create_lock):
+    lock = create_lock()
+    assert lock.acquire() is True
+    server.expire_session(lock._session_id)
+    assert lock.refresh() is True
+    with pytest.raises(OneInstanceWatchdogError):
+        lock._alarm_handler(signal.SIGALRM, None)
+    # lock without refresh request is not extended
+    with pytest.raises(OneInstanceWatchdogError):
+        create_lock()._alarm_handler(signal.SIGALRM, None)
@@ -0,0 +1,196 @@
+
+import concurrent.futures
+import threading
+from unittest import mock
+
+import pytest
+
+from jobslib import QueueTask
+from jobslib.deadline import Deadline
+from jobslib.exceptions import Terminate
+from jobslib.queue.consul import ConsulQueue
+from jobslib.queue.sqlite import SQLiteQueue
+from jobslib.testing.consul import FakeConsulServer
+
+
+def create_sqlite_queue(path, **options):
+    options['path'] = str(path)
+    context = mock.Mock(fqdn='localhost', deadline=Deadline())
+    return SQLiteQueue(context, SQLiteQueue.OptionsConfig(options, None))
+
+
+@pytest.fixture
+def create_task(make_task, tmp_path):
+    def create(task_cls, **queue_settings):
+        return make_task(task_cls, QUEUE=dict({
+            'backend': 'jobslib.queue.sqlite.SQLiteQueue',
+            'options': {'path': str(tmp_path / 'queue.sqlite')},
+            'batch_size': 3,
+            'workers': 2,
+        }, **queue_settings))
+    return create
+
+
+class SquareTask(QueueTask):
+
+    name = 'square'
+
+    def initialize(self):
+        self.results = []
+        self.results_lock = threading.Lock()
+
+    def process(self, item):
+        if item.value < 0:
+            raise ValueError(item.value)
+        with self.results_lock:
+            self.results.append(item.value ** 2)
+
+
+class ProcessSquareTask(QueueTask):
+
+    name = 'process-square'
+
+    @staticmethod
+    def process(item):
+        if item.value < 0:
+            raise ValueError(item.value)
+
+
+def test_sqlite_queue(tmp_path):
+    queue = create_sqlite_queue(tmp_path / 'queue.sqlite')
+    other = create_sqlite_queue(tmp_path / 'queue.sqlite')
+    queue.put({'n': 1}, {'n': 2}, {'n': 3})
+    assert queue.size() == 3
+
+    items = queue.fetch(2)
+    assert [item.value for item in items] == [{'n': 1}, {'n': 2}]
+    # leased items are invisible for the other consumers
+    assert [item.value for item in other.fetch(10)] == [{'n': 3}]
+    assert other.fetch(10) == []
+
+    queue.ack(items[0])
+    queue.nack(items[1])
+    assert [item.value for item in other.fetch(10)] == [{'n': 2}]
+    assert queue.size() == 2
+    queue.close()
+    other.close()
+
+
+def test_sqlite_queue_visibility_timeout(tmp_path):
+    queue = create_sqlite_queue(
+        tmp_path / 'queue.sqlite', visibility_timeout=10)
+    queue.put('a')
+    with mock.patch('time.time', return_value=1000.0):
+        assert len(queue.fetch(1)) == 1
+    with mock.patch('time.time', return_value=1005.0):
+        assert queue.fetch(1) == []
+    with mock.patch('time.time', return_value=1010.0):
+        assert [item.value for item in queue.fetch(1)] == ['a']
+
+
+def test_consul_queue():
+    with FakeConsulServer() as server:
+        host, port = server.address
+        options = ConsulQueue.OptionsConfig(
+            {'host': host, 'port': port, 'key': 'jobs/test/queue/'}, None)
+        context = mock.Mock(fqdn='localhost', deadline=Deadline())
+        queue = ConsulQueue(context, options)
+        other = ConsulQueue(context, options)
+
+        queue.put(*range(70))
+        items = queue.fetch(5)
+        assert [item.value for item in items] == [0, 1, 2, 3, 4]
+        assert [item.value for item in other.fetch(2)] == [5, 6]
+
+        queue.ack(items[0])
+        queue.nack(items[1])
+        assert [item.value for item in other.fetch(1)] == [1]
+        assert 'jobs/test/queue/items/{}'.format(items[0].id) not in server.kv
+        assert len([k for k in server.kv if '/items/' in k]) == 69
+
+        # expired lease is taken over
+        with mock.patch('time.time', return_value=4102444800.0):
+            assert [item.value for item in other.fetch(3)] == [1, 2, 3]
+
+
+@pytest.mark.parametrize('prefetch', [True, False])
+def test_queue_task(create_task, prefetch):
+    task = create_task(SquareTask, prefetch=prefetch)
+    queue = task.context.queue
+    queue.put(*range(1, 8), -1)
+    lock = task.context.one_instance_lock
+    with mock.patch.object(lock, 'refresh') as m_refresh:
+        task.task()
+    assert sorted(task.results) == [n ** 2 for n in range(1, 8)]
+    # lock is refreshed once after each of three batches
+    assert m_refresh.call_count == 3
+    # failed item stays in the queue
+    assert queue.size() == 1
+
+    metrics = task.context.metrics.registry.collect()
+    items = {
+        item['tags']['status']: item['value']
+        for item in metrics['queue_items']
+    }
+    assert items == {'processed': 7, 'failed': 1}
+    assert metrics['queue_items_per_second'][0]['value'] > 0
+    assert metrics['queue_batch_seconds_count'][0]['value'] == 3
+
+
+def test_queue_task_deadline(create_task):
+    task = create_task(SquareTask)
+    task.context.queue.put(*range(10))
+    task.context.deadline = mock.Mock(**{'expired.return_value': True})
+    task.task()
+    # one batch is processed, prefetched batch is released
+    assert len(task.results) == 3
+    assert task.context.queue.size() == 7
+    assert len(task.context.queue.fetch(10)) == 7
+
+
+def test_queue_task_process_pool(create_task):
+    task = create_task(ProcessSquareTask, pool='process')
+    task.context.queue.put(1, 2, -1)
+    task()
+    assert task.context.queue.size() == 1
+
+    task = create_task(SquareTask, pool='process')
+    with pytest.raises(TypeError):
+        task.task()
+
+
+class CompatThreadPoolExecutor(concurrent.futures.ThreadPoolExecutor):
+    """
+    Executor with signature of the Python < 3.9 :meth:`shutdown`.
+    """
+
+    def shutdown(self, wait=True):
+        super().shutdown(wait)
+
+
+def test_queue_task_cancels_pending_items(create_task):
+    task = create_task(SquareTask, workers=1)
+    task.context.queue.put(1, 2, 3)
+    release = threading.Event()
+    process = task.process
+
+    def slow_process(item):
+        if item.value > 1:
+            release.wait(5)
+        process(item)
+
+    def ack(item):
+        # second item is running or pending, third one is pending
+        threading.Timer(0.2, release.set).start()
+        raise Terminate
+
+    with mock.patch.object(task, 'process', slow_process), \
+            mock.patch.object(task, 'ack', ack), \
+            mock.patch.object(
+                task, '_create_pool',
+                lambda config: CompatThreadPoolExecutor(max_workers=1)):
+        with pytest.raises(Terminate):
+            task.task()
+    # pending item has been cancelled
+    assert 1 in task.results
+    assert 9 not in task.results
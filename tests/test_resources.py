@@ -0,0 +1,32 @@
+import gc
+
+import pytest
+
+from jobslib.resources import ResourceUsage
+
+
+def test_resource_usage():
+    usage = ResourceUsage()
+    usage.start()
+    sum(i * i for i in range(100000))
+    gc.collect()
+    metrics = usage.stop(tags={'status': 'succeeded'})
+    assert usage._gc_callback not in gc.callbacks
+
+    assert metrics['process_cpu_user_seconds']['value'] >= 0
+    assert metrics['process_cpu_user_seconds']['type'] == 'counter'
+    assert metrics['process_cpu_user_seconds']['tags'] == {
+        'status': 'succeeded'}
+    assert metrics['process_max_rss_bytes']['value'] > 0
+    assert metrics['process_max_rss_bytes']['type'] == 'gauge'
+    collections = {
+        item['tags']['generation']: item['value']
+        for item in metrics['gc_collections']
+    }
+    assert collections['2'] >= 1
+    assert metrics['gc_pause_seconds']['value'] > 0
+
+
+def test_resource_usage_not_started():
+    with pytest.raises(RuntimeError):
+        ResourceUsage().stop()
@@ -0,0 +1,225 @@
+
+from unittest import mock
+
+import pytest
+from consul.base import ACLPermissionDenied, ConsulException
+
+from jobslib.deadline import Deadline
+from jobslib.retry import (
+    CircuitBreaker, CircuitOpenError, RetryBudget, collect_metrics,
+    get_circuit_breaker, is_endpoint_failure, retry)
+from jobslib.metrics.influxdbline import InfluxDBWriteError
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.time = 1000.0
+
+    def __call__(self):
+        return self.time
+
+
+def failing(calls):
+    def func():
+        calls.append(1)
+        raise ConnectionError('Connection refused')
+    return func
+
+
+def test_retry_budget():
+    budget = RetryBudget(ratio=0.5, capacity=2)
+    assert budget.withdraw() is True
+    assert budget.withdraw() is True
+    assert budget.withdraw() is False
+    budget.deposit()
+    assert budget.withdraw() is False
+    budget.deposit()
+    assert budget.withdraw() is True
+    for unused_i in range(10):
+        budget.deposit()
+    assert budget.tokens == 2
+
+
+def test_circuit_breaker_retry():
+    breaker = CircuitBreaker('test', failure_threshold=0)
+    results = [ConnectionError('Connection refused'), 'ok']
+
+    def func(value):
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return value + result
+
+    with mock.patch('time.sleep') as sleep:
+        assert breaker.call(
+            func, 'is ', max_attempts=3, wait_multiplier=50) == 'is ok'
+    sleep.assert_called_once_with(0.1)
+    assert breaker.retries == 1
+
+
+def test_circuit_breaker_retry_budget_exhausted():
+    breaker = CircuitBreaker(
+        'test', failure_threshold=0, budget_ratio=0.1, budget_capacity=2)
+    calls = []
+    with mock.patch('time.sleep'):
+        with pytest.raises(ConnectionError):
+            breaker.call(failing(calls), max_attempts=10)
+    # one attempt and two retries from the budget
+    assert len(calls) == 3
+    assert breaker.budget_exhausted == 1
+
+    calls.clear()
+    with mock.patch('time.sleep'):
+        with pytest.raises(ConnectionError):
+            breaker.call(failing(calls), max_attempts=10)
+    assert len(calls) == 1
+
+
+def test_circuit_breaker_open():
+    clock = Clock()
+    breaker = CircuitBreaker(
+        'test', failure_threshold=3, reset_timeout=30.0, clock=clock)
+    calls = []
+    with mock.patch('time.sleep'):
+        with pytest.raises(ConnectionError):
+            breaker.call(failing(calls), max_attempts=10)
+    # circuit is opened after the third failure, retries are stopped
+    assert len(calls) == 3
+    assert breaker.state == 'open'
+
+    with pytest.raises(CircuitOpenError):
+        breaker.call(failing(calls), max_attempts=10)
+    assert len(calls) == 3
+
+    # probe fails, circuit is opened again
+    clock.time += 30
+    with pytest.raises(ConnectionError):
+        breaker.call(failing(calls), max_attempts=10)
+    assert len(calls) == 4
+    assert breaker.state == 'open'
+
+    # probe succeeds, circuit is closed
+    clock.time += 30
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.state == 'closed'
+    assert breaker.call(lambda: 'ok') == 'ok'
+
+
+@pytest.mark.parametrize('exc, failure', [
+    (ConnectionError('Connection refused'), True),
+    (ConsulException('500 Internal Server Error'), True),
+    (InfluxDBWriteError('Service Unavailable', 503), True),
+    (ACLPermissionDenied('Permission denied'), False),
+    (InfluxDBWriteError('Bad Request', 400), False),
+])
+def test_is_endpoint_failure(exc, failure):
+    assert is_endpoint_failure(exc) is failure
+
+
+def test_circuit_breaker_client_error():
+    breaker = CircuitBreaker('test', failure_threshold=1)
+    calls = []
+
+    def func():
+        calls.append(1)
+        raise ACLPermissionDenied('Permission denied')
+
+    # client error is neither retried nor counted as failure
+    with pytest.raises(ACLPermissionDenied):
+        breaker.call(func, max_attempts=3)
+    assert len(calls) == 1
+    assert breaker.state == 'closed'
+    assert breaker.call_failures == 0
+
+
+def test_retry():
+    results = [ConnectionError('Connection refused'), 'ok']
+
+    def func():
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    with mock.patch('time.sleep') as sleep:
+        assert retry(func, max_attempts=2, wait_multiplier=50) == 'ok'
+    sleep.assert_called_once_with(0.1)
+    # client error is not retried
+    with pytest.raises(ACLPermissionDenied):
+        retry(mock.Mock(side_effect=ACLPermissionDenied('denied')),
+              max_attempts=2)
+
+
+def test_circuit_breaker_half_open():
+    clock = Clock()
+    breaker = CircuitBreaker(
+        'test', failure_threshold=1, reset_timeout=30.0, clock=clock)
+    with pytest.raises(ConnectionError):
+        breaker.call(failing([]))
+    clock.time += 30
+    breaker.before_call()
+    assert breaker.state == 'half_open'
+    # only one probe is let through
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.on_success()
+    assert breaker.state == 'closed'
+
+
+def test_circuit_breaker_metrics():
+    breaker = get_circuit_breaker('http://test-metrics:8500')
+    assert get_circuit_breaker('http://test-metrics:8500') is breaker
+    breaker.call(lambda: None)
+
+    metrics = collect_metrics()
+    states = {
+        item['tags']['endpoint']: item['value']
+        for item in metrics['circuit_breaker_state']
+    }
+    assert states['http://test-metrics:8500'] == 0
+    calls = {
+        item['tags']['endpoint']: item['value']
+        for item in metrics['backend_calls']
+    }
+    assert calls['http://test-metrics:8500'] == 1
+
+    metrics = breaker.collect_metrics()
+    assert metrics['backend_calls']['value'] == 0
+    assert metrics['backend_calls']['type'] == 'counter'
+
+
+def test_circuit_breaker_deadline():
+    clock = Clock()
+    deadline = Deadline(1.0, clock=clock)
+    breaker = CircuitBreaker('test', failure_threshold=0)
+    calls = []
+    with mock.patch('time.sleep') as sleep:
+        sleep.side_effect = lambda seconds: setattr(
+            clock, 'time', clock.time + seconds)
+        with pytest.raises(ConnectionError):
+            breaker.call(
+                failing(calls), max_attempts=10, wait_multiplier=100,
+                deadline=deadline)
+    # waits 0.2 and 0.4 seconds, third wait (0.8 s) exceeds the deadline
+    assert len(calls) == 3
+
+
+def test_circuit_breaker_metrics_interval():
+    clock = Clock()
+    breaker = CircuitBreaker('test', failure_threshold=1, clock=clock)
+    breaker.call(lambda: None)
+    assert breaker.collect_metrics(60)['backend_calls']['value'] == 1
+
+    # Unchanged state is not pushed until interval elapses
+    breaker.call(lambda: None)
+    assert breaker.collect_metrics(60) == {}
+    clock.time += 60
+    assert breaker.collect_metrics(60)['backend_calls']['value'] == 1
+
+    # Changed state is pushed immediately
+    with pytest.raises(ConnectionError):
+        breaker.call(failing([]))
+    metrics = breaker.collect_metrics(60)
+    assert metrics['circuit_breaker_state']['value'] == 2
+    assert metrics['backend_call_failures']['value'] == 1
@@ -0,0 +1,118 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from jobslib import BaseTask, Context
+from jobslib.client import client_main
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class EchoTask(BaseTask):
+
+    name = 'echo'
+
+    def task(self):
+        self.stdout.write('value={}\n'.format(
+            os.environ.get('JOBSLIB_TEST_VALUE')))
+        self.stdout.flush()
+        self.stderr.write('pid={}\n'.format(os.getpid()))
+        self.stderr.flush()
+
+
+class FailingTask(BaseTask):
+
+    name = 'failing'
+
+    def task(self):
+        raise Exception('Task failed')
+
+
+class ClosingContext(Context):
+
+    def close(self):
+        super().close()
+        sys.stderr.write('context closed\n')
+        sys.stderr.flush()
+
+
+# Module is used as a settings module of the tasks as well
+CONTEXT_CLASS = __name__ + '.ClosingContext'
+
+
+@pytest.fixture
+def server(tmp_path):
+    socket_path = str(tmp_path / 'jobslib.sock')
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR)
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'jobslib.server', '--socket', socket_path,
+         '--no-default-preload', '--preload', __name__],
+        cwd=ROOT_DIR, env=env)
+    try:
+        deadline = time.monotonic() + 30
+        while not os.path.exists(socket_path):
+            assert proc.poll() is None, 'Server has exited'
+            assert time.monotonic() < deadline, 'Server has not started'
+            time.sleep(0.05)
+        yield socket_path
+    finally:
+        proc.terminate()
+        proc.wait(10)
+    assert not os.path.exists(socket_path)
+
+
+def run_client(args):
+    with pytest.raises(SystemExit) as exc_info:
+        client_main(args)
+    return exc_info.value.code
+
+
+def test_server(server, capfd, monkeypatch):
+    monkeypatch.setenv('JOBSLIB_TEST_VALUE', 'foo')
+    code = run_client([
+        '--socket', server, '--disable-one-instance', '--run-once',
+        __name__ + '.EchoTask'])
+    out, err = capfd.readouterr()
+    assert code == 0
+    assert out == 'value=foo\n'
+    # Task is run in the forked process
+    assert 'pid={}\n'.format(os.getpid()) not in err
+    assert 'pid=' in err
+
+    code = run_client([
+        '--socket', server, '--disable-one-instance', '--run-once',
+        __name__ + '.FailingTask'])
+    out, err = capfd.readouterr()
+    assert code == 1
+    assert 'Exception: Task failed' in err
+
+
+def test_server_closes_context(server, capfd):
+    for task_cls, expected_code in [('EchoTask', 0), ('FailingTask', 1)]:
+        code = run_client([
+            '--socket', server, '--settings', __name__,
+            '--disable-one-instance', '--run-once',
+            '{}.{}'.format(__name__, task_cls)])
+        out, err = capfd.readouterr()
+        assert code == expected_code
+        # Task process closes context before it exits
+        assert 'context closed\n' in err
+
+
+def test_client_without_server(tmp_path, capfd):
+    code = run_client([
+        '--socket', str(tmp_path / 'nonexistent.sock'),
+        '--disable-one-instance', '--run-once', __name__ + '.EchoTask'])
+    out, err = capfd.readouterr()
+    assert code == 0
+    assert out == 'value=None\n'
+    assert 'pid={}\n'.format(os.getpid()) in err
+
+
+def test_client_socket_without_path(capfd):
+    assert run_client(['--socket']) == 2
+    out, err = capfd.readouterr()
+    assert 'argument --socket: expected one argument' in err
@@ -0,0 +1,204 @@
+import gc
+import os
+import signal
+import threading
+import time
+
+from unittest import mock
+
+import pytest
+
+from jobslib import BaseTask
+from jobslib.exceptions import Terminate
+
+
+class HeartbeatTask(BaseTask):
+
+    name = 'heartbeat'
+
+    def task(self):
+        self.heartbeat(progress=0.5, item=1)
+        self.heartbeat(progress=1.0, item=2)
+
+
+def test_heartbeat(make_task):
+    task = make_task(HeartbeatTask, HEARTBEAT_INTERVAL=60)
+    liveness = task.context.liveness
+    lock = task.context.one_instance_lock
+    with mock.patch.object(liveness, 'heartbeat') as m_heartbeat, \
+            mock.patch.object(liveness, 'write') as m_write, \
+            mock.patch.object(lock, 'refresh') as m_refresh:
+        task()
+    # Second heartbeat is skipped due to rate-limiting
+    m_heartbeat.assert_called_once_with(0.5, item=1)
+    m_refresh.assert_called_once_with()
+    m_write.assert_called_once_with()
+
+
+def test_concurrent_bookkeeping(make_task):
+    task = make_task(HeartbeatTask, HEARTBEAT_INTERVAL=60)
+    liveness = task.context.liveness
+    lock = task.context.one_instance_lock
+    # Both calls must be in progress at the same time to pass the barrier
+    barrier = threading.Barrier(2, timeout=5)
+    done = []
+
+    def wait(name):
+        barrier.wait()
+        done.append(name)
+
+    with mock.patch.object(liveness, 'write', lambda: wait('liveness')), \
+            mock.patch.object(lock, 'release', lambda: wait('lock')):
+        task()
+    assert sorted(done) == ['liveness', 'lock']
+    # Executor is shut down when the task finishes
+    assert task._executor is None
+
+
+@pytest.mark.parametrize('write', [
+    lambda: False,
+    mock.Mock(side_effect=ValueError('Consul is down')),
+])
+def test_liveness_failure_fails_iteration(make_task, write):
+    task = make_task(HeartbeatTask, HEARTBEAT_INTERVAL=60)
+    metrics = task.context.metrics
+    with mock.patch.object(task.context.liveness, 'write', write), \
+            mock.patch.object(metrics, 'push') as m_push:
+        with pytest.raises(Exception):
+            task()
+    metrics_data = m_push.call_args[0][0]
+    assert metrics_data['job_duration_seconds']['tags']['status'] == 'failed'
+
+
+class CountingTask(BaseTask):
+
+    name = 'counting'
+
+    def initialize(self):
+        self.iterations = 0
+
+    def task(self):
+        self.iterations += 1
+        if self.iterations == 3:
+            raise Terminate
+
+
+def test_pending_bookkeeping_is_skipped(make_task, monkeypatch):
+    monkeypatch.setenv('JOBSLIB_BOOKKEEPING_TIMEOUT', '0.1')
+    task = make_task(
+        CountingTask, args={'run_once': False}, SLEEP_INTERVAL=0)
+    liveness = task.context.liveness
+    metrics = task.context.metrics
+    event = threading.Event()
+    with mock.patch.object(liveness, 'write') as m_write, \
+            mock.patch.object(
+                metrics, 'push', side_effect=lambda m: event.wait(5)) \
+            as m_push:
+        with pytest.raises(Terminate):
+            task()
+    event.set()
+    # Push of the first iteration blocks bookkeeping of the next ones
+    assert m_write.call_count == 1
+    assert m_push.call_count == 1
+
+
+def test_slow_heartbeat_doesnt_overwrite_liveness(make_task):
+    task = make_task(HeartbeatTask, HEARTBEAT_INTERVAL=0)
+    liveness = task.context.liveness
+    writes = []
+
+    def heartbeat(progress, **info):
+        time.sleep(1.5)
+        writes.append('heartbeat')
+
+    with mock.patch.object(liveness, 'heartbeat', heartbeat), \
+            mock.patch.object(
+                liveness, 'write', lambda: writes.append('write')):
+        task()
+    assert writes == ['heartbeat', 'write']
+
+
+def test_bookkeeping_timeout(make_task, monkeypatch):
+    monkeypatch.setenv('JOBSLIB_BOOKKEEPING_TIMEOUT', '0.1')
+    task = make_task(HeartbeatTask, HEARTBEAT_INTERVAL=60)
+    metrics = task.context.metrics
+    event = threading.Event()
+    with mock.patch.object(metrics, 'push', lambda m: event.wait(5)), \
+            mock.patch.object(task.logger, 'warning') as m_warning:
+        task()
+    event.set()
+    m_warning.assert_called_once_with(
+        "Writing %s has not finished in %.1f seconds", 'metrics', 0.1)
+
+
+class GarbageTask(BaseTask):
+
+    name = 'garbage'
+
+    def task(self):
+        gc.collect()
+
+
+def test_resource_metrics(make_task, monkeypatch):
+    monkeypatch.setenv('JOBSLIB_RESOURCE_METRICS', '1')
+    task = make_task(GarbageTask)
+    metrics = task.context.metrics
+    with mock.patch.object(metrics, 'push') as m_push:
+        task()
+    m_push.assert_called_once()
+    metrics_data = m_push.call_args[0][0]
+    tags = {'status': 'succeeded', 'type': 'task'}
+    assert metrics_data['process_cpu_user_seconds']['tags'] == tags
+    assert metrics_data['job_duration_seconds']['tags'] == tags
+    assert sum(
+        item['value'] for item in metrics_data['gc_collections']) >= 1
+
+
+class ReloadTask(BaseTask):
+
+    name = 'reload'
+
+    def initialize(self):
+        self.iterations = []
+
+    def task(self):
+        self.iterations.append((
+            self.context.config.metrics.summary_interval,
+            self.context.one_instance_lock,
+            self.context.metrics,
+        ))
+        if len(self.iterations) == 1:
+            settings = self.context.config._settings
+            settings.METRICS = dict(settings.METRICS, summary_interval=60)
+            os.kill(os.getpid(), signal.SIGHUP)
+        else:
+            raise Terminate
+
+
+def test_reload_config(make_task):
+    task = make_task(
+        ReloadTask, args={'run_once': False},
+        METRICS={'backend': 'jobslib.metrics.dummy.DummyMetrics'},
+        SLEEP_INTERVAL=0)
+    try:
+        with pytest.raises(Terminate):
+            task()
+    finally:
+        signal.signal(signal.SIGHUP, signal.SIG_DFL)
+
+    (interval1, lock1, metrics1), (interval2, lock2, metrics2) = \
+        task.iterations
+    assert (interval1, interval2) == (0, 60)
+    # Only metrics backend has been created again
+    assert lock2 is lock1
+    assert metrics2 is not metrics1
+    assert metrics2.registry.summary_interval == 60
+
+
+def test_reload_config_invalid(make_task):
+    task = make_task(HeartbeatTask, HEARTBEAT_INTERVAL=60)
+    config = task.context.config
+    with mock.patch.object(
+            config, 'reload', side_effect=ValueError('Invalid')):
+        assert task.reload_config() == []
+    assert task.context.config is config
@@ -0,0 +1,157 @@
+
+import threading
+import time
+
+import consul
+import pytest
+
+from jobslib.testing.consul import FakeConsulServer, parse_duration
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.time = 1000.0
+
+    def __call__(self):
+        return self.time
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def server(clock):
+    with FakeConsulServer(clock=clock) as server:
+        yield server
+
+
+@pytest.fixture
+def client(server):
+    host, port = server.address
+    return consul.Consul(host=host, port=port, timeout=5)
+
+
+@pytest.mark.parametrize(
+    'value, expected',
+    [
+        ('15s', 15.0),
+        ('100ms', 0.1),
+        ('1m30s', 90.0),
+        ('2', 2.0),
+        ('', 0.0),
+    ]
+)
+def test_parse_duration(value, expected):
+    assert parse_duration(value) == pytest.approx(expected)
+
+
+def test_parse_duration_invalid():
+    with pytest.raises(ValueError):
+        parse_duration('15x')
+
+
+def test_kv_cas(client):
+    assert client.kv.put('a', 'one', cas=0) is True
+    assert client.kv.put('a', 'two', cas=0) is False
+    index, data = client.kv.get('a')
+    assert data['Value'] == b'one'
+    assert client.kv.put('a', 'two', cas=data['ModifyIndex']) is True
+    assert client.kv.get('a')[1]['Value'] == b'two'
+    assert client.kv.delete('a') is True
+    assert client.kv.get('a')[1] is None
+
+
+def test_session_ttl(server, client, clock):
+    session_id = client.session.create(ttl=10, lock_delay=5)
+    assert client.kv.put('lock', 'owner', acquire=session_id) is True
+    assert client.kv.get('lock')[1]['Session'] == session_id
+
+    clock.time += 9
+    assert client.session.renew(session_id)['ID'] == session_id
+    clock.time += 9
+    assert client.kv.get('lock')[1]['Session'] == session_id
+
+    # session expires, lock is released, but lock delay is applied
+    clock.time += 1
+    assert client.session.info(session_id)[1] is None
+    assert 'Session' not in client.kv.get('lock')[1]
+    with pytest.raises(consul.NotFound):
+        client.session.renew(session_id)
+
+    other_id = client.session.create(ttl=10)
+    assert client.kv.put('lock', 'other', acquire=other_id) is False
+    clock.time += 5
+    assert client.kv.put('lock', 'other', acquire=other_id) is True
+
+
+def test_session_behavior_delete(server, client):
+    session_id = client.session.create(behavior='delete', lock_delay=0)
+    assert client.kv.put('lock', 'owner', acquire=session_id) is True
+    client.session.destroy(session_id)
+    assert client.kv.get('lock')[1] is None
+
+
+def test_blocking_query(server, client):
+    client.kv.put('key', 'one')
+    index, unused_data = client.kv.get('key')
+    results = []
+
+    def watch():
+        results.append(client.kv.get('key', index=index, wait='5s'))
+
+    thread = threading.Thread(target=watch)
+    thread.start()
+    client.kv.put('key', 'two')
+    thread.join(5)
+    assert not thread.is_alive()
+    assert results[0][0] > index
+    assert results[0][1]['Value'] == b'two'
+
+    # nothing is changed, query returns after wait
+    index, unused_data = client.kv.get('key')
+    assert client.kv.get('key', index=index, wait='10ms')[0] == index
+
+
+def test_txn(server, client):
+    client.kv.put('a', 'one')
+    index = client.kv.get('a')[1]['ModifyIndex']
+    result = client.txn.put([
+        {'KV': {'Verb': 'check-index', 'Key': 'a', 'Index': index}},
+        {'KV': {'Verb': 'set', 'Key': 'b', 'Value': 'dHdv'}},
+        {'KV': {'Verb': 'get', 'Key': 'a'}},
+    ])
+    assert result['Errors'] is None
+    assert [r['KV']['Key'] for r in result['Results']] == ['a', 'b', 'a']
+    assert client.kv.get('b')[1]['Value'] == b'two'
+
+    # check fails, nothing is changed
+    with pytest.raises(consul.base.ClientError):
+        client.txn.put([
+            {'KV': {'Verb': 'set', 'Key': 'c', 'Value': 'dGhyZWU='}},
+            {'KV': {'Verb': 'check-index', 'Key': 'a', 'Index': index + 1}},
+        ])
+    assert client.kv.get('c')[1] is None
+
+
+def test_faults_and_latency(server, client):
+    server.inject_fault(status=500, count=2, path='/v1/kv/')
+    with pytest.raises(consul.ConsulException):
+        client.kv.put('a', 'one')
+    with pytest.raises(consul.ConsulException):
+        client.kv.get('a')
+    assert client.kv.put('a', 'one') is True
+
+    server.inject_fault(status=None, count=None)
+    with pytest.raises(Exception):
+        client.kv.get('a')
+    server.clear_faults()
+    assert client.kv.get('a')[1]['Value'] == b'one'
+    assert server.requests == 5
+
+    server.latency = 0.05
+    start = time.monotonic()
+    client.kv.get('a')
+    assert time.monotonic() - start >= 0.05